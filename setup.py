@@ -26,6 +26,7 @@ setup(
         'dj-database-url>=0.5.0',
         'cradmin_legacy>=1.3.0a0',
         'gunicorn',
+        'numpy',
     ],
     classifiers=[
         'Development Status :: 4 - Beta',
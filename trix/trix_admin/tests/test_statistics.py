@@ -0,0 +1,300 @@
+import datetime
+import json
+
+import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.login import LoginTestCaseMixin
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_admin.views.statistics import AssignmentStatsCsv
+from trix.trix_admin.views.statistics import StatisticsChartView
+from trix.trix_admin.views.statistics import compute_stats_for_assignment
+from trix.trix_admin.views.statistics import compute_stats_for_assignments
+from trix.trix_core import models
+
+
+class TestComputeStatsForAssignments(TestCase):
+    def setUp(self):
+        self.assignment1 = models.Assignment.objects.create(title='A1', text='Text')
+        self.assignment2 = models.Assignment.objects.create(title='A2', text='Text')
+        self.assignment3 = models.Assignment.objects.create(title='A3', text='Text')
+        self.users = [create_user('user{}@example.com'.format(index),
+                                  consent_datetime=timezone.now())
+                      for index in range(4)]
+        self._solve(self.assignment1, self.users[0], 'bymyself')
+        self._solve(self.assignment1, self.users[1], 'bymyself')
+        self._solve(self.assignment1, self.users[2], 'withhelp')
+        self._solve(self.assignment2, self.users[3], 'withhelp',
+                    solved_datetime=timezone.now() - datetime.timedelta(days=10))
+
+        models.HowSolvedDailyCount.objects.rebuild()
+
+    def _solve(self, assignment, user, howsolved, solved_datetime=None):
+        howsolved = models.HowSolved.objects.set_howsolved(
+            assignment=assignment, user=user, howsolved=howsolved)
+        if solved_datetime:
+            models.HowSolved.objects.filter(id=howsolved.id).update(
+                solved_datetime=solved_datetime)
+
+    def test_counts(self):
+        stats = compute_stats_for_assignments(
+            [self.assignment1, self.assignment2, self.assignment3], 4)
+        self.assertEqual(stats[self.assignment1.id]['bymyself'], {'percent': 50.0, 'count': 2})
+        self.assertEqual(stats[self.assignment1.id]['withhelp'], {'percent': 25.0, 'count': 1})
+        self.assertEqual(stats[self.assignment1.id]['notsolved'], {'percent': 25.0, 'count': 1})
+        self.assertEqual(stats[self.assignment2.id]['withhelp']['count'], 1)
+        self.assertEqual(stats[self.assignment3.id]['notsolved'], {'percent': 100.0, 'count': 4})
+
+    def test_accepts_ids(self):
+        stats = compute_stats_for_assignments([self.assignment1.id], 4)
+        self.assertEqual(stats[self.assignment1.id]['bymyself']['count'], 2)
+
+    def test_no_users(self):
+        stats = compute_stats_for_assignments([self.assignment1], 0)
+        self.assertEqual(stats[self.assignment1.id]['bymyself'], {'percent': 0, 'count': 0})
+        self.assertEqual(stats[self.assignment1.id]['notsolved'], {'percent': 0, 'count': 0})
+
+    def test_date_filter(self):
+        from_date = (timezone.now() - datetime.timedelta(days=1)).date()
+        stats = compute_stats_for_assignments(
+            [self.assignment1, self.assignment2], 4, from_date=from_date)
+        self.assertEqual(stats[self.assignment1.id]['bymyself']['count'], 2)
+        self.assertEqual(stats[self.assignment2.id]['withhelp']['count'], 0)
+
+    def test_single_query(self):
+        assignments = [self.assignment1, self.assignment2, self.assignment3]
+        with self.assertNumQueries(1):
+            compute_stats_for_assignments(assignments, 4)
+
+    def test_same_as_compute_stats_for_assignment(self):
+        from_date = (timezone.now() - datetime.timedelta(days=20)).date()
+        assignments = [self.assignment1, self.assignment2, self.assignment3]
+        stats = compute_stats_for_assignments(assignments, 4, from_date=from_date)
+        for assignment in assignments:
+            for howsolved_filter in ('bymyself', 'withhelp', 'notsolved'):
+                self.assertEqual(
+                    stats[assignment.id][howsolved_filter],
+                    compute_stats_for_assignment(assignment, howsolved_filter, 4,
+                                                 from_date=from_date))
+
+
+class TestStatisticsViews(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        cache.clear()
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        self.course = models.Course.objects.create(course_tag=course_tag)
+        self.admin = create_user('admin@example.com', consent_datetime=timezone.now())
+        self.course.admins.add(self.admin)
+        self.student = create_user('student@example.com', consent_datetime=timezone.now())
+        self.assignments = []
+        for index in range(3):
+            assignment = models.Assignment.objects.create(
+                title='Assignment {}'.format(index), text='Text')
+            assignment.tags.add(course_tag)
+            models.HowSolved.objects.set_howsolved(
+                assignment=assignment, user=self.student, howsolved='bymyself')
+            self.assignments.append(assignment)
+
+    def _get_chart_view(self):
+        return self.get_as(self.admin, reverse('trix_courseadmin-statistics-INDEX',
+                                               kwargs={'roleid': self.course.id}))
+
+    def test_chart_view(self):
+        response = self._get_chart_view()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Assignment 0')
+        self.assertEqual(response.context['assignment_list'][0].stats['bymyself'],
+                         {'percent': 100.0, 'count': 1})
+
+    def test_chart_view_cached(self):
+        self._get_chart_view()
+        with mock.patch.object(StatisticsChartView, '_compute_statistics') as compute_statistics:
+            response = self._get_chart_view()
+        self.assertFalse(compute_statistics.called)
+        self.assertEqual(response.context['user_count'], 1)
+        self.assertEqual(response.context['assignment_count'], 3)
+
+    def test_chart_view_cache_invalidated_by_howsolved(self):
+        self._get_chart_view()
+        models.HowSolved.objects.set_howsolved(
+            assignment=self.assignments[0], user=self.student, howsolved='withhelp')
+        response = self._get_chart_view()
+        stats = {assignment.id: assignment.stats
+                 for assignment in response.context['assignment_list']}
+        self.assertEqual(stats[self.assignments[0].id]['withhelp']['count'], 1)
+
+    def test_chart_view_cache_invalidated_by_howsolved_many(self):
+        self._get_chart_view()
+        models.HowSolved.objects.set_howsolved_many(
+            self.student, {self.assignments[0].id: None})
+        response = self._get_chart_view()
+        stats = {assignment.id: assignment.stats
+                 for assignment in response.context['assignment_list']}
+        self.assertEqual(stats[self.assignments[0].id]['bymyself']['count'], 0)
+
+    def test_chart_view_cache_not_invalidated_by_other_course(self):
+        other_assignment = models.Assignment.objects.create(title='Other', text='Text')
+        self._get_chart_view()
+        models.HowSolved.objects.set_howsolved(
+            assignment=other_assignment, user=self.student, howsolved='withhelp')
+        with mock.patch.object(StatisticsChartView, '_compute_statistics') as compute_statistics:
+            self._get_chart_view()
+        self.assertFalse(compute_statistics.called)
+
+    @override_settings(TRIX_STATISTICS_CACHE_TIMEOUT=0)
+    def test_chart_view_cache_timeout_zero(self):
+        self._get_chart_view()
+        with mock.patch.object(StatisticsChartView, '_compute_statistics', autospec=True,
+                               side_effect=StatisticsChartView._compute_statistics) \
+                as compute_statistics:
+            self._get_chart_view()
+        self.assertTrue(compute_statistics.called)
+
+    def _get_csv(self):
+        return self.get_as(self.admin, reverse('trix_courseadmin-statistics-ascsv',
+                                               kwargs={'roleid': self.course.id}),
+                           {'tags': 'duck1000'})
+
+    def test_csv(self):
+        response = self._get_csv()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Assignment 2', content)
+        self.assertIn('100.0%;1', content)
+
+    def test_csv_chunks(self):
+        with mock.patch.object(AssignmentStatsCsv, 'chunk_size', 2):
+            response = self._get_csv()
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        titles = [line for line in lines if line.startswith('Assignment ')][1:]
+        self.assertEqual(titles, ['Assignment 0', 'Assignment 1', 'Assignment 2'])
+        self.assertEqual(lines.count('Completed by their own;100.0%;1'), 3)
+
+    def test_csv_user_count(self):
+        response = self._get_csv()
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('Total number of users;1', content)
+
+    def test_chart_view_student_summary(self):
+        response = self.get_as(self.admin, reverse('trix_courseadmin-statistics-INDEX',
+                                                   kwargs={'roleid': self.course.id}),
+                               {'students': '1'})
+        self.assertEqual(response.context['student_summary']['student_count'], 1)
+        self.assertContains(response, '90th percentile: 100%')
+
+    def test_chart_view_student_summary_not_requested(self):
+        with mock.patch('trix.trix_admin.views.statistics.solvematrix.SolveMatrix'
+                        '.from_assignments') as from_assignments:
+            response = self._get_chart_view()
+        self.assertFalse(from_assignments.called)
+        self.assertNotIn('student_summary', response.context)
+        self.assertContains(response, 'students=1')
+
+    def test_matrix_csv(self):
+        other_student = create_user('other@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(
+            assignment=self.assignments[1], user=other_student, howsolved='withhelp')
+        response = self.get_as(self.admin, reverse('trix_courseadmin-statistics-matrixcsv',
+                                                   kwargs={'roleid': self.course.id}),
+                               {'tags': 'duck1000'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            'Student;Assignment 0;Assignment 1;Assignment 2',
+            'Student 1;bymyself;bymyself;bymyself',
+            'Student 2;;withhelp;',
+            '',
+            'Completed by their own;50.0%;50.0%;50.0%',
+            'Completed with help;0.0%;50.0%;0.0%',
+        ])
+        self.assertNotIn('example.com', '\n'.join(lines))
+
+    def test_csv_no_tags(self):
+        response = self.get_as(self.admin, reverse('trix_courseadmin-statistics-ascsv',
+                                                   kwargs={'roleid': self.course.id}))
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStatisticsActivityView(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        cache.clear()
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        self.course = models.Course.objects.create(course_tag=course_tag)
+        self.admin = create_user('admin@example.com', consent_datetime=timezone.now())
+        self.course.admins.add(self.admin)
+        self.assignment = models.Assignment.objects.create(title='A1', text='Text')
+        self.assignment.tags.add(course_tag)
+        self.other_assignment = models.Assignment.objects.create(title='Other', text='Text')
+        self.users = [create_user('user{}@example.com'.format(index),
+                                  consent_datetime=timezone.now())
+                      for index in range(4)]
+        # Monday, wednesday and the monday after
+        self.monday = datetime.date(2019, 9, 2)
+        self._solve(self.assignment, self.users[0], 'bymyself', self.monday, hour=10)
+        self._solve(self.assignment, self.users[1], 'withhelp', self.monday, hour=10)
+        self._solve(self.assignment, self.users[2], 'bymyself',
+                    self.monday + datetime.timedelta(days=2), hour=12)
+        self._solve(self.assignment, self.users[3], 'bymyself',
+                    self.monday + datetime.timedelta(days=7), hour=12)
+        self._solve(self.other_assignment, self.users[0], 'bymyself', self.monday, hour=10)
+        models.HowSolvedDailyCount.objects.rebuild()
+
+    def _solve(self, assignment, user, howsolved, day, hour):
+        howsolved = models.HowSolved.objects.create(
+            assignment=assignment, user=user, howsolved=howsolved)
+        solved_datetime = timezone.make_aware(
+            datetime.datetime.combine(day, datetime.time(hour, 15)))
+        models.HowSolved.objects.filter(id=howsolved.id).update(solved_datetime=solved_datetime)
+
+    def _get(self, **params):
+        return self.get_as(self.admin, reverse('trix_courseadmin-statistics-activity',
+                                               kwargs={'roleid': self.course.id}),
+                           params)
+
+    def _get_activity(self, **params):
+        response = self._get(**params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())['activity']
+
+    def test_daily(self):
+        self.assertEqual(self._get_activity(), [
+            {'start': '2019-09-02', 'bymyself': 1, 'withhelp': 1},
+            {'start': '2019-09-04', 'bymyself': 1, 'withhelp': 0},
+            {'start': '2019-09-09', 'bymyself': 1, 'withhelp': 0},
+        ])
+
+    def test_weekly(self):
+        self.assertEqual(self._get_activity(bucket='week'), [
+            {'start': '2019-09-02', 'bymyself': 2, 'withhelp': 1},
+            {'start': '2019-09-09', 'bymyself': 1, 'withhelp': 0},
+        ])
+
+    def test_hourly(self):
+        self.assertEqual(self._get_activity(bucket='hour', to='2019-09-02'), [
+            {'start': '2019-09-02T10:00:00+02:00', 'bymyself': 1, 'withhelp': 1},
+        ])
+
+    def test_date_range(self):
+        self.assertEqual(self._get_activity(**{'from': '2019-09-03', 'to': '2019-09-08'}), [
+            {'start': '2019-09-04', 'bymyself': 1, 'withhelp': 0},
+        ])
+
+    def test_single_activity_query(self):
+        self.login(self.admin)
+        url = reverse('trix_courseadmin-statistics-activity', kwargs={'roleid': self.course.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'bucket': 'week'})
+        activity_queries = [query for query in queries
+                            if 'trix_core_howsolved' in query['sql']]
+        self.assertEqual(len(activity_queries), 1)
+
+    def test_invalid_bucket(self):
+        response = self._get(bucket='year')
+        self.assertEqual(response.status_code, 400)
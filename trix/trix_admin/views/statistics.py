@@ -1,8 +1,17 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models import Case
+from django.db.models import IntegerField
 from django.db.models import Q
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import TruncHour
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
+from django.http import StreamingHttpResponse
 from django.views.generic import ListView
 from django.views.generic import View
 from django.utils.translation import ugettext as _
@@ -10,7 +19,28 @@ from django.core.exceptions import FieldError
 from cradmin_legacy import crapp
 
 import csv
+import datetime
+import json
+from collections import OrderedDict
+from trix.trix_core import cacheutils
 from trix.trix_core import models as trix_models
+from trix.trix_core import solvematrix
+
+
+csv.register_dialect('semicolons', delimiter=';')
+
+
+def _make_stats(howsolved_filter, count, user_count):
+    """
+    Make the ``{'percent': ..., 'count': ...}`` dict for ``howsolved_filter`` from
+    the number of matching HowSolved objects.
+    """
+    if user_count == 0:
+        return {'percent': 0, 'count': 0}
+    # Not solved is number of users that has solved something, but not this task
+    numerator = user_count - count if howsolved_filter == 'notsolved' else count
+    percentage = numerator / float(user_count) * 100
+    return {'percent': percentage, 'count': numerator}
 
 
 def compute_stats_for_assignment(assignment, howsolved_filter, user_count,
@@ -27,11 +57,52 @@ def compute_stats_for_assignment(assignment, howsolved_filter, user_count,
     # Filter based on date if present
     queryset = queryset.filter(solved_datetime__date__gte=from_date) if from_date else queryset
     queryset = queryset.filter(solved_datetime__date__lte=to_date) if to_date else queryset
-    count = queryset.count()
-    # Not solved is number of users that has solved something, but not this task
-    numerator = user_count - count if howsolved_filter == 'notsolved' else count
-    percentage = numerator / float(user_count) * 100
-    return {'percent': percentage, 'count': numerator}
+    return _make_stats(howsolved_filter, queryset.count(), user_count)
+
+
+def compute_stats_for_assignments(assignments, user_count, from_date=None, to_date=None):
+    """
+    Compute the stats for many assignments with a single query.
+
+    Sums the pre-aggregated :class:`trix.trix_core.models.HowSolvedDailyCount`
+    rows instead of counting the HowSolved objects. Gives the same results as
+    calling :func:`.compute_stats_for_assignment` for each assignment with
+    ``bymyself``, ``withhelp`` and ``notsolved``.
+
+    Parameters:
+        assignments: An iterable of Assignment objects or IDs.
+        user_count: The number of users, see :func:`.get_usercount_within_assignments`.
+        from_date: Only count HowSolved objects solved on or after this date.
+        to_date: Only count HowSolved objects solved on or before this date.
+
+    Returns:
+        A dict mapping assignment ID to a dict with ``bymyself``, ``withhelp`` and
+        ``notsolved`` stats.
+    """
+    assignment_ids = [getattr(assignment, 'id', assignment) for assignment in assignments]
+    queryset = trix_models.HowSolvedDailyCount.objects.filter(assignment_id__in=assignment_ids)
+    queryset = queryset.filter(day__gte=from_date) if from_date else queryset
+    queryset = queryset.filter(day__lte=to_date) if to_date else queryset
+    rows = queryset\
+        .values('assignment_id')\
+        .annotate(
+            bymyself=Sum(Case(When(howsolved='bymyself', then='count'),
+                              default=0, output_field=IntegerField())),
+            withhelp=Sum(Case(When(howsolved='withhelp', then='count'),
+                              default=0, output_field=IntegerField())))\
+        .values_list('assignment_id', 'bymyself', 'withhelp')
+    counts = {assignment_id: (bymyself, withhelp)
+              for assignment_id, bymyself, withhelp in rows}
+
+    stats = {}
+    for assignment_id in assignment_ids:
+        bymyself, withhelp = counts.get(assignment_id, (0, 0))
+        stats[assignment_id] = {
+            'bymyself': _make_stats('bymyself', bymyself, user_count),
+            'withhelp': _make_stats('withhelp', withhelp, user_count),
+            'notsolved': _make_stats('notsolved', bymyself + withhelp, user_count),
+        }
+    return stats
 
 
 def get_usercount_within_assignments(assignments, from_date=None, to_date=None):
@@ -97,61 +168,89 @@ class AssignmentStatsMixin(object):
         # Filter on dates if present
         if self.from_date is not None:
             queryset = queryset.filter(
-                howsolved__solved_datetime__date__gte=self.from_date
+                howsolveddailycount__day__gte=self.from_date
             )
         if self.to_date is not None:
             queryset = queryset.filter(
-                howsolved__solved_datetime__date__lte=self.to_date
+                howsolveddailycount__day__lte=self.to_date
             )
         queryset = queryset.distinct()
         return queryset
 
 
+class Echo(object):
+    """
+    An object that implements just the write method of the file-like interface.
+
+    Lets us use :func:`csv.writer` to format rows that we stream instead of
+    writing them to a buffer.
+    """
+    def write(self, value):
+        return value
+
+
 class AssignmentStatsCsv(AssignmentStatsMixin, View):
+    """
+    Streams the statistics for the assignments as CSV.
+
+    The assignments are read in chunks of :obj:`.chunk_size`, and the stats
+    for each chunk are computed with a single query, so memory usage does not
+    grow with the number of assignments.
+    """
+    chunk_size = 500
+    filename = 'trix-statistics.csv'
+
     def get(self, request, *args, **kwargs):
         self.tags = self.get_tags()
         if not self.tags:
             return HttpResponseBadRequest()
         if self.request.cradmin_role.course_tag.tag not in self.tags:
             raise PermissionDenied()
+        response = StreamingHttpResponse(self.iter_csv_rows(), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(self.filename)
+        return response
+
+    def iter_assignment_chunks(self, assignmentqueryset):
+        """
+        Iterate over ``(id, title)`` tuples for the assignments in lists of
+        at most :obj:`.chunk_size` items.
+        """
+        chunk = []
+        for assignment in assignmentqueryset.values_list('id', 'title').iterator():
+            chunk.append(assignment)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def iter_csv_rows(self):
         assignmentqueryset = self.get_queryset()
+        from_date = self.get_from_date()
+        to_date = self.get_to_date()
+        user_count = get_usercount_within_assignments(assignmentqueryset, from_date, to_date)
 
-        user_count = get_usercount_within_assignments(assignmentqueryset)
-        response = HttpResponse(content_type='text/csv')
-        csv.register_dialect('semicolons', delimiter=';')
-
-        try:
-            response['Content-Disposition'] = 'attachment; filename="trix-statistics.csv"'
-            csvwriter = csv.writer(response, dialect='semicolons')
-            csvwriter.writerow([_('Simple statistics showing percentage share of how the '
-                                  'assignments where solved')])
-            csvwriter.writerow([_('Total number of users'), str(user_count)])
-            csvwriter.writerow('')
-            csvwriter.writerow([_('Assignment title'), _('Percentage'), _('Number')])
-            for assignment in assignmentqueryset:
-                csvwriter.writerow([assignment.title])
-                bymyself = compute_stats_for_assignment(assignment,
-                                                        'bymyself',
-                                                        user_count)
-                csvwriter.writerow([
-                    _('Completed by their own'),
-                    "{}%".format(bymyself['percent']),
-                    "{}".format(bymyself['count'])])
-                withhelp = compute_stats_for_assignment(assignment,
-                                                        'withhelp',
-                                                        user_count)
-                csvwriter.writerow([
-                    _('Completed with help'),
-                    "{}%".format(withhelp['percent']),
-                    "{}".format(withhelp['count'])])
-                notsolved = compute_stats_for_assignment(assignment, 'notsolved', user_count)
-                csvwriter.writerow([_('Not completed'),
-                                    "{}%".format(notsolved['percent']),
-                                    "{}".format(notsolved['count'])])
-                csvwriter.writerow('')
-        except Exception as e:
-            raise e
-        return response
+        csvwriter = csv.writer(Echo(), dialect='semicolons')
+        yield csvwriter.writerow([_('Simple statistics showing percentage share of how the '
+                                    'assignments where solved')])
+        yield csvwriter.writerow([_('Total number of users'), str(user_count)])
+        yield csvwriter.writerow('')
+        yield csvwriter.writerow([_('Assignment title'), _('Percentage'), _('Number')])
+        for chunk in self.iter_assignment_chunks(assignmentqueryset):
+            stats = compute_stats_for_assignments(
+                [assignment_id for assignment_id, title in chunk],
+                user_count, from_date, to_date)
+            for assignment_id, title in chunk:
+                yield csvwriter.writerow([title])
+                for howsolved_filter, label in [('bymyself', _('Completed by their own')),
+                                                ('withhelp', _('Completed with help')),
+                                                ('notsolved', _('Not completed'))]:
+                    assignmentstats = stats[assignment_id][howsolved_filter]
+                    yield csvwriter.writerow([
+                        label,
+                        "{}%".format(assignmentstats['percent']),
+                        "{}".format(assignmentstats['count'])])
+                yield csvwriter.writerow('')
 
     def get_queryset(self):
         queryset = trix_models.Assignment.objects.all().order_by('title')
@@ -161,17 +260,55 @@ class AssignmentStatsCsv(AssignmentStatsMixin, View):
         from_date = self.get_from_date()
         if from_date is not None:
             queryset = queryset.filter(
-                howsolved__solved_datetime__date__gte=from_date
+                howsolveddailycount__day__gte=from_date
             )
         to_date = self.get_to_date()
         if to_date is not None:
             queryset = queryset.filter(
-                howsolved__solved_datetime__date__lte=to_date
+                howsolveddailycount__day__lte=to_date
             )
         queryset = queryset.distinct()
         return queryset
 
 
+class AssignmentSolveMatrixCsv(AssignmentStatsCsv):
+    """
+    Streams the student by assignment solve matrix as CSV.
+
+    Each row is a student that has solved at least one of the assignments, and
+    each column is an assignment. The students are anonymized. The last rows are
+    the share of the students that solved each assignment by their own and with help.
+    """
+    filename = 'trix-solve-matrix.csv'
+    CELL_VALUES = {
+        solvematrix.NOT_SOLVED: '',
+        solvematrix.WITHHELP: 'withhelp',
+        solvematrix.BYMYSELF: 'bymyself',
+    }
+
+    def iter_csv_rows(self):
+        assignments = list(self.get_queryset().values_list('id', 'title'))
+        matrix = solvematrix.SolveMatrix.from_assignments(
+            [assignment_id for assignment_id, title in assignments],
+            self.get_from_date(), self.get_to_date())
+
+        csvwriter = csv.writer(Echo(), dialect='semicolons')
+        yield csvwriter.writerow([_('Student')] + [title for assignment_id, title in assignments])
+        for index, row in enumerate(matrix.matrix, start=1):
+            yield csvwriter.writerow(
+                [_('Student {number}').format(number=index)] +
+                [self.CELL_VALUES[value] for value in row.tolist()])
+
+        solve_rates = matrix.get_assignment_solve_rates()
+        yield csvwriter.writerow('')
+        for howsolved, label in [('bymyself', _('Completed by their own')),
+                                 ('withhelp', _('Completed with help'))]:
+            yield csvwriter.writerow(
+                [label] +
+                ['{}%'.format(round(solve_rates[assignment_id][howsolved] * 100, 2))
+                 for assignment_id, title in assignments])
+
+
 class StatisticsChartView(AssignmentStatsMixin, ListView):
     """
     Class for the statistics charts displayed.
@@ -185,11 +322,15 @@ class StatisticsChartView(AssignmentStatsMixin, ListView):
 
     def get(self, request, *args, **kwargs):
         self.tags = self.get_tags(self.request.cradmin_role.course_tag.tag)
+        self.show_student_summary = self.request.GET.get('students') == '1'
         self.sort_list = self.get_sort_list()
         self.from_date = self.get_from_date()
         self.to_date = self.get_to_date()
         return super(StatisticsChartView, self).get(request, *args, **kwargs)
 
+    def get_queryset(self):
+        return super(StatisticsChartView, self).get_queryset().prefetch_related('tags')
+
     def _get_selectable_tags(self):
         tags = (trix_models.Tag.objects
                 .filter(assignment__in=self.get_queryset())
@@ -199,15 +340,76 @@ class StatisticsChartView(AssignmentStatsMixin, ListView):
                 .values_list('tag', flat=True))
         return tags
 
+    def _compute_statistics(self, assignment_ids):
+        user_count = get_usercount_within_assignments(self.get_queryset(),
+                                                      self.from_date,
+                                                      self.to_date)
+        return {
+            'user_count': user_count,
+            'assignment_stats': compute_stats_for_assignments(assignment_ids, user_count,
+                                                              self.from_date, self.to_date),
+            'assignment_count': self.get_queryset().count(),
+            'selectable_tags_list': list(self._get_selectable_tags()),
+        }
+
+    def get_student_summary(self):
+        """
+        Get the :meth:`trix.trix_core.solvematrix.SolveMatrix.get_summary` for the
+        selected assignments.
+
+        Builds the solve matrix from all the HowSolved objects for the assignments,
+        so it is only computed when requested with ``?students=1``. Cached like
+        :meth:`.get_statistics`.
+        """
+        course = self.request.cradmin_role
+        cache_key = cacheutils.make_key(
+            'statistics-students', course.id,
+            trix_models.Course.get_statistics_cache_version(course.id),
+            sorted(self.tags), self.from_date, self.to_date)
+        student_summary = cache.get(cache_key)
+        if student_summary is None:
+            student_summary = solvematrix.SolveMatrix.from_assignments(
+                self.get_queryset().values_list('id', flat=True),
+                self.from_date, self.to_date).get_summary()
+            cache.set(cache_key, student_summary,
+                      getattr(settings, 'TRIX_STATISTICS_CACHE_TIMEOUT', 60))
+        return student_summary
+
+    def get_statistics(self, assignment_ids):
+        """
+        Get the statistics for the selected tags and dates, and the stats for the
+        assignments with the given IDs (the assignments on the current page).
+
+        The statistics are cached for ``TRIX_STATISTICS_CACHE_TIMEOUT`` seconds, and
+        invalidated when students change how they solved an assignment in the course
+        (see :meth:`trix.trix_core.models.Course.bump_statistics_cache_version`).
+        """
+        course = self.request.cradmin_role
+        cache_key = cacheutils.make_key(
+            'statistics', course.id, trix_models.Course.get_statistics_cache_version(course.id),
+            sorted(self.tags), self.from_date, self.to_date, assignment_ids)
+        statistics = cache.get(cache_key)
+        if statistics is None:
+            statistics = self._compute_statistics(assignment_ids)
+            cache.set(cache_key, statistics,
+                      getattr(settings, 'TRIX_STATISTICS_CACHE_TIMEOUT', 60))
+        return statistics
+
     def get_context_data(self, **kwargs):
         context = super(StatisticsChartView, self).get_context_data(**kwargs)
-        context['user_count'] = get_usercount_within_assignments(self.get_queryset(),
-                                                                 self.from_date,
-                                                                 self.to_date)
-        context['assignment_count'] = self.get_queryset().count()
+        # Attach the stats to the assignments on the current page
+        context['assignment_list'] = list(context['assignment_list'])
+        statistics = self.get_statistics([assignment.id for assignment in context['assignment_list']])
+        for assignment in context['assignment_list']:
+            assignment.stats = statistics['assignment_stats'][assignment.id]
+        context['user_count'] = statistics['user_count']
+        context['assignment_count'] = statistics['assignment_count']
         context['selected_tags_string'] = ','.join(self.tags)
         context['selected_tags_list'] = self.tags
-        context['selectable_tags_list'] = self._get_selectable_tags()
+        context['selectable_tags_list'] = statistics['selectable_tags_list']
+        context['show_student_summary'] = self.show_student_summary
+        if self.show_student_summary:
+            context['student_summary'] = self.get_student_summary()
         context['course_tag'] = self.request.cradmin_role.course_tag.tag
         context['sort_list'] = ','.join(self.sort_list)
         # List of ways to sort. To add or remove ways to sort just expand or remove from this list.
@@ -231,8 +433,105 @@ class StatisticsChartView(AssignmentStatsMixin, ListView):
         return ordering
 
 
+class StatisticsActivityView(AssignmentStatsMixin, View):
+    """
+    Solve activity over time for the assignments in a course as JSON.
+
+    Querystring arguments:
+
+    - ``bucket``: ``hour``, ``day`` (default) or ``week``.
+    - ``tags``: Comma separated tags to filter the assignments on, like for
+      :class:`.StatisticsChartView`. The course tag is always included.
+    - ``from`` and ``to``: Optional date range (``YYYY-MM-DD``).
+
+    Responds with a list of buckets, each with the start of the bucket and the
+    number of ``bymyself`` and ``withhelp`` solves in the bucket. Buckets without
+    solves are not included.
+    """
+    BUCKETS = ['hour', 'day', 'week']
+
+    def get(self, request, *args, **kwargs):
+        self.tags = self.get_tags(self.request.cradmin_role.course_tag.tag)
+        self.from_date = self.get_from_date()
+        self.to_date = self.get_to_date()
+        bucket = request.GET.get('bucket', 'day')
+        if bucket not in self.BUCKETS:
+            return HttpResponseBadRequest(
+                json.dumps({'error': 'Invalid bucket. Must be one of: {}.'.format(
+                    ', '.join(self.BUCKETS))}),
+                content_type='application/json')
+        if bucket == 'hour':
+            activity = self.get_hourly_activity()
+        elif bucket == 'day':
+            activity = self.get_daily_activity()
+        else:
+            activity = self.get_weekly_activity()
+        return HttpResponse(json.dumps({'bucket': bucket, 'activity': activity}),
+                            content_type='application/json')
+
+    def get_queryset(self):
+        queryset = trix_models.Assignment.objects.all()
+        for tagstring in self.tags:
+            queryset = queryset.filter(tags__tag=tagstring)
+        return queryset
+
+    def _aggregate_activity(self, queryset, bucketfield, countfield):
+        """
+        Sum ``countfield`` by howsolved for each value of ``bucketfield`` with a single query.
+
+        Returns:
+            A list of ``(bucket, bymyself, withhelp)`` tuples ordered by bucket.
+        """
+        return list(
+            queryset
+            .values(bucketfield)
+            .annotate(
+                bymyself=Sum(Case(When(howsolved='bymyself', then=countfield),
+                                  default=0, output_field=IntegerField())),
+                withhelp=Sum(Case(When(howsolved='withhelp', then=countfield),
+                                  default=0, output_field=IntegerField())))
+            .values_list(bucketfield, 'bymyself', 'withhelp')
+            .order_by(bucketfield))
+
+    def _make_activity(self, rows):
+        return [{'start': start.isoformat(), 'bymyself': bymyself, 'withhelp': withhelp}
+                for start, bymyself, withhelp in rows]
+
+    def get_hourly_activity(self):
+        queryset = trix_models.HowSolved.objects.filter(assignment__in=self.get_queryset())
+        queryset = queryset.filter(solved_datetime__date__gte=self.from_date) \
+            if self.from_date else queryset
+        queryset = queryset.filter(solved_datetime__date__lte=self.to_date) \
+            if self.to_date else queryset
+        queryset = queryset.annotate(hour=TruncHour('solved_datetime'))
+        return self._make_activity(self._aggregate_activity(queryset, 'hour', Value(1)))
+
+    def _get_daily_rows(self):
+        queryset = trix_models.HowSolvedDailyCount.objects.filter(
+            assignment__in=self.get_queryset())
+        queryset = queryset.filter(day__gte=self.from_date) if self.from_date else queryset
+        queryset = queryset.filter(day__lte=self.to_date) if self.to_date else queryset
+        return self._aggregate_activity(queryset, 'day', 'count')
+
+    def get_daily_activity(self):
+        return self._make_activity(self._get_daily_rows())
+
+    def get_weekly_activity(self):
+        # Django 1.11 has no TruncWeek, so we fold the daily rows (at most 7 per week)
+        # into weeks starting on monday.
+        weeks = OrderedDict()
+        for day, bymyself, withhelp in self._get_daily_rows():
+            week = day - datetime.timedelta(days=day.weekday())
+            weekbymyself, weekwithhelp = weeks.get(week, (0, 0))
+            weeks[week] = (weekbymyself + bymyself, weekwithhelp + withhelp)
+        return self._make_activity(
+            (week, bymyself, withhelp) for week, (bymyself, withhelp) in weeks.items())
+
+
 class App(crapp.App):
     appurls = [
         crapp.Url(r'^$', StatisticsChartView.as_view(), name=crapp.INDEXVIEW_NAME),
         crapp.Url(r'^ascsv$', AssignmentStatsCsv.as_view(), name='ascsv'),
+        crapp.Url(r'^matrixcsv$', AssignmentSolveMatrixCsv.as_view(), name='matrixcsv'),
+        crapp.Url(r'^activity$', StatisticsActivityView.as_view(), name='activity'),
     ]
@@ -0,0 +1 @@
+default_app_config = 'trix.trix_core.apps.TrixCoreConfig'
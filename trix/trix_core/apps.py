@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class TrixCoreConfig(AppConfig):
+    name = 'trix.trix_core'
+
+    def ready(self):
+        from trix.trix_core import signals  # noqa
@@ -0,0 +1,72 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.cache import cache
+
+
+#: Cache backends that are local to each process (or do not cache at all).
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def _get_version_key(namespace, key):
+    return 'trix-version:{}:{}'.format(namespace, key)
+
+
+def _get_initial_version():
+    # Start at the current time instead of at 1, so that we do not reuse the
+    # version of data cached before the version key was evicted from the cache.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace, key):
+    """
+    Get the version number for ``key`` in ``namespace``.
+
+    Include the version in the key of cached data, and use :func:`.bump_version`
+    to invalidate all the data cached with the old version.
+    """
+    version_key = _get_version_key(namespace, key)
+    version = cache.get(version_key)
+    if version is None:
+        version = _get_initial_version()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return version
+
+
+def bump_version(namespace, key):
+    """
+    Increment the version number for ``key`` in ``namespace``.
+    """
+    version_key = _get_version_key(namespace, key)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, _get_initial_version(), None)
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Check if the cache is shared between processes.
+
+    Data that is invalidated when it changes should only be cached for long
+    in a shared cache, since the other processes never see the invalidation
+    in a cache that is local to each process.
+    """
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def make_key(namespace, *parts):
+    """
+    Make a cache key from ``namespace`` and ``parts``.
+
+    The parts are hashed, so they can be any values with a stable ``repr()``,
+    and the key is safe to use with any cache backend.
+    """
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return 'trix:{}:{}'.format(namespace, digest)
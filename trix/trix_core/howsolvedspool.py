@@ -0,0 +1,254 @@
+"""
+Optional write-behind spool for HowSolved changes.
+
+When the ``TRIX_HOWSOLVED_WRITE_BEHIND`` setting is ``True``, the howsolved views
+append the changes to a SQLite spool file (the ``TRIX_HOWSOLVED_SPOOL_PATH``
+setting) instead of writing them to the database. A background thread in each
+process applies the spooled changes with
+:meth:`trix.trix_core.models.HowSolvedManager.set_howsolved_many` every
+``TRIX_HOWSOLVED_SPOOL_FLUSH_INTERVAL`` seconds (defaults to 0.3), so all the clicks
+in the interval are written to the database in one transaction.
+
+All the processes on a server share the spool file, and the student views add
+the spooled changes for the current user (see :func:`.get_pending`), so students
+see their own changes before they are written to the database.
+
+The spool is only locked for short transactions. :func:`.flush` claims the
+changes, writes them to the database without holding the spool lock, and then
+deletes the claimed changes, so adding changes never waits for the database.
+"""
+import atexit
+import contextlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from django import db
+from django.conf import settings
+from django.db import transaction
+
+from trix.trix_core import models as coremodels
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_enabled():
+    return getattr(settings, 'TRIX_HOWSOLVED_WRITE_BEHIND', False)
+
+
+def get_spool_path():
+    return getattr(settings, 'TRIX_HOWSOLVED_SPOOL_PATH',
+                   os.path.join(tempfile.gettempdir(), 'trix-howsolved-spool.sqlite3'))
+
+
+def get_flush_interval():
+    return getattr(settings, 'TRIX_HOWSOLVED_SPOOL_FLUSH_INTERVAL', 0.3)
+
+
+def get_claim_timeout():
+    return getattr(settings, 'TRIX_HOWSOLVED_SPOOL_CLAIM_TIMEOUT', 60)
+
+
+_local = threading.local()
+
+
+def _get_connection():
+    """
+    Get the connection to the spool file for this thread, creating the spool if needed.
+    """
+    path = get_spool_path()
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.path != path or _local.pid != os.getpid():
+        connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS howsolved_change ('
+                           'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                           'user_id INTEGER NOT NULL, '
+                           'assignment_id INTEGER NOT NULL, '
+                           'howsolved TEXT, '
+                           'claim TEXT, '
+                           'claimed_time REAL)')
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(howsolved_change)')}
+        if 'claim' not in columns:
+            # Spool created before the changes were claimed
+            connection.execute('ALTER TABLE howsolved_change ADD COLUMN claim TEXT')
+            connection.execute('ALTER TABLE howsolved_change ADD COLUMN claimed_time REAL')
+        connection.execute('CREATE INDEX IF NOT EXISTS howsolved_change_user_id '
+                           'ON howsolved_change (user_id)')
+        connection.execute('CREATE INDEX IF NOT EXISTS howsolved_change_claim '
+                           'ON howsolved_change (claim)')
+        _local.connection = connection
+        _local.path = path
+        _local.pid = os.getpid()
+    return connection
+
+
+@contextlib.contextmanager
+def _immediate_transaction(connection):
+    # BEGIN IMMEDIATE takes the write lock at once, so the processes flushing
+    # the spool do not claim the same changes
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    else:
+        connection.execute('COMMIT')
+
+
+def add_changes(user_id, changes):
+    """
+    Add changes to how the user with ID ``user_id`` solved assignments to the spool.
+
+    Parameters:
+        changes: Dict mapping assignment IDs to a ``howsolved`` value, or to ``None``
+            to clear how the user solved the assignment.
+    """
+    connection = _get_connection()
+    with _immediate_transaction(connection):
+        connection.executemany(
+            'INSERT INTO howsolved_change (user_id, assignment_id, howsolved) VALUES (?, ?, ?)',
+            [(user_id, assignment_id, howsolved) for assignment_id, howsolved in changes.items()])
+    start_flusher()
+
+
+def get_pending(user_id):
+    """
+    Get the spooled changes for the user with ID ``user_id``.
+
+    Returns:
+        A dict mapping assignment IDs to the latest spooled ``howsolved`` value, or
+        to ``None`` if the latest change clears how the user solved the assignment.
+    """
+    rows = _get_connection().execute(
+        'SELECT assignment_id, howsolved FROM howsolved_change WHERE user_id = ? ORDER BY id',
+        (user_id,)).fetchall()
+    if rows:
+        # Make sure the changes are flushed even if they were added by a process that exited
+        start_flusher()
+    return dict(rows)
+
+
+def discard_user(user_id):
+    """
+    Remove the spooled changes for the user with ID ``user_id``.
+    """
+    connection = _get_connection()
+    with _immediate_transaction(connection):
+        connection.execute('DELETE FROM howsolved_change WHERE user_id = ?', (user_id,))
+
+
+def _apply_changes(changes_by_user_id):
+    all_assignment_ids = set()
+    for changes in changes_by_user_id.values():
+        all_assignment_ids.update(changes.keys())
+    # Skip changes for users and assignments deleted after the change was spooled
+    existing_user_ids = set(coremodels.User.objects
+                            .filter(id__in=list(changes_by_user_id.keys()))
+                            .values_list('id', flat=True))
+    existing_assignment_ids = set(coremodels.Assignment.objects
+                                  .filter(id__in=list(all_assignment_ids))
+                                  .values_list('id', flat=True))
+    with transaction.atomic():
+        # Sorted so the rows are locked in the same order in all processes
+        for user_id in sorted(existing_user_ids):
+            coremodels.HowSolved.objects.set_howsolved_many(
+                user=user_id,
+                changes={assignment_id: howsolved
+                         for assignment_id, howsolved in changes_by_user_id[user_id].items()
+                         if assignment_id in existing_assignment_ids})
+
+
+def _claim_changes(connection):
+    """
+    Claim all the unclaimed changes in the spool, unless another flush has claimed
+    changes less than ``TRIX_HOWSOLVED_SPOOL_CLAIM_TIMEOUT`` seconds (defaults to 60)
+    ago. Only one flush at a time applies changes, so changes for the same
+    assignment are written to the database in the order they were added.
+
+    Returns:
+        A ``(claim, rows)`` tuple, where ``rows`` is a list of
+        ``(id, user_id, assignment_id, howsolved)`` tuples ordered by ID.
+    """
+    claim = uuid.uuid4().hex
+    now = time.time()
+    with _immediate_transaction(connection):
+        # Release the claims of flushes that did not finish, like a killed process
+        connection.execute('UPDATE howsolved_change SET claim = NULL, claimed_time = NULL '
+                           'WHERE claim IS NOT NULL AND claimed_time < ?',
+                           (now - get_claim_timeout(),))
+        if connection.execute('SELECT 1 FROM howsolved_change WHERE claim IS NOT NULL '
+                              'LIMIT 1').fetchone():
+            return claim, []
+        connection.execute('UPDATE howsolved_change SET claim = ?, claimed_time = ?',
+                           (claim, now))
+    rows = connection.execute(
+        'SELECT id, user_id, assignment_id, howsolved FROM howsolved_change '
+        'WHERE claim = ? ORDER BY id', (claim,)).fetchall()
+    return claim, rows
+
+
+def flush():
+    """
+    Write all the spooled changes to the database in one transaction.
+
+    The changes are claimed and the spool transaction is committed before the
+    changes are written to the database. The claimed changes are removed from the
+    spool after they are committed to the database, or released if writing them
+    fails.
+
+    Returns:
+        The number of changes written.
+    """
+    connection = _get_connection()
+    claim, rows = _claim_changes(connection)
+    if not rows:
+        return 0
+    changes_by_user_id = {}
+    for change_id, user_id, assignment_id, howsolved in rows:
+        changes_by_user_id.setdefault(user_id, {})[assignment_id] = howsolved
+    try:
+        _apply_changes(changes_by_user_id)
+    except BaseException:
+        with _immediate_transaction(connection):
+            connection.execute('UPDATE howsolved_change SET claim = NULL, claimed_time = NULL '
+                               'WHERE claim = ?', (claim,))
+        raise
+    with _immediate_transaction(connection):
+        connection.execute('DELETE FROM howsolved_change WHERE claim = ?', (claim,))
+    return len(rows)
+
+
+_flusher_lock = threading.Lock()
+_flusher = None
+
+
+def _run_flusher():
+    while True:
+        time.sleep(get_flush_interval())
+        try:
+            flush()
+        except Exception:
+            logger.exception('Failed to flush the HowSolved spool.')
+        finally:
+            db.close_old_connections()
+
+
+def start_flusher():
+    """
+    Start the thread that flushes the spool in this process if it is not running.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is not None and _flusher[0] == os.getpid() and _flusher[1].is_alive():
+            return
+        thread = threading.Thread(target=_run_flusher, name='trix-howsolved-spool', daemon=True)
+        thread.start()
+        _flusher = (os.getpid(), thread)
+    atexit.register(flush)
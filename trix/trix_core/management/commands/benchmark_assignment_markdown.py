@@ -0,0 +1,64 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from trix.trix_core import trix_markdown
+
+
+SAMPLE_MARKDOWN = """
+# Arrays
+
+Write a program that reads **ten** numbers into an array, and prints them
+in reverse order.
+
+- Use a `for`-loop.
+- Do not use `Collections.reverse`.
+
+```java
+int[] numbers = new int[10];
+for (int i = 0; i < numbers.length; i++) {
+    numbers[i] = scanner.nextInt();
+}
+```
+
+| Input | Output |
+|-------|--------|
+| 1 2 3 | 3 2 1  |
+
+Array
+:   A fixed size sequence of values.
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark the per-call cost of trix_markdown.assignment_markdown, '
+        'comparing the reused per-thread converter with creating a new converter '
+        'for each call.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=500,
+            help='Number of conversions per measurement. Defaults to 500.')
+
+    def _convert_with_new_converter(self):
+        trix_markdown.make_assignment_markdown_converter().convert(SAMPLE_MARKDOWN)
+
+    def _convert_with_reused_converter(self):
+        trix_markdown.assignment_markdown(SAMPLE_MARKDOWN)
+
+    def _report(self, label, seconds, iterations):
+        self.stdout.write('{}: {:.1f} us/call'.format(label, seconds / iterations * 1000000))
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # Warm up, so both measurements use already imported extensions and compiled regexes
+        self._convert_with_new_converter()
+        self._convert_with_reused_converter()
+
+        new_seconds = timeit.timeit(self._convert_with_new_converter, number=iterations)
+        reused_seconds = timeit.timeit(self._convert_with_reused_converter, number=iterations)
+        self._report('New converter per call', new_seconds, iterations)
+        self._report('Reused per-thread converter', reused_seconds, iterations)
+        self.stdout.write('Speedup: {:.2f}x'.format(new_seconds / reused_seconds))
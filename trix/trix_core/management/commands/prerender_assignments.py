@@ -0,0 +1,105 @@
+import time
+from concurrent import futures
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from trix.trix_core import models as coremodels
+from trix.trix_core import trix_markdown
+
+
+def render_assignment(assignment_id, text, solution):
+    """
+    Render the markdown for a single assignment.
+
+    Runs in the worker processes, so it must not touch the database.
+
+    Returns:
+        A ``(assignment_id, fields)`` tuple where ``fields`` is a dict
+        with the rendered markdown fields for the assignment. Fields where
+        rendering timed out are left out, so they are rendered again later.
+    """
+    fields = {}
+    for fieldname, source in (('text', text), ('solution', solution)):
+        rendered = trix_markdown.render_assignment_markdown(source, assignment_id=assignment_id)
+        if rendered.cacheable:
+            fields['{}_html'.format(fieldname)] = str(rendered.html)
+            fields['{}_html_key'.format(fieldname)] = trix_markdown.assignment_markdown_key(source)
+    return assignment_id, fields
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the markdown for assignment texts and solutions into the cache on the '
+        'Assignment objects. Only assignments where the cached HTML is stale are rendered '
+        'unless you use --force.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course-tag', dest='course_tag', default=None,
+            help='Only render assignments with this tag (typically a course tag).')
+        parser.add_argument(
+            '--period-tag', dest='period_tag', default=None,
+            help='Only render assignments with this tag (typically a period tag).')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of worker processes. Defaults to the number of CPUs. '
+                 'Use 1 to render in this process.')
+        parser.add_argument(
+            '--force', action='store_true', default=False,
+            help='Render all the matching assignments, even if the cached HTML is up to date.')
+
+    def get_queryset(self, options):
+        queryset = coremodels.Assignment.objects.all()
+        for tag in (options['course_tag'], options['period_tag']):
+            if tag:
+                queryset = queryset.filter(tags__tag=tag)
+        return queryset.order_by('id')
+
+    def _get_assignments_to_render(self, options):
+        rows = self.get_queryset(options)\
+            .values_list('id', 'text', 'solution', 'text_html_key', 'solution_html_key')\
+            .iterator()
+        for assignment_id, text, solution, text_html_key, solution_html_key in rows:
+            is_stale = (
+                text_html_key != trix_markdown.assignment_markdown_key(text) or
+                solution_html_key != trix_markdown.assignment_markdown_key(solution))
+            if options['force'] or is_stale:
+                yield assignment_id, text, solution
+
+    def _iter_rendered(self, assignments, workers):
+        if workers == 1:
+            for assignment in assignments:
+                yield render_assignment(*assignment)
+        else:
+            # Do not let the worker processes inherit open database connections
+            connections.close_all()
+            with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = [executor.submit(render_assignment, *assignment)
+                           for assignment in assignments]
+                for future in futures.as_completed(pending):
+                    yield future.result()
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        assignments = list(self._get_assignments_to_render(options))
+        total = len(assignments)
+        if not total:
+            self.stdout.write('All assignments are already rendered.')
+            return
+        self.stdout.write('Rendering {} assignments...'.format(total))
+
+        progress_interval = max(1, total // 20)
+        rendered_count = 0
+        for assignment_id, fields in self._iter_rendered(assignments, options['workers']):
+            if fields:
+                coremodels.Assignment.objects.filter(id=assignment_id).update(**fields)
+            rendered_count += 1
+            if rendered_count % progress_interval == 0 or rendered_count == total:
+                self.stdout.write('  {}/{} ({:.0f}%)'.format(
+                    rendered_count, total, rendered_count / total * 100))
+
+        elapsed = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            'Rendered {} assignments in {:.2f} seconds ({:.1f} assignments/second).'.format(
+                rendered_count, elapsed, rendered_count / elapsed if elapsed else rendered_count)))
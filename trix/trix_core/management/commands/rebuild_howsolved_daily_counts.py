@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from trix.trix_core import models as coremodels
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the daily HowSolved counts used for the statistics from the HowSolved objects. '
+        'The counts are kept up to date when students change how they solved an assignment, '
+        'so this is only needed if HowSolved objects are changed in other ways.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course-tag', dest='course_tag', default=None,
+            help='Only rebuild the counts for assignments with this tag (typically a course tag).')
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        assignment_ids = None
+        if options['course_tag']:
+            assignment_ids = list(coremodels.Assignment.objects
+                                  .filter(tags__tag=options['course_tag'])
+                                  .values_list('id', flat=True))
+        count_count = coremodels.HowSolvedDailyCount.objects.rebuild(assignment_ids)
+        self.stdout.write(self.style.SUCCESS(
+            'Created {} daily counts in {:.2f} seconds.'.format(
+                count_count, time.time() - start_time)))
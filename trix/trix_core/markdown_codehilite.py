@@ -0,0 +1,195 @@
+"""
+Markdown extensions that memoize the Pygments highlighting done by
+``markdown.extensions.codehilite`` and ``markdown.extensions.fenced_code``.
+
+Assignments often share the same code snippets, and highlighting is the most
+expensive part of rendering assignment markdown. The extensions in this module
+produce exactly the same output as the ones they extend, but look up the
+highlighted HTML for each code block in :obj:`highlight_cache` before running
+Pygments.
+"""
+import collections
+import hashlib
+import threading
+
+from django.conf import settings
+from markdown.extensions import codehilite
+from markdown.extensions import fenced_code
+
+
+class HighlightCache(object):
+    """
+    A thread safe LRU cache for highlighted code blocks.
+
+    Parameters:
+        maxsize: The maximum number of code blocks to keep in the cache.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get the cached HTML for ``key``, or ``None`` if it is not cached.
+        """
+        with self._lock:
+            try:
+                self._items.move_to_end(key)
+            except KeyError:
+                return None
+            return self._items[key]
+
+    def set(self, key, html):
+        """
+        Cache ``html`` for ``key``, evicting the least recently used code block
+        if the cache is full.
+        """
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _check_deadline(md):
+    # The deadline is added by trix.trix_core.trix_markdown.RenderDeadlineExtension.
+    # We check it before each code block, outside the highlight_cache lock.
+    deadline = getattr(md, 'render_deadline', None)
+    if deadline is not None:
+        deadline.check()
+
+
+#: The cache used by :class:`.CachedCodeHilite`.
+highlight_cache = HighlightCache(
+    maxsize=getattr(settings, 'TRIX_MARKDOWN_HIGHLIGHT_CACHE_SIZE', 2000))
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """
+    ``CodeHilite`` that memoizes :meth:`.hilite` on the language, the
+    highlighting options and a hash of the code.
+    """
+    def _get_cache_key(self):
+        return (
+            self.lang,
+            self.linenums,
+            self.guess_lang,
+            self.css_class,
+            self.style,
+            self.noclasses,
+            self.tab_length,
+            tuple(self.hl_lines),
+            self.use_pygments,
+            hashlib.sha1(self.src.encode('utf-8')).hexdigest(),
+        )
+
+    def hilite(self):
+        # NOTE: We create the key before calling hilite() since it changes self.src and self.lang
+        key = self._get_cache_key()
+        html = highlight_cache.get(key)
+        if html is None:
+            html = super(CachedCodeHilite, self).hilite()
+            highlight_cache.set(key, html)
+        return html
+
+
+class CachedHiliteTreeprocessor(codehilite.HiliteTreeprocessor):
+    """
+    ``HiliteTreeprocessor`` (indented code blocks) using :class:`.CachedCodeHilite`.
+    """
+    def run(self, root):
+        blocks = root.iter('pre')
+        for block in blocks:
+            if len(block) == 1 and block[0].tag == 'code':
+                _check_deadline(self.markdown)
+                code = CachedCodeHilite(
+                    block[0].text,
+                    linenums=self.config['linenums'],
+                    guess_lang=self.config['guess_lang'],
+                    css_class=self.config['css_class'],
+                    style=self.config['pygments_style'],
+                    noclasses=self.config['noclasses'],
+                    tab_length=self.markdown.tab_length,
+                    use_pygments=self.config['use_pygments']
+                )
+                placeholder = self.markdown.htmlStash.store(code.hilite(), safe=True)
+                # Clear codeblock in etree instance, and change it to a p element
+                # which is removed when the raw html is inserted.
+                block.clear()
+                block.tag = 'p'
+                block.text = placeholder
+
+
+class CachedCodeHiliteExtension(codehilite.CodeHiliteExtension):
+    """
+    Drop in replacement for ``markdown.extensions.codehilite`` using
+    :class:`.CachedHiliteTreeprocessor`.
+    """
+    def extendMarkdown(self, md, md_globals):
+        hiliter = CachedHiliteTreeprocessor(md)
+        hiliter.config = self.getConfigs()
+        md.treeprocessors.add('hilite', hiliter, '<inline')
+        md.registerExtension(self)
+
+
+class CachedFencedBlockPreprocessor(fenced_code.FencedBlockPreprocessor):
+    """
+    ``FencedBlockPreprocessor`` using :class:`.CachedCodeHilite`.
+    """
+    def run(self, lines):
+        # Check for code hilite extension
+        if not self.checked_for_codehilite:
+            for ext in self.markdown.registeredExtensions:
+                if isinstance(ext, codehilite.CodeHiliteExtension):
+                    self.codehilite_conf = ext.config
+                    break
+            self.checked_for_codehilite = True
+
+        text = '\n'.join(lines)
+        while True:
+            m = self.FENCED_BLOCK_RE.search(text)
+            if not m:
+                break
+            _check_deadline(self.markdown)
+            if self.codehilite_conf:
+                highliter = CachedCodeHilite(
+                    m.group('code'),
+                    linenums=self.codehilite_conf['linenums'][0],
+                    guess_lang=self.codehilite_conf['guess_lang'][0],
+                    css_class=self.codehilite_conf['css_class'][0],
+                    style=self.codehilite_conf['pygments_style'][0],
+                    use_pygments=self.codehilite_conf['use_pygments'][0],
+                    lang=(m.group('lang') or None),
+                    noclasses=self.codehilite_conf['noclasses'][0],
+                    hl_lines=codehilite.parse_hl_lines(m.group('hl_lines'))
+                )
+                code = highliter.hilite()
+            else:
+                lang = ''
+                if m.group('lang'):
+                    lang = self.LANG_TAG % m.group('lang')
+                code = self.CODE_WRAP % (lang, self._escape(m.group('code')))
+
+            placeholder = self.markdown.htmlStash.store(code, safe=True)
+            text = '%s\n%s\n%s' % (text[:m.start()], placeholder, text[m.end():])
+        return text.split('\n')
+
+
+class CachedFencedCodeExtension(fenced_code.FencedCodeExtension):
+    """
+    Drop in replacement for ``markdown.extensions.fenced_code`` using
+    :class:`.CachedFencedBlockPreprocessor`.
+    """
+    def extendMarkdown(self, md, md_globals):
+        md.registerExtension(self)
+        md.preprocessors.add('fenced_code_block',
+                             CachedFencedBlockPreprocessor(md),
+                             '>normalize_whitespace')
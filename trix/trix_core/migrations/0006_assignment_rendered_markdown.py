@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 11:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trix_core', '0005_auto_20190818_2150'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='solution_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='solution_html_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='text_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='text_html_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+    ]
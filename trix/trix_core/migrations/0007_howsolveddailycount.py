@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 12:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def populate_howsolveddailycount(apps, schema_editor):
+    HowSolved = apps.get_model('trix_core', 'HowSolved')
+    HowSolvedDailyCount = apps.get_model('trix_core', 'HowSolvedDailyCount')
+    rows = HowSolved.objects\
+        .annotate(solved_date=TruncDate('solved_datetime'))\
+        .values('assignment_id', 'solved_date', 'howsolved')\
+        .annotate(howsolved_count=Count('id'))\
+        .order_by()
+    HowSolvedDailyCount.objects.bulk_create(
+        (HowSolvedDailyCount(assignment_id=row['assignment_id'],
+                             day=row['solved_date'],
+                             howsolved=row['howsolved'],
+                             count=row['howsolved_count'])
+         for row in rows.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trix_core', '0006_assignment_rendered_markdown'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HowSolvedDailyCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('howsolved', models.CharField(choices=[('bymyself', 'Solved by myself'), ('withhelp', 'Solved with help')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='trix_core.Assignment')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='howsolveddailycount',
+            unique_together=set([('assignment', 'day', 'howsolved')]),
+        ),
+        migrations.RunPython(populate_howsolveddailycount, migrations.RunPython.noop),
+    ]
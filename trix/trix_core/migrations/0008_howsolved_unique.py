@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 12:22
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+
+
+def delete_duplicate_howsolved(apps, schema_editor):
+    """
+    Keep only the most recent HowSolved object for each user and assignment,
+    and recount the daily counts for the assignments that had duplicates.
+    """
+    HowSolved = apps.get_model('trix_core', 'HowSolved')
+    HowSolvedDailyCount = apps.get_model('trix_core', 'HowSolvedDailyCount')
+    duplicates = HowSolved.objects\
+        .values('assignment_id', 'user_id')\
+        .annotate(max_id=Max('id'), howsolved_count=Count('id'))\
+        .filter(howsolved_count__gt=1)\
+        .order_by()
+    assignment_ids = set()
+    for row in list(duplicates):
+        HowSolved.objects\
+            .filter(assignment_id=row['assignment_id'], user_id=row['user_id'])\
+            .exclude(id=row['max_id'])\
+            .delete()
+        assignment_ids.add(row['assignment_id'])
+    if not assignment_ids:
+        return
+
+    assignment_ids = list(assignment_ids)
+    HowSolvedDailyCount.objects.filter(assignment_id__in=assignment_ids).delete()
+    rows = HowSolved.objects\
+        .filter(assignment_id__in=assignment_ids)\
+        .annotate(solved_date=TruncDate('solved_datetime'))\
+        .values('assignment_id', 'solved_date', 'howsolved')\
+        .annotate(howsolved_count=Count('id'))\
+        .order_by()
+    HowSolvedDailyCount.objects.bulk_create(
+        (HowSolvedDailyCount(assignment_id=row['assignment_id'],
+                             day=row['solved_date'],
+                             howsolved=row['howsolved'],
+                             count=row['howsolved_count'])
+         for row in rows.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trix_core', '0007_howsolveddailycount'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_howsolved, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='howsolved',
+            unique_together=set([('assignment', 'user')]),
+        ),
+    ]
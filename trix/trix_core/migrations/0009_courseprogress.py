@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 12:23
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trix_core', '0008_howsolved_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_solved', models.IntegerField(default=0)),
+                ('course_tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trix_core.Tag')),
+                ('period_tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='trix_core.Tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='courseprogress',
+            unique_together=set([('user', 'course_tag', 'period_tag')]),
+        ),
+    ]
@@ -1,10 +1,27 @@
+import array
+import collections
 import re
+import uuid
+from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db import connections
 from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser
 from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.models import PermissionsMixin
 
+from trix.trix_core import cacheutils
+from trix.trix_core import trix_markdown
+
 
 class TrixUserManager(BaseUserManager):
 
@@ -85,17 +102,58 @@ class User(AbstractBaseUser, PermissionsMixin):
         """
         return self.email
 
+    def get_course_roles(self):
+        """
+        Get the IDs of the courses the user is admin and owner on.
+
+        The roles are loaded with a single query the first time this is called on
+        the User object, and cached on the object. Since ``request.user`` is loaded
+        once per request, the roles are only loaded once per request.
+
+        Returns:
+            A ``(admin_course_ids, owner_course_ids)`` tuple of frozensets.
+        """
+        if not hasattr(self, '_course_roles'):
+            admin_rows = Course.admins.through.objects\
+                .filter(user_id=self.id)\
+                .annotate(role=models.Value('admin', output_field=models.CharField()))\
+                .values_list('course_id', 'role')
+            owner_rows = Course.owner.through.objects\
+                .filter(user_id=self.id)\
+                .annotate(role=models.Value('owner', output_field=models.CharField()))\
+                .values_list('course_id', 'role')
+            course_ids = {'admin': set(), 'owner': set()}
+            for course_id, role in admin_rows.union(owner_rows, all=True):
+                course_ids[role].add(course_id)
+            self._course_roles = (frozenset(course_ids['admin']), frozenset(course_ids['owner']))
+        return self._course_roles
+
+    def clear_course_roles_cache(self):
+        """
+        Make :meth:`.get_course_roles` load the roles again the next time it is called.
+        """
+        self.__dict__.pop('_course_roles', None)
+
     def is_admin_on_anything(self):
         if self.is_staff:
             return True
         else:
-            return Course.objects.filter(admins=self).exists()
+            admin_course_ids, owner_course_ids = self.get_course_roles()
+            return bool(admin_course_ids)
+
+    def is_course_admin(self, course):
+        if self.is_staff:
+            return True
+        else:
+            admin_course_ids, owner_course_ids = self.get_course_roles()
+            return course.id in admin_course_ids
 
     def is_course_owner(self, course):
         if self.is_staff:
             return True
         else:
-            return self.owner.filter(id=course.id).exists()
+            admin_course_ids, owner_course_ids = self.get_course_roles()
+            return course.id in owner_course_ids
 
     @property
     def is_staff(self):
@@ -214,6 +272,92 @@ class Course(models.Model):
     def __str__(self):
         return self.course_tag.tag
 
+    #: Cache namespace for the version of the assignments and tags shown on the course pages.
+    CONTENT_CACHE_NAMESPACE = 'course-content'
+
+    #: Key for the content version shared by all the permalinks in :obj:`.CONTENT_CACHE_NAMESPACE`.
+    PERMALINK_CONTENT_CACHE_KEY = 'permalinks'
+
+    @classmethod
+    def get_content_cache_version(cls, course_id):
+        """
+        Get the version of the cached pages for the course with ID ``course_id``.
+
+        Changes when the course, or the assignments or tags in the course, change.
+        """
+        return cacheutils.get_version(cls.CONTENT_CACHE_NAMESPACE, course_id)
+
+    @classmethod
+    def get_permalink_content_cache_version(cls):
+        """
+        Get the version of the cached permalink pages.
+
+        Changes when the content of any course or any permalink changes.
+        """
+        return cacheutils.get_version(cls.CONTENT_CACHE_NAMESPACE, cls.PERMALINK_CONTENT_CACHE_KEY)
+
+    @classmethod
+    def bump_content_cache_version(cls, course_ids=None, tag_ids=None):
+        """
+        Invalidate the cached pages for courses, and for all the permalinks.
+
+        Parameters:
+            course_ids: List of course IDs.
+            tag_ids: List of tag IDs. Invalidates the pages for the courses with
+                any of these course tags.
+
+        Invalidates the pages for all courses if both ``course_ids`` and ``tag_ids``
+        are ``None``.
+        """
+        if course_ids is None and tag_ids is None:
+            course_ids = cls.objects.values_list('id', flat=True)
+        else:
+            course_ids = set(course_ids or [])
+            if tag_ids:
+                course_ids.update(cls.objects
+                                  .filter(course_tag_id__in=tag_ids)
+                                  .values_list('id', flat=True))
+        for course_id in course_ids:
+            cacheutils.bump_version(cls.CONTENT_CACHE_NAMESPACE, course_id)
+        cacheutils.bump_version(cls.CONTENT_CACHE_NAMESPACE, cls.PERMALINK_CONTENT_CACHE_KEY)
+
+    #: Cache namespace for the version of the statistics for a course.
+    STATISTICS_CACHE_NAMESPACE = 'course-statistics'
+
+    @classmethod
+    def get_statistics_cache_version(cls, course_id):
+        """
+        Get the version of the cached statistics for the course with ID ``course_id``.
+
+        Changes when the HowSolved objects for any of the assignments in the course change.
+        """
+        return cacheutils.get_version(cls.STATISTICS_CACHE_NAMESPACE, course_id)
+
+    @classmethod
+    def bump_statistics_cache_version(cls, assignment_ids=None):
+        """
+        Invalidate the cached statistics for the courses the given assignments belong to
+        now, and again when the current transaction is committed in case they were
+        cached from the data before the commit.
+
+        Parameters:
+            assignment_ids: List of assignment IDs. Invalidates the statistics for
+                all courses if this is ``None``.
+        """
+        course_ids = cls.objects.values_list('id', flat=True)
+        if assignment_ids is not None:
+            course_ids = course_ids\
+                .filter(course_tag__assignment__id__in=assignment_ids)\
+                .distinct()
+        course_ids = list(course_ids)
+
+        def bump_versions():
+            for course_id in course_ids:
+                cacheutils.bump_version(cls.STATISTICS_CACHE_NAMESPACE, course_id)
+
+        bump_versions()
+        transaction.on_commit(bump_versions)
+
 
 class AssignmentQuerySet(models.query.QuerySet):
     """ AssignmentQuerySet
@@ -266,6 +410,21 @@ class Assignment(models.Model):
         default=False,
         verbose_name=_('Hide assignment from students'))
 
+    # Cache of the rendered markdown for text and solution. The ``*_html_key``
+    # fields hold the trix_markdown.assignment_markdown_key() of the source the
+    # HTML was rendered from, so stale HTML is detected by comparing keys.
+    text_html = models.TextField(
+        blank=True, null=False, default='', editable=False)
+    text_html_key = models.CharField(
+        max_length=40, blank=True, null=False, default='', editable=False)
+    solution_html = models.TextField(
+        blank=True, null=False, default='', editable=False)
+    solution_html_key = models.CharField(
+        max_length=40, blank=True, null=False, default='', editable=False)
+
+    #: The fields with markdown that we cache the rendered HTML for.
+    RENDERED_MARKDOWN_FIELDS = ['text', 'solution']
+
     objects = AssignmentManager()
 
     class Meta:
@@ -280,6 +439,20 @@ class Assignment(models.Model):
     def readable_id(self):
         return str(self.id)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        assignment = super(Assignment, cls).from_db(db, field_names, values)
+        if 'hidden' in assignment.__dict__:
+            assignment._loaded_hidden = assignment.hidden
+        return assignment
+
+    def hidden_changed(self):
+        """
+        Check if :obj:`.hidden` has changed since the assignment was loaded from
+        the database or saved. Returns ``True`` if we do not know the stored value.
+        """
+        return not hasattr(self, '_loaded_hidden') or self._loaded_hidden != self.hidden
+
     def _normalize_text(self, text):
         # Normalize newlines. Just makes sure newlines is \n,
         # does not remove any empty lines or anything like that.
@@ -296,18 +469,399 @@ class Assignment(models.Model):
         self.text = self._normalize_text(self.text)
         self.solution = self._normalize_text(self.solution)
 
+    def refresh_rendered_markdown(self, fieldnames=None):
+        """
+        Render any of the :obj:`.RENDERED_MARKDOWN_FIELDS` where the cached HTML
+        is stale.
+
+        Does not save the assignment.
+
+        Parameters:
+            fieldnames: Only refresh these fields. Defaults to
+                :obj:`.RENDERED_MARKDOWN_FIELDS`.
+
+        If rendering a field times out, the fallback HTML is set on the object,
+        but the field is not marked as rendered, and not included in the
+        returned list.
+
+        Returns:
+            A list with the names of the model fields that was changed.
+        """
+        changed_fields = []
+        for fieldname in fieldnames or self.RENDERED_MARKDOWN_FIELDS:
+            source = getattr(self, fieldname)
+            key = trix_markdown.assignment_markdown_key(source)
+            if getattr(self, '{}_html_key'.format(fieldname)) != key:
+                rendered = trix_markdown.render_assignment_markdown(source, assignment_id=self.id)
+                setattr(self, '{}_html'.format(fieldname), str(rendered.html))
+                if rendered.cacheable:
+                    setattr(self, '{}_html_key'.format(fieldname), key)
+                    changed_fields.extend(['{}_html'.format(fieldname),
+                                           '{}_html_key'.format(fieldname)])
+                else:
+                    # Rendering timed out. Clear the key so we try again next time.
+                    setattr(self, '{}_html_key'.format(fieldname), '')
+        return changed_fields
+
+    def _get_rendered_markdown(self, fieldname):
+        changed_fields = self.refresh_rendered_markdown(fieldnames=[fieldname])
+        if changed_fields and self.pk:
+            # Store the HTML so the next request is a lookup. We use update() to
+            # avoid touching lastupdate_datetime.
+            Assignment.objects.filter(pk=self.pk).update(**{
+                changed_field: getattr(self, changed_field)
+                for changed_field in changed_fields})
+        return mark_safe(getattr(self, '{}_html'.format(fieldname)))
+
+    def get_text_html(self):
+        """
+        Get :obj:`.text` rendered with :func:`trix.trix_core.trix_markdown.assignment_markdown`.
+
+        Uses the cached HTML unless the text has changed since it was rendered.
+        """
+        return self._get_rendered_markdown('text')
+
+    def get_solution_html(self):
+        """
+        Get :obj:`.solution` rendered with
+        :func:`trix.trix_core.trix_markdown.assignment_markdown`.
+
+        Uses the cached HTML unless the solution has changed since it was rendered.
+        """
+        return self._get_rendered_markdown('solution')
+
+    def has_solution(self):
+        """
+        Check if the assignment has a solution.
+
+        Uses the ``solution_exists`` annotation when the queryset defers :obj:`.solution`,
+        so the check does not load the solution.
+        """
+        if hasattr(self, 'solution_exists'):
+            return bool(self.solution_exists)
+        return bool(self.solution)
+
+    def save(self, *args, **kwargs):
+        changed_fields = self.refresh_rendered_markdown()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and changed_fields:
+            kwargs['update_fields'] = list(update_fields) + changed_fields
+        super(Assignment, self).save(*args, **kwargs)
+        if update_fields is None or 'hidden' in update_fields:
+            self._loaded_hidden = self.hidden
+
+
+def _supports_upsert_returning(connection):
+    """
+    Check if ``connection`` supports ``INSERT ... ON CONFLICT ... RETURNING``.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    # RETURNING was added in SQLite 3.35. Check the version of the library Python
+    # is linked with, not the version of the sqlite3 module.
+    return tuple(connection.Database.sqlite_version_info) >= (3, 35)
+
+
+class HowSolvedManager(models.Manager):
+    """
+    Manager for :class:`.HowSolved`.
+
+    Use :meth:`.set_howsolved` and :meth:`.clear_howsolved` to change how
+    a user solved an assignment. They keep :class:`.HowSolvedDailyCount` and
+    :class:`.CourseProgress` in sync with the HowSolved objects, and invalidate the
+    cached map returned by :meth:`.get_howsolved_map`.
+    """
+
+    #: Cache namespace for the map of how a user solved the assignments.
+    HOWSOLVED_MAP_CACHE_NAMESPACE = 'howsolved-map'
+
+    def _get_howsolved_map_cache_key(self, user_id):
+        return cacheutils.make_key(self.HOWSOLVED_MAP_CACHE_NAMESPACE, user_id)
+
+    def get_howsolved_map_cache_timeout(self):
+        """
+        Get the number of seconds to cache :meth:`.get_howsolved_map` for.
+
+        Defaults to 300 seconds with a shared cache. The map is not cached by
+        default when the cache is local to each process, since a change made in
+        one process would not be seen by the others until the map expires.
+        """
+        default = 300 if cacheutils.is_shared_cache() else 0
+        return getattr(settings, 'TRIX_HOWSOLVED_MAP_CACHE_TIMEOUT', default)
+
+    def get_howsolved_map(self, user):
+        """
+        Get how ``user`` (a User object or ID) solved the assignments.
+
+        The map is cached for :meth:`.get_howsolved_map_cache_timeout` seconds as two
+        compact arrays, with the assignment IDs and with the index of the howsolved
+        value in :obj:`.HowSolved.HOWSOLVED_CHOICES`.
+
+        Returns:
+            A dict mapping assignment IDs to ``howsolved`` values.
+        """
+        user_id = getattr(user, 'id', user)
+        choices = [choice for choice, label in HowSolved.HOWSOLVED_CHOICES]
+        timeout = self.get_howsolved_map_cache_timeout()
+        cache_key = self._get_howsolved_map_cache_key(user_id)
+        cached = cache.get(cache_key) if timeout else None
+        if cached is None:
+            assignment_ids = array.array('q')
+            howsolved_indexes = array.array('b')
+            for assignment_id, howsolved in self.filter(user_id=user_id)\
+                    .values_list('assignment_id', 'howsolved').iterator():
+                assignment_ids.append(assignment_id)
+                howsolved_indexes.append(choices.index(howsolved))
+            cached = (assignment_ids.tobytes(), howsolved_indexes.tobytes())
+            if timeout:
+                cache.set(cache_key, cached, timeout)
+        assignment_ids = array.array('q', cached[0])
+        howsolved_indexes = array.array('b', cached[1])
+        return {assignment_id: choices[howsolved_index]
+                for assignment_id, howsolved_index in zip(assignment_ids, howsolved_indexes)}
+
+    def invalidate_howsolved_map(self, user):
+        """
+        Invalidate the cached :meth:`.get_howsolved_map` for ``user`` (a User object or ID)
+        now, and again when the current transaction is committed in case it was cached
+        from the data before the commit.
+        """
+        if not self.get_howsolved_map_cache_timeout():
+            return
+        cache_key = self._get_howsolved_map_cache_key(getattr(user, 'id', user))
+        cache.delete(cache_key)
+        transaction.on_commit(lambda: cache.delete(cache_key))
+
+    def _supports_upsert_returning(self):
+        return _supports_upsert_returning(connections[self.db])
+
+    def _insert_missing(self, user_id, changes, solved_datetime):
+        """
+        Create HowSolved objects for the user with a single
+        ``INSERT ... SELECT ... WHERE EXISTS ... ON CONFLICT DO NOTHING`` statement.
+
+        The ``WHERE EXISTS`` subquery skips changes for assignments that do not exist,
+        and ``ON CONFLICT DO NOTHING`` skips the assignments the user already has a
+        HowSolved object for, without separate queries.
+
+        Parameters:
+            user_id: The ID of the user.
+            changes: Dict mapping assignment IDs to ``howsolved`` values.
+            solved_datetime: The ``solved_datetime`` of the created HowSolved objects.
+
+        Returns:
+            Dict mapping assignment IDs to the created HowSolved objects.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        changes_sql = ' UNION ALL '.join(
+            ['SELECT %s AS {assignment_id}, %s AS {howsolved}'] * len(changes))
+        sql = 'INSERT INTO {table} ({assignment_id}, {user_id}, {howsolved}, {solved_datetime}) '\
+              'SELECT changes.{assignment_id}, %s, changes.{howsolved}, %s '\
+              'FROM ({changes_sql}) changes '\
+              'WHERE EXISTS (SELECT 1 FROM {assignment_table} '\
+              'WHERE {assignment_table}.{id} = changes.{assignment_id}) '\
+              'ON CONFLICT ({assignment_id}, {user_id}) DO NOTHING '\
+              'RETURNING {assignment_id}, {id}'
+        names = dict(
+            table=quote_name(self.model._meta.db_table),
+            assignment_table=quote_name(Assignment._meta.db_table),
+            id=quote_name('id'),
+            assignment_id=quote_name('assignment_id'),
+            user_id=quote_name('user_id'),
+            howsolved=quote_name('howsolved'),
+            solved_datetime=quote_name('solved_datetime'))
+        sql = sql.format(changes_sql=changes_sql.format(**names), **names)
+        params = [user_id, self.model._meta.get_field('solved_datetime')
+                  .get_db_prep_value(solved_datetime, connection)]
+        for assignment_id, howsolved in changes.items():
+            params.extend([assignment_id, howsolved])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return {assignment_id: self.model(id=howsolvedobject_id, assignment_id=assignment_id,
+                                          user_id=user_id, howsolved=changes[assignment_id],
+                                          solved_datetime=solved_datetime)
+                for assignment_id, howsolvedobject_id in rows}
+
+    def _create_missing(self, user_id, changes):
+        """
+        :meth:`._insert_missing` for databases without ``ON CONFLICT ... RETURNING``.
+        """
+        existing_assignment_ids = set(Assignment.objects
+                                      .filter(id__in=list(changes.keys()))
+                                      .values_list('id', flat=True))
+        created = {}
+        for assignment_id, howsolved in changes.items():
+            if assignment_id not in existing_assignment_ids:
+                continue
+            try:
+                with transaction.atomic():
+                    created[assignment_id] = self.create(
+                        assignment_id=assignment_id, user_id=user_id, howsolved=howsolved)
+            except IntegrityError:
+                # Created by a concurrent request
+                pass
+        return created
+
+    def _write_howsolved(self, user_id, changes, retry=True):
+        """
+        Write ``changes`` (see :meth:`.set_howsolved_many`) for the user. Must be
+        called in a transaction.
+
+        Returns:
+            A ``(previous, current)`` tuple of dicts mapping the IDs of the changed
+            assignments to their HowSolved objects before and after the changes.
+        """
+        solved_datetime = timezone.now()
+        previous = {
+            howsolvedobject.assignment_id: howsolvedobject
+            for howsolvedobject in self.select_for_update()
+            .filter(user_id=user_id, assignment_id__in=list(changes.keys()))}
+        current = {}
+
+        cleared_ids = [howsolvedobject.id for assignment_id, howsolvedobject in previous.items()
+                       if changes[assignment_id] is None]
+        if cleared_ids:
+            self.filter(id__in=cleared_ids).delete()
+
+        updated = {assignment_id: changes[assignment_id] for assignment_id in previous
+                   if changes[assignment_id] is not None}
+        for howsolved in sorted(set(updated.values())):
+            assignment_ids = [assignment_id for assignment_id, value in updated.items()
+                              if value == howsolved]
+            self.filter(id__in=[previous[assignment_id].id for assignment_id in assignment_ids])\
+                .update(howsolved=howsolved, solved_datetime=solved_datetime)
+            for assignment_id in assignment_ids:
+                current[assignment_id] = self.model(
+                    id=previous[assignment_id].id, assignment_id=assignment_id, user_id=user_id,
+                    howsolved=howsolved, solved_datetime=solved_datetime)
+
+        missing = {assignment_id: howsolved for assignment_id, howsolved in changes.items()
+                   if howsolved is not None and assignment_id not in previous}
+        if missing:
+            if self._supports_upsert_returning():
+                created = self._insert_missing(user_id, missing, solved_datetime)
+            else:
+                created = self._create_missing(user_id, missing)
+            current.update(created)
+            skipped_ids = [assignment_id for assignment_id in missing if assignment_id not in created]
+            if skipped_ids and retry:
+                # The assignments do not exist, or a concurrent request created the
+                # HowSolved objects after we locked the existing ones
+                concurrent = {assignment_id: missing[assignment_id]
+                              for assignment_id in Assignment.objects
+                              .filter(id__in=skipped_ids).values_list('id', flat=True)}
+                if concurrent:
+                    concurrent_previous, concurrent_current = self._write_howsolved(
+                        user_id, concurrent, retry=False)
+                    previous.update(concurrent_previous)
+                    current.update(concurrent_current)
+        return previous, current
+
+    def _change_howsolved(self, user_id, changes):
+        """
+        Write ``changes`` for the user, and update the data derived from the
+        HowSolved objects in the same transaction.
+
+        Returns:
+            See :meth:`._write_howsolved`.
+        """
+        with transaction.atomic():
+            CourseProgress.objects.lock_user(user_id)
+            previous, current = self._write_howsolved(user_id, changes)
+            HowSolvedDailyCount.objects.add_howsolved_changes(
+                removed=previous.values(), added=current.values())
+            CourseProgress.objects.add_howsolved_changes(
+                user_id=user_id,
+                removed_assignment_ids=set(previous).difference(current),
+                added_assignment_ids=set(current).difference(previous))
+            if previous or current:
+                Course.bump_statistics_cache_version(list(set(previous).union(current)))
+        self.invalidate_howsolved_map(user_id)
+        return previous, current
+
+    def set_howsolved(self, assignment, user, howsolved):
+        """
+        Set how ``user`` solved ``assignment``, and update :class:`.HowSolvedDailyCount`
+        and :class:`.CourseProgress`.
+
+        The existing HowSolved object is locked with ``SELECT ... FOR UPDATE``, and a
+        missing one is created with ``INSERT ... ON CONFLICT DO NOTHING`` on PostgreSQL
+        and SQLite, so concurrent requests from the same user (like double clicks) can
+        not create more than one HowSolved object or count it twice.
+
+        Raises:
+            Assignment.DoesNotExist: If the assignment does not exist.
+
+        Returns:
+            The created or updated HowSolved object.
+        """
+        assignment_id = getattr(assignment, 'id', assignment)
+        previous, current = self._change_howsolved(getattr(user, 'id', user),
+                                                   {assignment_id: howsolved})
+        if assignment_id not in current:
+            raise Assignment.DoesNotExist()
+        return current[assignment_id]
+
+    def clear_howsolved(self, assignment_id, user):
+        """
+        Delete the HowSolved object for ``user`` on the assignment with ID ``assignment_id``,
+        and update :class:`.HowSolvedDailyCount` and :class:`.CourseProgress`.
+
+        Raises:
+            HowSolved.DoesNotExist: If the user has not solved the assignment.
+        """
+        previous, current = self._change_howsolved(getattr(user, 'id', user),
+                                                   {assignment_id: None})
+        if assignment_id not in previous:
+            raise HowSolved.DoesNotExist()
+
+    def set_howsolved_many(self, user, changes):
+        """
+        Change how ``user`` solved several assignments in one transaction, and update
+        :class:`.HowSolvedDailyCount` and :class:`.CourseProgress`.
+
+        Uses a fixed number of statements instead of one :meth:`.set_howsolved` or
+        :meth:`.clear_howsolved` call per assignment: one to lock the existing
+        HowSolved objects, one ``DELETE`` for the cleared ones, one ``UPDATE`` per
+        ``howsolved`` value for the updated ones, and one ``INSERT`` for the created
+        ones on PostgreSQL and SQLite. Changes for assignments that do not exist are
+        skipped.
+
+        Parameters:
+            user: A User object or ID.
+            changes: Dict mapping assignment IDs to a ``howsolved`` value, or
+                to ``None`` to clear how the user solved the assignment. Clearing an
+                assignment the user has not solved does nothing.
+        """
+        if not changes:
+            return
+        self._change_howsolved(getattr(user, 'id', user), changes)
+
+    def clear_all_for_user(self, user):
+        """
+        Delete all the HowSolved objects for ``user``, and update :class:`.HowSolvedDailyCount`
+        and :class:`.CourseProgress`.
+        """
+        self.set_howsolved_many(user, dict.fromkeys(
+            self.filter(user=user).values_list('assignment_id', flat=True)))
+
 
 class HowSolved(models.Model):
     """
     This class holds information on how the assignment was solved.
     """
+    HOWSOLVED_CHOICES = [
+        ('bymyself', _('Solved by myself')),
+        ('withhelp', _('Solved with help')),
+    ]
     howsolved = models.CharField(
         max_length=10,
         null=False,
-        choices=[
-            ('bymyself', _('Solved by myself')),
-            ('withhelp', _('Solved with help')),
-        ]
+        choices=HOWSOLVED_CHOICES
     )
 
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
@@ -317,9 +871,289 @@ class HowSolved(models.Model):
         auto_now=True
     )
 
+    objects = HowSolvedManager()
+
+    class Meta:
+        unique_together = ('assignment', 'user')
+
     def __str__(self):
         return self.howsolved
 
+    def get_solved_date(self):
+        """
+        Get the date of :obj:`.solved_datetime` in the current timezone.
+
+        This is the same date as the ``solved_datetime__date`` lookup uses.
+        """
+        if timezone.is_aware(self.solved_datetime):
+            return timezone.localdate(self.solved_datetime)
+        return self.solved_datetime.date()
+
+
+class HowSolvedDailyCountManager(models.Manager):
+    def _get_keys_filter(self, keys):
+        keys_filter = Q()
+        for assignment_id, day, howsolved in keys:
+            keys_filter |= Q(assignment_id=assignment_id, day=day, howsolved=howsolved)
+        return keys_filter
+
+    def add_howsolved_changes(self, removed, added):
+        """
+        Update the counts after HowSolved objects were changed.
+
+        Parameters:
+            removed: The HowSolved objects as they were before they were
+                updated or deleted.
+            added: The created or updated HowSolved objects.
+        """
+        amounts = collections.Counter()
+        for howsolvedobject in removed:
+            amounts[howsolvedobject.assignment_id, howsolvedobject.get_solved_date(),
+                    howsolvedobject.howsolved] -= 1
+        for howsolvedobject in added:
+            amounts[howsolvedobject.assignment_id, howsolvedobject.get_solved_date(),
+                    howsolvedobject.howsolved] += 1
+        amounts = {key: amount for key, amount in amounts.items() if amount}
+        if len(amounts) > 1:
+            # Lock the rows in the same order in all transactions to avoid deadlocks
+            list(self.select_for_update()
+                 .filter(self._get_keys_filter(amounts.keys()))
+                 .order_by('assignment_id', 'day', 'howsolved')
+                 .values_list('id', flat=True))
+
+        increments = {key: amount for key, amount in amounts.items() if amount > 0}
+        if increments:
+            if _supports_upsert_returning(connections[self.db]):
+                self._upsert_increments(increments)
+            else:
+                for (assignment_id, day, howsolved), amount in sorted(increments.items()):
+                    self.add(assignment_id=assignment_id, day=day, howsolved=howsolved,
+                             amount=amount)
+
+        decrements = {key: amount for key, amount in amounts.items() if amount < 0}
+        for amount in set(decrements.values()):
+            self.filter(self._get_keys_filter(key for key, value in decrements.items()
+                                              if value == amount))\
+                .update(count=F('count') + amount)
+        if decrements:
+            self.filter(self._get_keys_filter(decrements.keys()), count__lte=0).delete()
+
+    def _upsert_increments(self, increments):
+        """
+        Add to the counts with a single ``INSERT ... ON CONFLICT DO UPDATE`` statement.
+
+        Parameters:
+            increments: Dict mapping ``(assignment_id, day, howsolved)`` tuples
+                to positive amounts.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        sql = 'INSERT INTO {table} ({assignment_id}, {day}, {howsolved}, {count}) VALUES {values} '\
+              'ON CONFLICT ({assignment_id}, {day}, {howsolved}) DO UPDATE SET '\
+              '{count} = {table}.{count} + EXCLUDED.{count}'
+        sql = sql.format(
+            values=', '.join(['(%s, %s, %s, %s)'] * len(increments)),
+            table=quote_name(self.model._meta.db_table),
+            assignment_id=quote_name('assignment_id'),
+            day=quote_name('day'),
+            howsolved=quote_name('howsolved'),
+            count=quote_name('count'))
+        day_field = self.model._meta.get_field('day')
+        params = []
+        for (assignment_id, day, howsolved), amount in sorted(increments.items()):
+            params.extend([assignment_id, day_field.get_db_prep_value(day, connection),
+                           howsolved, amount])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def add(self, assignment_id, day, howsolved, amount):
+        """
+        Add ``amount`` to the count for ``assignment_id``, ``day`` and ``howsolved``.
+
+        Creates the row if it does not exist, and deletes it when the count reaches zero.
+        """
+        queryset = self.filter(assignment_id=assignment_id, day=day, howsolved=howsolved)
+        if queryset.update(count=F('count') + amount):
+            if amount < 0:
+                queryset.filter(count__lte=0).delete()
+        elif amount > 0:
+            try:
+                with transaction.atomic():
+                    self.create(assignment_id=assignment_id, day=day, howsolved=howsolved,
+                                count=amount)
+            except IntegrityError:
+                # Created by a concurrent request after our update
+                queryset.update(count=F('count') + amount)
+
+    def rebuild(self, assignment_ids=None):
+        """
+        Rebuild the counts from the HowSolved objects.
+
+        Parameters:
+            assignment_ids: Only rebuild the counts for these assignments.
+                Rebuilds the counts for all assignments if this is ``None``.
+
+        Returns:
+            The number of rows created.
+        """
+        howsolved_queryset = HowSolved.objects.all()
+        queryset = self.all()
+        if assignment_ids is not None:
+            howsolved_queryset = howsolved_queryset.filter(assignment_id__in=assignment_ids)
+            queryset = queryset.filter(assignment_id__in=assignment_ids)
+        rows = howsolved_queryset\
+            .annotate(solved_date=TruncDate('solved_datetime'))\
+            .values('assignment_id', 'solved_date', 'howsolved')\
+            .annotate(howsolved_count=Count('id'))\
+            .order_by()
+        with transaction.atomic():
+            queryset.delete()
+            dailycounts = self.bulk_create(
+                (self.model(assignment_id=row['assignment_id'],
+                            day=row['solved_date'],
+                            howsolved=row['howsolved'],
+                            count=row['howsolved_count'])
+                 for row in rows.iterator()),
+                batch_size=1000)
+            Course.bump_statistics_cache_version(assignment_ids)
+        return len(dailycounts)
+
+
+class HowSolvedDailyCount(models.Model):
+    """
+    The number of HowSolved objects for each assignment, solved date and howsolved value.
+
+    Lets us compute date-ranged statistics by summing a few pre-aggregated rows
+    instead of scanning all the HowSolved objects. Kept up to date by the
+    :class:`.HowSolvedManager` methods, and rebuilt with the
+    ``rebuild_howsolved_daily_counts`` management command.
+    """
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE)
+    day = models.DateField()
+    howsolved = models.CharField(
+        max_length=10,
+        null=False,
+        choices=HowSolved.HOWSOLVED_CHOICES
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    objects = HowSolvedDailyCountManager()
+
+    class Meta:
+        unique_together = ('assignment', 'day', 'howsolved')
+
+    def __str__(self):
+        return '{} {} {}: {}'.format(self.assignment_id, self.day, self.howsolved, self.count)
+
+
+class CourseProgressManager(models.Manager):
+    def lock_user(self, user):
+        """
+        Lock the row for ``user`` until the end of the current transaction.
+
+        Serializes the changes to the progress counters for a user with the
+        creation of new counters in :meth:`.get_num_solved`, so a counter is never
+        created from a count that misses a concurrent change.
+        """
+        list(User.objects.select_for_update()
+             .filter(id=getattr(user, 'id', user))
+             .values_list('id', flat=True))
+
+    def get_num_solved(self, user, course_tag, period_tag):
+        """
+        Get the number of assignments tagged with both ``course_tag`` and ``period_tag``
+        that ``user`` has solved.
+
+        Creates the counter from the HowSolved objects the first time it is used.
+        """
+        try:
+            return self.get(user=user, course_tag=course_tag, period_tag=period_tag).num_solved
+        except CourseProgress.DoesNotExist:
+            pass
+        with transaction.atomic():
+            self.lock_user(user)
+            num_solved = HowSolved.objects\
+                .filter(user=user, assignment__tags=course_tag)\
+                .filter(assignment__tags=period_tag)\
+                .count()
+            progress, created = self.get_or_create(
+                user=user, course_tag=course_tag, period_tag=period_tag,
+                defaults={'num_solved': num_solved})
+        return progress.num_solved
+
+    def add_howsolved_changes(self, user_id, removed_assignment_ids, added_assignment_ids):
+        """
+        Update the counters of a user after HowSolved objects were created or deleted.
+
+        Must be called in a transaction after :meth:`.lock_user`.
+
+        Parameters:
+            user_id: The ID of the user.
+            removed_assignment_ids: IDs of the assignments the user no longer has
+                HowSolved objects for.
+            added_assignment_ids: IDs of the assignments the user has new
+                HowSolved objects for.
+        """
+        amounts = dict.fromkeys(removed_assignment_ids, -1)
+        amounts.update(dict.fromkeys(added_assignment_ids, 1))
+        if not amounts:
+            return
+        tag_ids_by_assignment = collections.defaultdict(set)
+        for assignment_id, tag_id in Assignment.tags.through.objects\
+                .filter(assignment_id__in=list(amounts.keys()))\
+                .values_list('assignment_id', 'tag_id'):
+            tag_ids_by_assignment[assignment_id].add(tag_id)
+        tag_ids = set().union(*tag_ids_by_assignment.values())
+        counter_amounts = collections.Counter()
+        for counter_id, course_tag_id, period_tag_id in self\
+                .filter(user_id=user_id, course_tag_id__in=tag_ids, period_tag_id__in=tag_ids)\
+                .values_list('id', 'course_tag_id', 'period_tag_id'):
+            for assignment_id, assignment_tag_ids in tag_ids_by_assignment.items():
+                if course_tag_id in assignment_tag_ids and period_tag_id in assignment_tag_ids:
+                    counter_amounts[counter_id] += amounts[assignment_id]
+        for amount in set(counter_amounts.values()):
+            if amount:
+                self.filter(id__in=[counter_id for counter_id, value in counter_amounts.items()
+                                    if value == amount])\
+                    .update(num_solved=F('num_solved') + amount)
+
+    def invalidate(self, tag_ids=None):
+        """
+        Delete the counters for the given tags, so they are recreated from the
+        HowSolved objects the next time they are used.
+
+        Parameters:
+            tag_ids: List of tag IDs. Deletes all the counters if this is ``None``.
+        """
+        queryset = self.all()
+        if tag_ids is not None:
+            queryset = queryset.filter(Q(course_tag_id__in=tag_ids) | Q(period_tag_id__in=tag_ids))
+        queryset.delete()
+
+
+class CourseProgress(models.Model):
+    """
+    The number of assignments tagged with both a course tag and a period tag
+    that a user has solved.
+
+    Lets the student pages show the progress for a course without counting the
+    HowSolved objects. Kept up to date by the :class:`.HowSolvedManager` methods,
+    and deleted when the tags on assignments change (see :mod:`trix.trix_core.signals`).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    course_tag = models.ForeignKey(Tag, related_name='+', on_delete=models.CASCADE)
+    period_tag = models.ForeignKey(Tag, related_name='+', on_delete=models.CASCADE)
+    num_solved = models.IntegerField(default=0)
+
+    objects = CourseProgressManager()
+
+    class Meta:
+        unique_together = ('user', 'course_tag', 'period_tag')
+
+    def __str__(self):
+        return '{} {} {}: {}'.format(self.user_id, self.course_tag_id, self.period_tag_id,
+                                     self.num_solved)
+
 
 class Permalink(models.Model):
     course = models.ForeignKey(
@@ -352,3 +1186,46 @@ class Permalink(models.Model):
     @property
     def readable_id(self):
         return str(self.id)
+
+
+class TagIndexVersionManager(models.Manager):
+    def get_version(self):
+        """
+        Get the current version of the tag index.
+        """
+        version = self.filter(id=TagIndexVersion.ID).values_list('version', flat=True).first()
+        return version or ''
+
+    def bump(self):
+        """
+        Change the version of the tag index.
+        """
+        version = uuid.uuid4().hex
+        if self.filter(id=TagIndexVersion.ID).update(version=version):
+            return
+        try:
+            with transaction.atomic():
+                self.create(id=TagIndexVersion.ID, version=version)
+        except IntegrityError:
+            # Created by a concurrent request after our update
+            self.filter(id=TagIndexVersion.ID).update(version=version)
+
+
+class TagIndexVersion(models.Model):
+    """
+    The version of the in-process tag index (see :mod:`trix.trix_core.tagindex`).
+
+    A single row, stored in the database instead of the cache so all the processes
+    see when it is bumped, even when the cache is local to each process. The version
+    is a random value instead of a counter, so a version is never reused after a
+    transaction that bumped it is rolled back.
+    """
+    #: The ID of the row.
+    ID = 1
+
+    version = models.CharField(max_length=32, default='')
+
+    objects = TagIndexVersionManager()
+
+    def __str__(self):
+        return self.version
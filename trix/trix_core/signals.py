@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from trix.trix_core import models as coremodels
+from trix.trix_core import tagindex
+
+
+def invalidate_tag_index():
+    """
+    Invalidate the tag index now, and again when the current transaction is committed
+    in case another process rebuilt the index from the data before the commit.
+    """
+    tagindex.invalidate()
+    transaction.on_commit(tagindex.invalidate)
+
+
+def bump_content_cache_version(course_ids=None, tag_ids=None):
+    """
+    Invalidate the cached course pages now, and again when the current transaction is
+    committed. See :meth:`trix.trix_core.models.Course.bump_content_cache_version`.
+    """
+    coremodels.Course.bump_content_cache_version(course_ids=course_ids, tag_ids=tag_ids)
+    transaction.on_commit(lambda: coremodels.Course.bump_content_cache_version(
+        course_ids=course_ids, tag_ids=tag_ids))
+
+
+def _get_assignment_tag_ids(assignment_ids):
+    return list(coremodels.Assignment.tags.through.objects
+                .filter(assignment_id__in=assignment_ids)
+                .values_list('tag_id', flat=True))
+
+
+@receiver(m2m_changed, sender=coremodels.Assignment.tags.through)
+def on_assignment_tags_changed(action, instance, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        tag_ids = [instance.id] if reverse else list(pk_set)
+        assignment_ids = list(pk_set) if reverse else [instance.id]
+        bump_content_cache_version(tag_ids=tag_ids + _get_assignment_tag_ids(assignment_ids))
+        coremodels.CourseProgress.objects.invalidate(tag_ids)
+    elif action == 'pre_clear':
+        tag_ids = [instance.id] if reverse else list(instance.tags.values_list('id', flat=True))
+        if reverse:
+            tag_ids += _get_assignment_tag_ids(
+                list(instance.assignment_set.values_list('id', flat=True)))
+        bump_content_cache_version(tag_ids=tag_ids)
+        coremodels.CourseProgress.objects.invalidate(tag_ids)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_tag_index()
+
+
+@receiver(pre_delete, sender=coremodels.Assignment)
+def on_assignment_deleting(instance, **kwargs):
+    tag_ids = list(instance.tags.values_list('id', flat=True))
+    bump_content_cache_version(tag_ids=tag_ids)
+    # The HowSolved objects for the assignment are deleted without going
+    # through HowSolvedManager
+    coremodels.CourseProgress.objects.invalidate(tag_ids)
+
+
+@receiver(post_save, sender=coremodels.Assignment)
+def on_assignment_saved(instance, **kwargs):
+    bump_content_cache_version(tag_ids=_get_assignment_tag_ids([instance.id]))
+
+
+@receiver(post_save, sender=coremodels.Assignment)
+def on_assignment_hidden_changed(instance, created, **kwargs):
+    # The tag index includes the hidden assignments. Changes to the tags are
+    # handled by on_assignment_tags_changed.
+    if instance.hidden if created else instance.hidden_changed():
+        invalidate_tag_index()
+
+
+@receiver(post_delete, sender=coremodels.Assignment)
+def on_assignment_deleted(**kwargs):
+    invalidate_tag_index()
+
+
+@receiver(post_save, sender=coremodels.Tag)
+@receiver(post_delete, sender=coremodels.Tag)
+def on_tag_changed(**kwargs):
+    invalidate_tag_index()
+    bump_content_cache_version()
+
+
+@receiver(post_save, sender=coremodels.Course)
+def on_course_saved(instance, **kwargs):
+    bump_content_cache_version(course_ids=[instance.id])
+
+
+@receiver(m2m_changed, sender=coremodels.Course.admins.through)
+@receiver(m2m_changed, sender=coremodels.Course.owner.through)
+def on_course_roles_changed(action, instance, reverse, **kwargs):
+    # The roles are cached on the User object. When the roles are changed from the
+    # course side, we only get the user IDs, so the views that do that clear the
+    # cache on request.user themselves.
+    if reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.clear_course_roles_cache()
+
+
+@receiver(post_save, sender=coremodels.Permalink)
+@receiver(post_delete, sender=coremodels.Permalink)
+@receiver(m2m_changed, sender=coremodels.Permalink.tags.through)
+def on_permalink_changed(**kwargs):
+    bump_content_cache_version(course_ids=[])
@@ -0,0 +1,141 @@
+import numpy
+
+from trix.trix_core import models as coremodels
+
+
+#: Values used for the cells in the solve matrix.
+NOT_SOLVED = 0
+WITHHELP = 1
+BYMYSELF = 2
+
+HOWSOLVED_VALUES = {
+    'withhelp': WITHHELP,
+    'bymyself': BYMYSELF,
+}
+
+
+class SolveMatrix(object):
+    """
+    A student by assignment matrix of how the students solved the assignments.
+
+    Makes it possible to compute per-student and per-assignment statistics
+    with vectorized NumPy operations instead of looping over HowSolved objects.
+
+    Attributes:
+        user_ids: Array with the user ID for each row.
+        assignment_ids: Array with the assignment ID for each column.
+        matrix: ``int8`` array with shape ``(len(user_ids), len(assignment_ids))``.
+            Each cell is :obj:`.NOT_SOLVED`, :obj:`.WITHHELP` or :obj:`.BYMYSELF`.
+    """
+    def __init__(self, user_ids, assignment_ids, matrix):
+        self.user_ids = user_ids
+        self.assignment_ids = assignment_ids
+        self.matrix = matrix
+
+    @classmethod
+    def from_assignments(cls, assignments, from_date=None, to_date=None):
+        """
+        Build the matrix from the HowSolved objects for ``assignments``.
+
+        The rows are the users that solved at least one of the assignments
+        (ordered by user ID), and the columns are the assignments (in the order of
+        ``assignments``).
+
+        Parameters:
+            assignments: A queryset or list of Assignment objects or IDs.
+            from_date: Only include HowSolved objects solved on or after this date.
+            to_date: Only include HowSolved objects solved on or before this date.
+        """
+        assignment_ids = numpy.array(
+            [getattr(assignment, 'id', assignment) for assignment in assignments],
+            dtype=numpy.int64)
+        queryset = coremodels.HowSolved.objects.filter(assignment_id__in=assignment_ids.tolist())
+        queryset = queryset.filter(solved_datetime__date__gte=from_date) if from_date else queryset
+        queryset = queryset.filter(solved_datetime__date__lte=to_date) if to_date else queryset
+        rows = list(queryset.order_by().values_list('user_id', 'assignment_id', 'howsolved'))
+        if not rows:
+            return cls(numpy.array([], dtype=numpy.int64), assignment_ids,
+                       numpy.zeros((0, len(assignment_ids)), dtype=numpy.int8))
+
+        row_user_ids, row_assignment_ids, row_howsolved = zip(*rows)
+        user_ids, user_indexes = numpy.unique(numpy.array(row_user_ids, dtype=numpy.int64),
+                                              return_inverse=True)
+        sorted_order = numpy.argsort(assignment_ids)
+        assignment_indexes = sorted_order[numpy.searchsorted(
+            assignment_ids, numpy.array(row_assignment_ids, dtype=numpy.int64),
+            sorter=sorted_order)]
+        values = numpy.array([HOWSOLVED_VALUES.get(howsolved, NOT_SOLVED)
+                              for howsolved in row_howsolved], dtype=numpy.int8)
+        matrix = numpy.zeros((len(user_ids), len(assignment_ids)), dtype=numpy.int8)
+        matrix[user_indexes, assignment_indexes] = values
+        return cls(user_ids, assignment_ids, matrix)
+
+    @property
+    def student_count(self):
+        return self.matrix.shape[0]
+
+    @property
+    def assignment_count(self):
+        return self.matrix.shape[1]
+
+    def get_student_completion(self):
+        """
+        Get the fraction (0 - 1) of the assignments each student has solved.
+        """
+        if not self.assignment_count:
+            return numpy.zeros(self.student_count)
+        return (self.matrix != NOT_SOLVED).sum(axis=1) / self.assignment_count
+
+    def get_completion_distribution(self, bins=10):
+        """
+        Get the number of students in each of ``bins`` equally sized completion
+        ranges from 0% to 100%.
+
+        Returns:
+            A list of ``(from_percent, to_percent, student_count)`` tuples.
+        """
+        counts, edges = numpy.histogram(self.get_student_completion() * 100,
+                                        bins=bins, range=(0, 100))
+        return [(float(edges[index]), float(edges[index + 1]), int(count))
+                for index, count in enumerate(counts)]
+
+    def get_completion_percentiles(self, percentiles=(10, 25, 50, 75, 90)):
+        """
+        Get percentiles of the student completion in percent.
+
+        Returns:
+            A list of ``(percentile, completion_percent)`` tuples. Empty if
+            there are no students.
+        """
+        if not self.student_count:
+            return []
+        values = numpy.percentile(self.get_student_completion() * 100, percentiles)
+        return [(percentile, float(value)) for percentile, value in zip(percentiles, values)]
+
+    def get_assignment_solve_rates(self):
+        """
+        Get the fraction of the students that solved each assignment by themselves
+        and with help.
+
+        Returns:
+            A dict mapping assignment ID to a dict with ``bymyself`` and ``withhelp``
+            fractions.
+        """
+        if not self.student_count:
+            return {int(assignment_id): {'bymyself': 0.0, 'withhelp': 0.0}
+                    for assignment_id in self.assignment_ids}
+        bymyself = (self.matrix == BYMYSELF).mean(axis=0)
+        withhelp = (self.matrix == WITHHELP).mean(axis=0)
+        return {int(assignment_id): {'bymyself': float(bymyself[index]),
+                                     'withhelp': float(withhelp[index])}
+                for index, assignment_id in enumerate(self.assignment_ids)}
+
+    def get_summary(self):
+        """
+        Get the student statistics shown on the statistics page.
+        """
+        return {
+            'student_count': self.student_count,
+            'completion_percentiles': self.get_completion_percentiles(),
+            'completion_distribution': self.get_completion_distribution(),
+        }
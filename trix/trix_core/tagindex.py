@@ -0,0 +1,136 @@
+"""
+In-process index from tags to the assignments that have the tag.
+
+Each tag maps to a bitmap (a Python int) with bit ``N`` set if the assignment
+with ID ``N`` has the tag, so filtering on any number of tags is a few
+bitwise operations in memory instead of one join on the tags table per tag.
+
+The index is rebuilt when the tag index version is bumped (see
+:func:`.invalidate`, called from :mod:`trix.trix_core.signals` when tags or
+assignments change). The version is stored in the database
+(:class:`trix.trix_core.models.TagIndexVersion`), so all the processes see
+the same version even when the Django cache is local to each process.
+"""
+import threading
+
+from trix.trix_core import models as coremodels
+
+
+def ids_to_bitmap(ids):
+    """
+    Make a bitmap with the bits for ``ids`` set.
+    """
+    ids = list(ids)
+    if not ids:
+        return 0
+    bitmapbytes = bytearray(max(ids) // 8 + 1)
+    for id_ in ids:
+        bitmapbytes[id_ >> 3] |= 1 << (id_ & 7)
+    return int.from_bytes(bitmapbytes, 'little')
+
+
+def bitmap_to_ids(bitmap):
+    """
+    Get the list of IDs (set bits) in ``bitmap``, in ascending order.
+    """
+    bits = bin(bitmap)[:1:-1]
+    return [index for index, bit in enumerate(bits) if bit == '1']
+
+
+def count_bitmap(bitmap):
+    """
+    Get the number of IDs (set bits) in ``bitmap``.
+    """
+    return bin(bitmap).count('1')
+
+
+class TagIndex(object):
+    def __init__(self, bitmaps, version, hidden_bitmap=0):
+        """
+        Parameters:
+            bitmaps: Dict mapping tag strings to assignment ID bitmaps.
+            version: The tag index version the bitmaps were built for.
+            hidden_bitmap: Bitmap with the hidden assignments.
+        """
+        self.bitmaps = bitmaps
+        self.version = version
+        self.hidden_bitmap = hidden_bitmap
+
+    @classmethod
+    def build(cls, version):
+        ids_by_tag = {}
+        rows = coremodels.Assignment.tags.through.objects\
+            .values_list('tag__tag', 'assignment_id')\
+            .iterator()
+        for tag, assignment_id in rows:
+            ids_by_tag.setdefault(tag, []).append(assignment_id)
+        bitmaps = {tag: ids_to_bitmap(ids) for tag, ids in ids_by_tag.items()}
+        hidden_bitmap = ids_to_bitmap(coremodels.Assignment.objects
+                                      .filter(hidden=True)
+                                      .values_list('id', flat=True))
+        return cls(bitmaps=bitmaps, version=version, hidden_bitmap=hidden_bitmap)
+
+    def get_bitmap(self, tag):
+        return self.bitmaps.get(tag, 0)
+
+    def get_all_of(self, tags):
+        """
+        Get a bitmap with the assignments that have all the ``tags``.
+        """
+        tags = list(tags)
+        if not tags:
+            raise ValueError('At least one tag is required.')
+        bitmap = self.get_bitmap(tags[0])
+        for tag in tags[1:]:
+            bitmap &= self.get_bitmap(tag)
+        return bitmap
+
+    def get_any_of(self, tags):
+        """
+        Get a bitmap with the assignments that have any of the ``tags``.
+        """
+        bitmap = 0
+        for tag in tags:
+            bitmap |= self.get_bitmap(tag)
+        return bitmap
+
+    def filter_ids(self, include_tags, exclude_tags=None):
+        """
+        Get the IDs of the assignments that have all the ``include_tags`` and none
+        of the ``exclude_tags``.
+        """
+        bitmap = self.get_all_of(include_tags)
+        if exclude_tags:
+            bitmap &= ~self.get_any_of(exclude_tags)
+        return bitmap_to_ids(bitmap)
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    """
+    Get the :class:`.TagIndex` for this process, rebuilding it if it is outdated.
+
+    Looks up the version with a single primary key query.
+    """
+    global _index
+    version = coremodels.TagIndexVersion.objects.get_version()
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            index = _index
+            if index is None or index.version != version:
+                index = TagIndex.build(version)
+                _index = index
+    return index
+
+
+def invalidate():
+    """
+    Make all processes rebuild the tag index the next time it is used.
+    """
+    global _index
+    coremodels.TagIndexVersion.objects.bump()
+    _index = None
@@ -1,4 +1,5 @@
 from trix.trix_core import models as coremodels
+from trix.trix_core import signals
 
 
 def bulk_update_assignment_tags(assignments_by_tag, existing_assignments):
@@ -33,10 +34,12 @@ def bulk_update_assignment_tags(assignments_by_tag, existing_assignments):
     AssignmentTag = coremodels.Assignment.tags.through
 
     # Clear the tags on the existing assignments
+    changed_tag_ids = set()
     if existing_assignments:
-        AssignmentTag.objects\
-            .filter(assignment__in=existing_assignments)\
-            .delete()
+        existing_assignmenttags = AssignmentTag.objects\
+            .filter(assignment__in=existing_assignments)
+        changed_tag_ids.update(existing_assignmenttags.values_list('tag_id', flat=True))
+        existing_assignmenttags.delete()
 
     # Bulk create any missing tags
     existing_tags = coremodels.Tag.objects.filter(tag__in=list(assignments_by_tag.keys()))
@@ -49,6 +52,12 @@ def bulk_update_assignment_tags(assignments_by_tag, existing_assignments):
     assignmenttags = []
     for tagobject in coremodels.Tag.objects.filter(tag__in=list(assignments_by_tag.keys())):
         assignments = assignments_by_tag[tagobject.tag]
+        changed_tag_ids.add(tagobject.id)
         for assignment in assignments:
             assignmenttags.append(AssignmentTag(tag=tagobject, assignment=assignment))
     AssignmentTag.objects.bulk_create(assignmenttags)
+
+    # The bulk operations on the through table do not send m2m_changed
+    signals.invalidate_tag_index()
+    signals.bump_content_cache_version(tag_ids=list(changed_tag_ids))
+    coremodels.CourseProgress.objects.invalidate(list(changed_tag_ids))
@@ -31,6 +31,25 @@ def url_replace(context, field, value):
     return dict_.urlencode()
 
 
+@register.simple_tag(takes_context=True)
+def url_replace_fields(context, **fields):
+    """
+    Like ``url_replace``, but replaces multiple fields. Fields with an empty
+    value are removed from the querystring.
+
+    Example::
+
+        ?{% url_replace_fields after=page_obj.next_cursor before='' page='' %}
+    """
+    dict_ = context['request'].GET.copy()
+    for field, value in fields.items():
+        if value == '' or value is None:
+            dict_.pop(field, None)
+        else:
+            dict_[field] = value
+    return dict_.urlencode()
+
+
 @register.filter
 def add_string_list(string_list, item):
     return string_list + ',' + item
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test import override_settings
+
+from trix.trix_core import cacheutils
+
+
+class TestVersion(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_get_version_stable(self):
+        self.assertEqual(cacheutils.get_version('test', 1),
+                         cacheutils.get_version('test', 1))
+
+    def test_bump_version(self):
+        version = cacheutils.get_version('test', 1)
+        cacheutils.bump_version('test', 1)
+        self.assertNotEqual(cacheutils.get_version('test', 1), version)
+
+    def test_bump_version_only_changes_key(self):
+        version = cacheutils.get_version('test', 2)
+        cacheutils.bump_version('test', 1)
+        self.assertEqual(cacheutils.get_version('test', 2), version)
+
+    def test_bump_version_not_in_cache(self):
+        cacheutils.bump_version('test', 1)
+        self.assertIsNotNone(cacheutils.get_version('test', 1))
+
+
+class TestMakeKey(TestCase):
+    def test_same_parts(self):
+        self.assertEqual(cacheutils.make_key('test', 1, ['a', 'b']),
+                         cacheutils.make_key('test', 1, ['a', 'b']))
+
+    def test_different_parts(self):
+        self.assertNotEqual(cacheutils.make_key('test', 1, ['a', 'b']),
+                            cacheutils.make_key('test', 1, ['a', 'c']))
+
+    def test_namespace(self):
+        self.assertTrue(cacheutils.make_key('test', 1).startswith('trix:test:'))
+
+
+class TestIsSharedCache(TestCase):
+    def test_default(self):
+        self.assertFalse(cacheutils.is_shared_cache())
+
+    def test_memcached(self):
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+                'LOCATION': '127.0.0.1:11211'}}):
+            self.assertTrue(cacheutils.is_shared_cache())
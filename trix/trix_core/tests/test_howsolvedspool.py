@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import howsolvedspool
+from trix.trix_core import models as coremodels
+
+
+class TestHowSolvedSpool(TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        settings_override = override_settings(
+            TRIX_HOWSOLVED_WRITE_BEHIND=True,
+            TRIX_HOWSOLVED_SPOOL_PATH=os.path.join(self.tempdir, 'spool.sqlite3'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        flusher_patch = mock.patch.object(howsolvedspool, 'start_flusher')
+        flusher_patch.start()
+        self.addCleanup(flusher_patch.stop)
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.assignment1 = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def _get_howsolved(self):
+        return dict(coremodels.HowSolved.objects.values_list('assignment_id', 'howsolved'))
+
+    def test_get_pending(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'withhelp',
+                                                  self.assignment2.id: None})
+        self.assertEqual(howsolvedspool.get_pending(self.user.id),
+                         {self.assignment1.id: 'withhelp', self.assignment2.id: None})
+        self.assertEqual(howsolvedspool.get_pending(self.user.id + 1), {})
+        self.assertEqual(self._get_howsolved(), {})
+
+    def test_flush(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment2, self.user, 'bymyself')
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'withhelp',
+                                                  self.assignment2.id: None})
+        self.assertEqual(howsolvedspool.flush(), 3)
+        self.assertEqual(self._get_howsolved(), {self.assignment1.id: 'withhelp'})
+        self.assertEqual(howsolvedspool.get_pending(self.user.id), {})
+        self.assertEqual(howsolvedspool.flush(), 0)
+
+    def test_flush_skips_deleted(self):
+        deleted_user = create_user('deleted@example.com', consent_datetime=timezone.now())
+        howsolvedspool.add_changes(deleted_user.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself',
+                                                  self.assignment2.id: 'bymyself'})
+        deleted_user.delete()
+        self.assignment2.delete()
+        howsolvedspool.flush()
+        self.assertEqual(list(coremodels.HowSolved.objects.values_list('user_id', 'assignment_id')),
+                         [(self.user.id, self.assignment1.id)])
+
+    def test_flush_failure_keeps_changes(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        with mock.patch.object(coremodels.HowSolved.objects, 'set_howsolved_many',
+                               side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                howsolvedspool.flush()
+        self.assertEqual(howsolvedspool.get_pending(self.user.id),
+                         {self.assignment1.id: 'bymyself'})
+        self.assertEqual(howsolvedspool.flush(), 1)
+        self.assertEqual(self._get_howsolved(), {self.assignment1.id: 'bymyself'})
+
+    def test_spool_not_locked_while_applying(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+
+        def apply_changes(changes_by_user_id):
+            # Would fail with "cannot start a transaction within a transaction" if
+            # the spool transaction was still open
+            howsolvedspool.add_changes(self.user.id, {self.assignment2.id: 'withhelp'})
+            apply_changes_original(changes_by_user_id)
+
+        apply_changes_original = howsolvedspool._apply_changes
+        with mock.patch.object(howsolvedspool, '_apply_changes', side_effect=apply_changes):
+            self.assertEqual(howsolvedspool.flush(), 1)
+        self.assertEqual(self._get_howsolved(), {self.assignment1.id: 'bymyself'})
+        self.assertEqual(howsolvedspool.get_pending(self.user.id),
+                         {self.assignment2.id: 'withhelp'})
+        self.assertEqual(howsolvedspool.flush(), 1)
+
+    def test_flush_waits_for_claimed_changes(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        connection = howsolvedspool._get_connection()
+        howsolvedspool._claim_changes(connection)
+        howsolvedspool.add_changes(self.user.id, {self.assignment2.id: 'bymyself'})
+        self.assertEqual(howsolvedspool.flush(), 0)
+        self.assertEqual(self._get_howsolved(), {})
+
+    @override_settings(TRIX_HOWSOLVED_SPOOL_CLAIM_TIMEOUT=-1)
+    def test_flush_releases_expired_claims(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool._claim_changes(howsolvedspool._get_connection())
+        self.assertEqual(howsolvedspool.flush(), 1)
+        self.assertEqual(self._get_howsolved(), {self.assignment1.id: 'bymyself'})
+
+    def test_discard_user(self):
+        howsolvedspool.add_changes(self.user.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool.discard_user(self.user.id)
+        self.assertEqual(howsolvedspool.get_pending(self.user.id), {})
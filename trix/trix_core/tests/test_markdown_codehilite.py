@@ -0,0 +1,67 @@
+import markdown
+import mock
+from django.test import TestCase
+
+from trix.trix_core import markdown_codehilite
+from trix.trix_core import trix_markdown
+
+
+class TestHighlightCache(TestCase):
+    def test_get_missing(self):
+        cache = markdown_codehilite.HighlightCache(maxsize=2)
+        self.assertIsNone(cache.get('a'))
+
+    def test_set_get(self):
+        cache = markdown_codehilite.HighlightCache(maxsize=2)
+        cache.set('a', '<pre>a</pre>')
+        self.assertEqual(cache.get('a'), '<pre>a</pre>')
+
+    def test_evicts_least_recently_used(self):
+        cache = markdown_codehilite.HighlightCache(maxsize=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        cache.get('a')
+        cache.set('c', 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'C')
+
+
+class TestCachedCodeHilite(TestCase):
+    def setUp(self):
+        markdown_codehilite.highlight_cache.clear()
+
+    def _convert_uncached(self, inputmarkdown):
+        return markdown.Markdown(
+            output_format='html5',
+            extensions=[
+                'markdown.extensions.codehilite',
+                'markdown.extensions.fenced_code',
+            ]).convert(inputmarkdown)
+
+    def test_fenced_code_same_output_as_codehilite(self):
+        inputmarkdown = '```python\nprint("Hello")\n```'
+        self.assertEqual(
+            trix_markdown.assignment_markdown(inputmarkdown),
+            self._convert_uncached(inputmarkdown))
+
+    def test_indented_code_same_output_as_codehilite(self):
+        inputmarkdown = 'Code:\n\n    :::python\n    print("Hello")\n'
+        self.assertEqual(
+            trix_markdown.assignment_markdown(inputmarkdown),
+            self._convert_uncached(inputmarkdown))
+
+    def test_highlights_unchanged_code_once(self):
+        with mock.patch('markdown.extensions.codehilite.highlight',
+                        wraps=markdown.extensions.codehilite.highlight) as highlight:
+            trix_markdown.assignment_markdown('Text\n\n```python\nprint("Hello")\n```')
+            trix_markdown.assignment_markdown('Changed\n\n```python\nprint("Hello")\n```')
+        self.assertEqual(highlight.call_count, 1)
+
+    def test_cache_key_includes_language(self):
+        with mock.patch('markdown.extensions.codehilite.highlight',
+                        wraps=markdown.extensions.codehilite.highlight) as highlight:
+            trix_markdown.assignment_markdown('```python\nx = 1\n```')
+            trix_markdown.assignment_markdown('```ruby\nx = 1\n```')
+        self.assertEqual(highlight.call_count, 2)
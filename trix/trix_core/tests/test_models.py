@@ -0,0 +1,557 @@
+import datetime
+
+import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import cacheutils
+from trix.trix_core import models as coremodels
+from trix.trix_core import tagutils
+from trix.trix_core import trix_markdown
+
+
+class TestAssignmentRenderedMarkdown(TestCase):
+    def test_save_renders_markdown(self):
+        assignment = coremodels.Assignment.objects.create(
+            title='A1', text='# Text', solution='# Solution')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '<h1>Text</h1>')
+        self.assertEqual(assignment.text_html_key,
+                         trix_markdown.assignment_markdown_key('# Text'))
+        self.assertEqual(assignment.solution_html, '<h1>Solution</h1>')
+        self.assertEqual(assignment.solution_html_key,
+                         trix_markdown.assignment_markdown_key('# Solution'))
+
+    def test_save_rerenders_changed_markdown(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        assignment.text = '# Changed'
+        assignment.save()
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '<h1>Changed</h1>')
+
+    def test_save_update_fields(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        assignment.text = '# Changed'
+        assignment.save(update_fields=['text'])
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '<h1>Changed</h1>')
+
+    def test_get_text_html_cached(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(assignment.get_text_html(), '<h1>Text</h1>')
+
+    def test_get_text_html_stale(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        coremodels.Assignment.objects.filter(id=assignment.id).update(text='# Changed')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.get_text_html(), '<h1>Changed</h1>')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '<h1>Changed</h1>')
+
+    def test_get_text_html_timeout_not_cached(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        coremodels.Assignment.objects.filter(id=assignment.id).update(text='# Changed')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        timed_out = trix_markdown.RenderedMarkdown(
+            '<pre class="trix-markdown-fallback"># Changed</pre>', False)
+        with mock.patch.object(trix_markdown, 'render_assignment_markdown', return_value=timed_out):
+            self.assertEqual(assignment.get_text_html(),
+                             '<pre class="trix-markdown-fallback"># Changed</pre>')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.get_text_html(), '<h1>Changed</h1>')
+
+    def test_save_timeout_not_cached(self):
+        timed_out = trix_markdown.RenderedMarkdown(
+            '<pre class="trix-markdown-fallback"># Text</pre>', False)
+        with mock.patch.object(trix_markdown, 'render_assignment_markdown', return_value=timed_out):
+            assignment = coremodels.Assignment.objects.create(title='A1', text='# Text')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html_key, '')
+        self.assertEqual(assignment.get_text_html(), '<h1>Text</h1>')
+
+    def test_hidden_changed(self):
+        assignment = coremodels.Assignment.objects.create(title='A1', text='Text')
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertFalse(assignment.hidden_changed())
+        assignment.hidden = True
+        self.assertTrue(assignment.hidden_changed())
+        assignment.save()
+        self.assertFalse(assignment.hidden_changed())
+
+    def test_hidden_changed_unknown(self):
+        self.assertTrue(coremodels.Assignment(title='A1', text='Text').hidden_changed())
+
+    def test_get_solution_html(self):
+        assignment = coremodels.Assignment.objects.create(
+            title='A1', text='Text', solution='# Solution')
+        self.assertEqual(assignment.get_solution_html(), '<h1>Solution</h1>')
+
+    def test_has_solution(self):
+        self.assertTrue(coremodels.Assignment(title='A1', solution='Solution').has_solution())
+        self.assertFalse(coremodels.Assignment(title='A1', solution='').has_solution())
+
+    def test_has_solution_annotated(self):
+        assignment = coremodels.Assignment(title='A1', solution='')
+        assignment.solution_exists = True
+        self.assertTrue(assignment.has_solution())
+
+    def test_get_text_html_unsaved(self):
+        assignment = coremodels.Assignment(title='A1', text='# Text')
+        self.assertEqual(assignment.get_text_html(), '<h1>Text</h1>')
+
+
+class TestUserCourseRoles(TestCase):
+    def setUp(self):
+        self.course1 = coremodels.Course.objects.create(
+            course_tag=coremodels.Tag.objects.create(tag='duck1000', category='c'))
+        self.course2 = coremodels.Course.objects.create(
+            course_tag=coremodels.Tag.objects.create(tag='duck2000', category='c'))
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def _get_user(self):
+        return coremodels.User.objects.get(id=self.user.id)
+
+    def test_get_course_roles(self):
+        self.course1.admins.add(self.user)
+        self.course1.owner.add(self.user)
+        self.course2.admins.add(self.user)
+        user = self._get_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(user.get_course_roles(),
+                             ({self.course1.id, self.course2.id}, {self.course1.id}))
+            self.assertTrue(user.is_admin_on_anything())
+            self.assertTrue(user.is_course_admin(self.course2))
+            self.assertTrue(user.is_course_owner(self.course1))
+            self.assertFalse(user.is_course_owner(self.course2))
+
+    def test_no_roles(self):
+        user = self._get_user()
+        self.assertFalse(user.is_admin_on_anything())
+        self.assertFalse(user.is_course_admin(self.course1))
+        self.assertFalse(user.is_course_owner(self.course1))
+
+    def test_staff(self):
+        self.user.is_admin = True
+        self.user.save()
+        user = self._get_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.is_admin_on_anything())
+            self.assertTrue(user.is_course_admin(self.course1))
+            self.assertTrue(user.is_course_owner(self.course1))
+
+    def test_clear_course_roles_cache(self):
+        user = self._get_user()
+        self.assertFalse(user.is_course_admin(self.course1))
+        self.course1.admins.add(self.user)
+        self.assertFalse(user.is_course_admin(self.course1))
+        user.clear_course_roles_cache()
+        self.assertTrue(user.is_course_admin(self.course1))
+
+    def test_course_roles_cache_cleared_by_user_changes(self):
+        user = self._get_user()
+        self.assertFalse(user.is_course_admin(self.course1))
+        user.admin.add(self.course1)
+        self.assertTrue(user.is_course_admin(self.course1))
+        user.owner.add(self.course1)
+        self.assertTrue(user.is_course_owner(self.course1))
+        user.admin.remove(self.course1)
+        self.assertFalse(user.is_course_admin(self.course1))
+        user.owner.clear()
+        self.assertFalse(user.is_course_owner(self.course1))
+
+
+class TestCourseStatisticsCacheVersion(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course1 = coremodels.Course.objects.create(
+            course_tag=coremodels.Tag.objects.create(tag='duck1000', category='c'))
+        self.course2 = coremodels.Course.objects.create(
+            course_tag=coremodels.Tag.objects.create(tag='duck2000', category='c'))
+        self.assignment = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.assignment.tags.add(self.course1.course_tag)
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def _get_versions(self):
+        return (coremodels.Course.get_statistics_cache_version(self.course1.id),
+                coremodels.Course.get_statistics_cache_version(self.course2.id))
+
+    def test_set_howsolved_bumps_version(self):
+        version1, version2 = self._get_versions()
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user, 'bymyself')
+        self.assertNotEqual(self._get_versions()[0], version1)
+        self.assertEqual(self._get_versions()[1], version2)
+
+    def test_clear_howsolved_bumps_version(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user, 'bymyself')
+        version1, version2 = self._get_versions()
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment.id, self.user)
+        self.assertNotEqual(self._get_versions()[0], version1)
+
+    def test_set_howsolved_many_bumps_version(self):
+        version1, version2 = self._get_versions()
+        coremodels.HowSolved.objects.set_howsolved_many(self.user, {self.assignment.id: 'withhelp'})
+        self.assertNotEqual(self._get_versions()[0], version1)
+
+
+class TestHowSolvedSetHowsolved(TestCase):
+    def setUp(self):
+        self.assignment = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def _get_howsolved_queries(self, queries):
+        return [query['sql'] for query in queries
+                if '"trix_core_howsolved"' in query['sql']]
+
+    def test_create(self):
+        with CaptureQueriesContext(connection) as queries:
+            howsolved = coremodels.HowSolved.objects.set_howsolved(
+                self.assignment, self.user, 'bymyself')
+        # Lock the existing HowSolved object, and insert it
+        self.assertEqual(len(self._get_howsolved_queries(queries)), 2)
+        howsolved_from_db = coremodels.HowSolved.objects.get()
+        self.assertEqual(howsolved_from_db.id, howsolved.id)
+        self.assertEqual(howsolved_from_db.howsolved, 'bymyself')
+        self.assertEqual(howsolved_from_db.solved_datetime, howsolved.solved_datetime)
+
+    def test_update(self):
+        created = coremodels.HowSolved.objects.set_howsolved(
+            self.assignment, self.user, 'bymyself')
+        updated = coremodels.HowSolved.objects.set_howsolved(
+            self.assignment, self.user, 'withhelp')
+        self.assertEqual(created.id, updated.id)
+        self.assertEqual(coremodels.HowSolved.objects.get().howsolved, 'withhelp')
+
+    def test_clear(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user, 'bymyself')
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment.id, self.user)
+        self.assertFalse(coremodels.HowSolved.objects.exists())
+
+    def test_without_upsert(self):
+        with mock.patch.object(coremodels.HowSolved.objects, '_supports_upsert_returning',
+                               return_value=False):
+            created = coremodels.HowSolved.objects.set_howsolved(
+                self.assignment, self.user, 'bymyself')
+            updated = coremodels.HowSolved.objects.set_howsolved(
+                self.assignment, self.user, 'withhelp')
+            with self.assertRaises(coremodels.Assignment.DoesNotExist):
+                coremodels.HowSolved.objects.set_howsolved(
+                    self.assignment.id + 1, self.user, 'bymyself')
+        self.assertEqual(created.id, updated.id)
+        self.assertEqual(coremodels.HowSolved.objects.get().howsolved, 'withhelp')
+
+    def test_old_sqlite(self):
+        self.assertTrue(coremodels._supports_upsert_returning(connection))
+        with mock.patch.object(connection.Database, 'sqlite_version_info', (3, 31, 1)):
+            self.assertFalse(coremodels._supports_upsert_returning(connection))
+            with CaptureQueriesContext(connection) as queries:
+                created = coremodels.HowSolved.objects.set_howsolved(
+                    self.assignment, self.user, 'bymyself')
+                updated = coremodels.HowSolved.objects.set_howsolved(
+                    self.assignment, self.user, 'withhelp')
+                coremodels.HowSolved.objects.set_howsolved_many(
+                    self.user, {self.assignment.id: 'bymyself', self.assignment.id + 1: 'bymyself'})
+        self.assertFalse([query['sql'] for query in queries
+                          if 'ON CONFLICT' in query['sql'] or 'RETURNING' in query['sql']])
+        self.assertEqual(created.id, updated.id)
+        self.assertEqual(coremodels.HowSolved.objects.get().howsolved, 'bymyself')
+        self.assertEqual(
+            list(coremodels.HowSolvedDailyCount.objects.values_list('howsolved', 'count')),
+            [('bymyself', 1)])
+
+    def test_assignment_does_not_exist(self):
+        with self.assertRaises(coremodels.Assignment.DoesNotExist):
+            coremodels.HowSolved.objects.set_howsolved(
+                self.assignment.id + 1, self.user, 'bymyself')
+        self.assertFalse(coremodels.HowSolved.objects.exists())
+
+    def test_unique(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user, 'bymyself')
+        with self.assertRaises(IntegrityError):
+            coremodels.HowSolved.objects.create(
+                assignment=self.assignment, user=self.user, howsolved='withhelp')
+
+
+class TestHowSolvedSetHowsolvedMany(TestCase):
+    def setUp(self):
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+        self.assignments = [coremodels.Assignment.objects.create(title='A{}'.format(index))
+                            for index in range(3)]
+        coremodels.HowSolved.objects.set_howsolved(self.assignments[0], self.user, 'withhelp')
+        coremodels.HowSolved.objects.set_howsolved(self.assignments[1], self.user, 'withhelp')
+
+    def _set_howsolved_many(self):
+        coremodels.HowSolved.objects.set_howsolved_many(self.user, {
+            self.assignments[0].id: None,
+            self.assignments[1].id: 'bymyself',
+            self.assignments[2].id: 'withhelp',
+            self.assignments[2].id + 1: 'bymyself',
+        })
+
+    def _get_howsolved(self):
+        return dict(coremodels.HowSolved.objects.values_list('assignment_id', 'howsolved'))
+
+    def test_set_howsolved_many(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._set_howsolved_many()
+        howsolved_queries = [query['sql'] for query in queries
+                             if '"trix_core_howsolved"' in query['sql']]
+        # Lock, delete, update and insert
+        self.assertEqual(len(howsolved_queries), 4)
+        self.assertEqual(self._get_howsolved(), {
+            self.assignments[1].id: 'bymyself',
+            self.assignments[2].id: 'withhelp',
+        })
+
+    def test_set_howsolved_many_without_upsert(self):
+        with mock.patch.object(coremodels.HowSolved.objects, '_supports_upsert_returning',
+                               return_value=False):
+            self._set_howsolved_many()
+        self.assertEqual(self._get_howsolved(), {
+            self.assignments[1].id: 'bymyself',
+            self.assignments[2].id: 'withhelp',
+        })
+
+
+class TestCourseProgress(TestCase):
+    def setUp(self):
+        self.course_tag = coremodels.Tag.objects.create(tag='duck1000', category='c')
+        self.period_tag = coremodels.Tag.objects.create(tag='spring20', category='p')
+        self.assignment1 = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.assignment1.tags.add(self.course_tag, self.period_tag)
+        self.assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        self.assignment2.tags.add(self.course_tag, self.period_tag)
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def _get_num_solved(self):
+        return coremodels.CourseProgress.objects.get_num_solved(
+            self.user, self.course_tag, self.period_tag)
+
+    def test_get_num_solved_creates_counter(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        self.assertFalse(coremodels.CourseProgress.objects.exists())
+        self.assertEqual(self._get_num_solved(), 1)
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(self._get_num_solved(), 1)
+
+    def test_set_and_clear_howsolved(self):
+        self.assertEqual(self._get_num_solved(), 0)
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'withhelp')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment2, self.user, 'withhelp')
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 2)
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment1.id, self.user)
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 1)
+
+    def test_set_howsolved_many(self):
+        self.assertEqual(self._get_num_solved(), 0)
+        coremodels.HowSolved.objects.set_howsolved_many(self.user, {
+            self.assignment1.id: 'bymyself',
+            self.assignment2.id: 'withhelp',
+        })
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 2)
+        coremodels.HowSolved.objects.set_howsolved_many(self.user, {
+            self.assignment1.id: None,
+            self.assignment2.id: 'bymyself',
+        })
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 1)
+        coremodels.HowSolved.objects.clear_all_for_user(self.user)
+        self.assertEqual(coremodels.CourseProgress.objects.get().num_solved, 0)
+
+    def test_other_course_not_changed(self):
+        other_assignment = coremodels.Assignment.objects.create(title='A3', text='Text')
+        other_assignment.tags.add(self.course_tag)
+        self.assertEqual(self._get_num_solved(), 0)
+        coremodels.HowSolved.objects.set_howsolved(other_assignment, self.user, 'bymyself')
+        self.assertEqual(self._get_num_solved(), 0)
+
+    def test_tag_change_invalidates(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        self.assertEqual(self._get_num_solved(), 1)
+        self.assignment1.tags.remove(self.period_tag)
+        self.assertFalse(coremodels.CourseProgress.objects.exists())
+        self.assertEqual(self._get_num_solved(), 0)
+
+    def test_bulk_tag_update_invalidates(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        self.assertEqual(self._get_num_solved(), 1)
+        tagutils.bulk_update_assignment_tags(
+            assignments_by_tag={'duck1000': [self.assignment1]},
+            existing_assignments=[self.assignment1])
+        self.assertFalse(coremodels.CourseProgress.objects.exists())
+        self.assertEqual(self._get_num_solved(), 0)
+
+    def test_assignment_delete_invalidates(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        self.assertEqual(self._get_num_solved(), 1)
+        self.assignment1.delete()
+        self.assertEqual(self._get_num_solved(), 0)
+
+
+@override_settings(TRIX_HOWSOLVED_MAP_CACHE_TIMEOUT=300)
+class TestHowSolvedMap(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.assignment1 = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        self.user = create_user('user@example.com', consent_datetime=timezone.now())
+
+    def test_get_howsolved_map(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment2, self.user, 'withhelp')
+        expected = {self.assignment1.id: 'bymyself', self.assignment2.id: 'withhelp'}
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user.id),
+                             expected)
+
+    def test_empty(self):
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user), {})
+        with self.assertNumQueries(0):
+            self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user), {})
+
+    def test_invalidated_by_changes(self):
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user), {})
+        coremodels.HowSolved.objects.set_howsolved(self.assignment1, self.user, 'bymyself')
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user),
+                         {self.assignment1.id: 'bymyself'})
+        coremodels.HowSolved.objects.set_howsolved_many(
+            self.user, {self.assignment1.id: 'withhelp', self.assignment2.id: 'bymyself'})
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user),
+                         {self.assignment1.id: 'withhelp', self.assignment2.id: 'bymyself'})
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment1.id, self.user)
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user),
+                         {self.assignment2.id: 'bymyself'})
+        coremodels.HowSolved.objects.clear_all_for_user(self.user)
+        self.assertEqual(coremodels.HowSolved.objects.get_howsolved_map(self.user), {})
+
+    @override_settings()
+    def test_not_cached_by_default_with_local_cache(self):
+        del settings.TRIX_HOWSOLVED_MAP_CACHE_TIMEOUT
+        coremodels.HowSolved.objects.get_howsolved_map(self.user)
+        with self.assertNumQueries(1):
+            coremodels.HowSolved.objects.get_howsolved_map(self.user)
+
+    @override_settings()
+    def test_cached_by_default_with_shared_cache(self):
+        del settings.TRIX_HOWSOLVED_MAP_CACHE_TIMEOUT
+        with mock.patch.object(cacheutils, 'is_shared_cache', return_value=True):
+            coremodels.HowSolved.objects.get_howsolved_map(self.user)
+            with self.assertNumQueries(0):
+                coremodels.HowSolved.objects.get_howsolved_map(self.user)
+
+
+class TestHowSolvedDailyCount(TestCase):
+    def setUp(self):
+        self.assignment = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.user1 = create_user('user1@example.com', consent_datetime=timezone.now())
+        self.user2 = create_user('user2@example.com', consent_datetime=timezone.now())
+
+    def _get_daily_counts(self):
+        return set(coremodels.HowSolvedDailyCount.objects
+                   .values_list('assignment_id', 'day', 'howsolved', 'count'))
+
+    def test_set_howsolved(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user2, 'bymyself')
+        self.assertEqual(self._get_daily_counts(),
+                         {(self.assignment.id, timezone.localdate(), 'bymyself', 2)})
+
+    def test_set_howsolved_update(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user2, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'withhelp')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'withhelp')
+        self.assertEqual(self._get_daily_counts(), {
+            (self.assignment.id, timezone.localdate(), 'bymyself', 1),
+            (self.assignment.id, timezone.localdate(), 'withhelp', 1),
+        })
+
+    def test_set_howsolved_moves_to_today(self):
+        howsolved = coremodels.HowSolved.objects.set_howsolved(
+            self.assignment, self.user1, 'bymyself')
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        coremodels.HowSolved.objects.filter(id=howsolved.id).update(solved_datetime=yesterday)
+        coremodels.HowSolvedDailyCount.objects.rebuild()
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        self.assertEqual(self._get_daily_counts(),
+                         {(self.assignment.id, timezone.localdate(), 'bymyself', 1)})
+
+    def test_clear_howsolved(self):
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user2, 'bymyself')
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment.id, self.user1)
+        self.assertEqual(self._get_daily_counts(),
+                         {(self.assignment.id, timezone.localdate(), 'bymyself', 1)})
+        coremodels.HowSolved.objects.clear_howsolved(self.assignment.id, self.user2)
+        self.assertEqual(self._get_daily_counts(), set())
+
+    def test_set_howsolved_many(self):
+        assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved_many(self.user1, {
+            self.assignment.id: 'withhelp',
+            assignment2.id: 'bymyself',
+        })
+        coremodels.HowSolved.objects.set_howsolved_many(self.user2, {
+            self.assignment.id: 'withhelp',
+        })
+        self.assertEqual(self._get_daily_counts(), {
+            (self.assignment.id, timezone.localdate(), 'withhelp', 2),
+            (assignment2.id, timezone.localdate(), 'bymyself', 1),
+        })
+
+    def test_without_upsert(self):
+        with mock.patch.object(coremodels, '_supports_upsert_returning', return_value=False):
+            coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+            coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user2, 'bymyself')
+            coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'withhelp')
+        self.assertEqual(self._get_daily_counts(), {
+            (self.assignment.id, timezone.localdate(), 'bymyself', 1),
+            (self.assignment.id, timezone.localdate(), 'withhelp', 1),
+        })
+
+    def test_clear_howsolved_does_not_exist(self):
+        with self.assertRaises(coremodels.HowSolved.DoesNotExist):
+            coremodels.HowSolved.objects.clear_howsolved(self.assignment.id, self.user1)
+
+    def test_clear_all_for_user(self):
+        assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        coremodels.HowSolved.objects.set_howsolved(self.assignment, self.user1, 'bymyself')
+        coremodels.HowSolved.objects.set_howsolved(assignment2, self.user1, 'withhelp')
+        coremodels.HowSolved.objects.set_howsolved(assignment2, self.user2, 'withhelp')
+        coremodels.HowSolved.objects.clear_all_for_user(self.user1)
+        self.assertEqual(list(coremodels.HowSolved.objects.values_list('user_id', flat=True)),
+                         [self.user2.id])
+        self.assertEqual(self._get_daily_counts(),
+                         {(assignment2.id, timezone.localdate(), 'withhelp', 1)})
+
+    def test_rebuild(self):
+        coremodels.HowSolved.objects.create(
+            assignment=self.assignment, user=self.user1, howsolved='bymyself')
+        coremodels.HowSolved.objects.create(
+            assignment=self.assignment, user=self.user2, howsolved='withhelp')
+        self.assertEqual(coremodels.HowSolvedDailyCount.objects.rebuild(), 2)
+        self.assertEqual(self._get_daily_counts(), {
+            (self.assignment.id, timezone.localdate(), 'bymyself', 1),
+            (self.assignment.id, timezone.localdate(), 'withhelp', 1),
+        })
+
+    def test_rebuild_assignment_ids(self):
+        assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        coremodels.HowSolved.objects.create(
+            assignment=self.assignment, user=self.user1, howsolved='bymyself')
+        coremodels.HowSolved.objects.create(
+            assignment=assignment2, user=self.user1, howsolved='bymyself')
+        coremodels.HowSolvedDailyCount.objects.rebuild(assignment_ids=[assignment2.id])
+        self.assertEqual(self._get_daily_counts(),
+                         {(assignment2.id, timezone.localdate(), 'bymyself', 1)})
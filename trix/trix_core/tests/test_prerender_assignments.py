@@ -0,0 +1,73 @@
+from io import StringIO
+
+import mock
+from django.core.management import call_command
+from django.test import TestCase
+
+from trix.trix_core import models as coremodels
+from trix.trix_core import trix_markdown
+
+
+class TestPrerenderAssignments(TestCase):
+    def _create_stale_assignment(self, **kwargs):
+        assignment = coremodels.Assignment.objects.create(**kwargs)
+        coremodels.Assignment.objects.filter(id=assignment.id).update(
+            text_html='', text_html_key='', solution_html='', solution_html_key='')
+        return assignment
+
+    def _prerender(self, **options):
+        stdout = StringIO()
+        call_command('prerender_assignments', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_renders_stale(self):
+        assignment = self._create_stale_assignment(
+            title='A1', text='# Text', solution='# Solution')
+        output = self._prerender(workers=1)
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '<h1>Text</h1>')
+        self.assertEqual(assignment.solution_html, '<h1>Solution</h1>')
+        self.assertIn('Rendered 1 assignments', output)
+
+    def test_timeout_not_stored(self):
+        assignment = self._create_stale_assignment(title='A1', text='# Text')
+        timed_out = trix_markdown.RenderedMarkdown(
+            '<pre class="trix-markdown-fallback"># Text</pre>', False)
+        with mock.patch.object(trix_markdown, 'render_assignment_markdown', return_value=timed_out):
+            self._prerender(workers=1)
+        assignment = coremodels.Assignment.objects.get(id=assignment.id)
+        self.assertEqual(assignment.text_html, '')
+        self.assertEqual(assignment.text_html_key, '')
+
+    def test_skips_up_to_date(self):
+        coremodels.Assignment.objects.create(title='A1', text='# Text')
+        output = self._prerender(workers=1)
+        self.assertIn('All assignments are already rendered.', output)
+
+    def test_force(self):
+        coremodels.Assignment.objects.create(title='A1', text='# Text')
+        output = self._prerender(workers=1, force=True)
+        self.assertIn('Rendered 1 assignments', output)
+
+    def test_filter_by_tags(self):
+        course_tag = coremodels.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = coremodels.Tag.objects.create(tag='spring20', category='p')
+        in_course = self._create_stale_assignment(title='A1', text='# Text')
+        in_course.tags.add(course_tag, period_tag)
+        other_period = self._create_stale_assignment(title='A2', text='# Text')
+        other_period.tags.add(course_tag)
+        self._prerender(workers=1, course_tag='duck1000', period_tag='spring20')
+        self.assertEqual(
+            coremodels.Assignment.objects.get(id=in_course.id).text_html, '<h1>Text</h1>')
+        self.assertEqual(
+            coremodels.Assignment.objects.get(id=other_period.id).text_html, '')
+
+    def test_process_pool(self):
+        assignments = [
+            self._create_stale_assignment(title='A{}'.format(index), text='# Text {}'.format(index))
+            for index in range(3)]
+        self._prerender(workers=2)
+        for index, assignment in enumerate(assignments):
+            self.assertEqual(
+                coremodels.Assignment.objects.get(id=assignment.id).text_html,
+                '<h1>Text {}</h1>'.format(index))
@@ -0,0 +1,90 @@
+import datetime
+
+import numpy
+from django.test import TestCase
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import models as coremodels
+from trix.trix_core import solvematrix
+
+
+class TestSolveMatrix(TestCase):
+    def setUp(self):
+        self.assignments = [
+            coremodels.Assignment.objects.create(title='A{}'.format(index), text='Text')
+            for index in range(4)]
+        self.users = [create_user('user{}@example.com'.format(index),
+                                  consent_datetime=timezone.now())
+                      for index in range(3)]
+        self._solve(0, 0, 'bymyself')
+        self._solve(0, 1, 'withhelp')
+        self._solve(0, 2, 'bymyself')
+        self._solve(0, 3, 'bymyself')
+        self._solve(1, 0, 'withhelp')
+        self._solve(1, 1, 'withhelp')
+        self._solve(2, 0, 'bymyself')
+
+    def _solve(self, user_index, assignment_index, howsolved):
+        coremodels.HowSolved.objects.create(
+            user=self.users[user_index], assignment=self.assignments[assignment_index],
+            howsolved=howsolved)
+
+    def _make_matrix(self, **kwargs):
+        return solvematrix.SolveMatrix.from_assignments(self.assignments, **kwargs)
+
+    def test_matrix(self):
+        matrix = self._make_matrix()
+        self.assertEqual(matrix.user_ids.tolist(), [user.id for user in self.users])
+        self.assertEqual(matrix.assignment_ids.tolist(),
+                         [assignment.id for assignment in self.assignments])
+        self.assertEqual(matrix.matrix.tolist(), [
+            [2, 1, 2, 2],
+            [1, 1, 0, 0],
+            [2, 0, 0, 0],
+        ])
+
+    def test_column_order_follows_assignments(self):
+        matrix = solvematrix.SolveMatrix.from_assignments(list(reversed(self.assignments)))
+        self.assertEqual(matrix.matrix[0].tolist(), [2, 2, 1, 2])
+
+    def test_accepts_ids(self):
+        matrix = solvematrix.SolveMatrix.from_assignments(
+            [assignment.id for assignment in self.assignments[:2]])
+        self.assertEqual(matrix.matrix.shape, (3, 2))
+
+    def test_empty(self):
+        matrix = solvematrix.SolveMatrix.from_assignments(
+            [coremodels.Assignment.objects.create(title='Empty', text='Text')])
+        self.assertEqual(matrix.matrix.shape, (0, 1))
+        self.assertEqual(matrix.get_completion_percentiles(), [])
+        self.assertEqual(matrix.get_assignment_solve_rates()[matrix.assignment_ids[0]],
+                         {'bymyself': 0.0, 'withhelp': 0.0})
+
+    def test_date_filter(self):
+        matrix = self._make_matrix(from_date=timezone.localdate() + datetime.timedelta(days=1))
+        self.assertEqual(matrix.student_count, 0)
+
+    def test_student_completion(self):
+        numpy.testing.assert_allclose(self._make_matrix().get_student_completion(),
+                                      [1.0, 0.5, 0.25])
+
+    def test_completion_distribution(self):
+        distribution = self._make_matrix().get_completion_distribution(bins=4)
+        self.assertEqual(distribution, [
+            (0.0, 25.0, 0),
+            (25.0, 50.0, 1),
+            (50.0, 75.0, 1),
+            (75.0, 100.0, 1),
+        ])
+
+    def test_completion_percentiles(self):
+        percentiles = self._make_matrix().get_completion_percentiles(percentiles=(0, 50, 100))
+        self.assertEqual(percentiles, [(0, 25.0), (50, 50.0), (100, 100.0)])
+
+    def test_assignment_solve_rates(self):
+        rates = self._make_matrix().get_assignment_solve_rates()
+        self.assertAlmostEqual(rates[self.assignments[0].id]['bymyself'], 2 / 3)
+        self.assertAlmostEqual(rates[self.assignments[0].id]['withhelp'], 1 / 3)
+        self.assertAlmostEqual(rates[self.assignments[1].id]['withhelp'], 2 / 3)
+        self.assertEqual(rates[self.assignments[3].id]['withhelp'], 0.0)
@@ -0,0 +1,122 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from trix.trix_core import models as coremodels
+from trix.trix_core import tagindex
+from trix.trix_core import tagutils
+
+
+class TestBitmaps(TestCase):
+    def test_ids_to_bitmap(self):
+        self.assertEqual(tagindex.ids_to_bitmap([0, 3, 9]), 0b1000001001)
+
+    def test_ids_to_bitmap_empty(self):
+        self.assertEqual(tagindex.ids_to_bitmap([]), 0)
+
+    def test_bitmap_to_ids(self):
+        self.assertEqual(tagindex.bitmap_to_ids(0b1000001001), [0, 3, 9])
+
+    def test_bitmap_to_ids_empty(self):
+        self.assertEqual(tagindex.bitmap_to_ids(0), [])
+
+    def test_roundtrip_large_ids(self):
+        ids = [1, 64, 100000, 100001]
+        self.assertEqual(tagindex.bitmap_to_ids(tagindex.ids_to_bitmap(ids)), ids)
+
+
+class TestTagIndex(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.assignment1 = coremodels.Assignment.objects.create(title='A1', text='Text')
+        self.assignment2 = coremodels.Assignment.objects.create(title='A2', text='Text')
+        self.assignment3 = coremodels.Assignment.objects.create(title='A3', text='Text')
+        self.tag_a = coremodels.Tag.objects.create(tag='a')
+        self.tag_b = coremodels.Tag.objects.create(tag='b')
+        self.tag_c = coremodels.Tag.objects.create(tag='c')
+        self.assignment1.tags.add(self.tag_a, self.tag_b)
+        self.assignment2.tags.add(self.tag_a)
+        self.assignment3.tags.add(self.tag_a, self.tag_c)
+
+    def test_filter_ids_include(self):
+        index = tagindex.get_index()
+        self.assertEqual(index.filter_ids(['a']),
+                         [self.assignment1.id, self.assignment2.id, self.assignment3.id])
+        self.assertEqual(index.filter_ids(['a', 'b']), [self.assignment1.id])
+
+    def test_filter_ids_exclude(self):
+        index = tagindex.get_index()
+        self.assertEqual(index.filter_ids(['a'], ['b', 'c']), [self.assignment2.id])
+
+    def test_filter_ids_unknown_tag(self):
+        self.assertEqual(tagindex.get_index().filter_ids(['a', 'unknown']), [])
+
+    def test_filter_ids_requires_include_tag(self):
+        with self.assertRaises(ValueError):
+            tagindex.get_index().filter_ids([], ['a'])
+
+    def test_get_index_reused(self):
+        self.assertIs(tagindex.get_index(), tagindex.get_index())
+
+    def test_rebuilt_when_tags_added(self):
+        index = tagindex.get_index()
+        self.assignment2.tags.add(self.tag_b)
+        self.assertIsNot(tagindex.get_index(), index)
+        self.assertEqual(tagindex.get_index().filter_ids(['b']),
+                         [self.assignment1.id, self.assignment2.id])
+
+    def test_rebuilt_when_tags_removed(self):
+        tagindex.get_index()
+        self.assignment1.tags.remove(self.tag_b)
+        self.assertEqual(tagindex.get_index().filter_ids(['b']), [])
+
+    def test_rebuilt_when_tag_renamed(self):
+        tagindex.get_index()
+        self.tag_b.tag = 'renamed'
+        self.tag_b.save()
+        self.assertEqual(tagindex.get_index().filter_ids(['renamed']), [self.assignment1.id])
+
+    def test_rebuilt_by_bulk_update_assignment_tags(self):
+        tagindex.get_index()
+        tagutils.bulk_update_assignment_tags(
+            assignments_by_tag={'d': [self.assignment2]},
+            existing_assignments=[])
+        self.assertEqual(tagindex.get_index().filter_ids(['d']), [self.assignment2.id])
+
+    def test_rebuilt_when_hidden_changed(self):
+        tagindex.get_index()
+        self.assignment2.hidden = True
+        self.assignment2.save()
+        self.assertEqual(tagindex.get_index().hidden_bitmap,
+                         tagindex.ids_to_bitmap([self.assignment2.id]))
+
+    def test_rebuilt_when_hidden_assignment_created(self):
+        tagindex.get_index()
+        assignment = coremodels.Assignment.objects.create(title='A4', text='Text', hidden=True)
+        self.assertEqual(tagindex.get_index().hidden_bitmap,
+                         tagindex.ids_to_bitmap([assignment.id]))
+
+    def test_not_rebuilt_when_assignment_text_changed(self):
+        index = tagindex.get_index()
+        assignment = coremodels.Assignment.objects.get(id=self.assignment2.id)
+        assignment.text = 'Changed'
+        assignment.save()
+        coremodels.Assignment.objects.create(title='A4', text='Text')
+        self.assertIs(tagindex.get_index(), index)
+
+    def test_rebuilt_when_assignment_deleted(self):
+        index = tagindex.get_index()
+        self.assignment2.delete()
+        self.assertIsNot(tagindex.get_index(), index)
+
+    def test_rebuilt_when_version_bumped_by_other_process(self):
+        index = tagindex.get_index()
+        # Another process does not clear the index of this process, and may use
+        # another cache
+        coremodels.TagIndexVersion.objects.bump()
+        cache.clear()
+        self.assertIsNot(tagindex.get_index(), index)
+
+    def test_version_query(self):
+        tagindex.get_index()
+        with self.assertNumQueries(1):
+            tagindex.get_index()
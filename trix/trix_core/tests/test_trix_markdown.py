@@ -1,5 +1,11 @@
+import itertools
+import threading
+
+import mock
 from django.test import TestCase
+from django.test import override_settings
 
+from trix.trix_core import markdown_codehilite
 from trix.trix_core import trix_markdown
 
 
@@ -13,3 +19,84 @@ class TestTrixMarkdown(TestCase):
         self.assertEqual(
             trix_markdown.assignment_markdown('Hello\nworld'),
             '<p>Hello<br>\nworld</p>')
+
+    def test_converter_reused_within_thread(self):
+        self.assertIs(
+            trix_markdown.get_assignment_markdown_converter(),
+            trix_markdown.get_assignment_markdown_converter())
+
+    def test_converter_not_shared_between_threads(self):
+        converters = []
+        thread = threading.Thread(
+            target=lambda: converters.append(trix_markdown.get_assignment_markdown_converter()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(converters[0], trix_markdown.get_assignment_markdown_converter())
+
+    def test_converter_reset_between_calls(self):
+        trix_markdown.assignment_markdown('[trix]\n\n[trix]: http://example.com')
+        self.assertEqual(
+            trix_markdown.assignment_markdown('[trix]'),
+            '<p>[trix]</p>')
+
+    @override_settings(TRIX_MARKDOWN_MAX_LENGTH=10)
+    def test_max_length_fallback(self):
+        with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING') as logs:
+            output = trix_markdown.assignment_markdown('# <b>Hello world</b>', assignment_id=42)
+        self.assertEqual(
+            output,
+            '<pre class="trix-markdown-fallback"># &lt;b&gt;Hello world&lt;/b&gt;</pre>')
+        self.assertIn('assignment 42', logs.output[0])
+
+    @override_settings(TRIX_MARKDOWN_MAX_LENGTH=10)
+    def test_max_length_fallback_cacheable(self):
+        with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING'):
+            rendered = trix_markdown.render_assignment_markdown('# Hello world')
+        self.assertTrue(rendered.cacheable)
+
+    def _mock_clock(self):
+        # Every deadline check sees one more second since rendering started
+        return mock.patch.object(trix_markdown.time, 'monotonic',
+                                 side_effect=itertools.count())
+
+    @override_settings(TRIX_MARKDOWN_TIMEOUT=2)
+    def test_timeout_fallback(self):
+        with self._mock_clock():
+            with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING') as logs:
+                rendered = trix_markdown.render_assignment_markdown(
+                    'One\n\nTwo\n\nThree\n\nFour', assignment_id=42)
+        self.assertEqual(rendered.html,
+                         '<pre class="trix-markdown-fallback">One\n\nTwo\n\nThree\n\nFour</pre>')
+        self.assertFalse(rendered.cacheable)
+        self.assertIn('assignment 42', logs.output[0])
+
+    @override_settings(TRIX_MARKDOWN_TIMEOUT=2)
+    def test_timeout_before_highlighting(self):
+        with self._mock_clock():
+            with mock.patch.object(markdown_codehilite.CachedCodeHilite, 'hilite') as hilite:
+                with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING'):
+                    trix_markdown.assignment_markdown(
+                        '```python\na = 1\n```\n\n```python\nb = 2\n```\n\n'
+                        '```python\nc = 3\n```\n\n```python\nd = 4\n```')
+        self.assertLess(hilite.call_count, 4)
+
+    @override_settings(TRIX_MARKDOWN_TIMEOUT=2)
+    def test_timeout_in_other_thread(self):
+        results = []
+
+        def render():
+            results.append(trix_markdown.render_assignment_markdown('One\n\nTwo\n\nThree\n\nFour'))
+
+        with self._mock_clock():
+            with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING'):
+                thread = threading.Thread(target=render)
+                thread.start()
+                thread.join()
+        self.assertFalse(results[0].cacheable)
+
+    @override_settings(TRIX_MARKDOWN_TIMEOUT=2)
+    def test_converter_reusable_after_timeout(self):
+        with self._mock_clock():
+            with self.assertLogs('trix.trix_core.trix_markdown', level='WARNING'):
+                trix_markdown.assignment_markdown('[trix]\n\nOne\n\nTwo\n\n[trix]: http://example.com')
+        self.assertEqual(trix_markdown.assignment_markdown('[trix]'), '<p>[trix]</p>')
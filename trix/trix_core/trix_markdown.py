@@ -1,21 +1,210 @@
+import collections
+import hashlib
+import logging
+import threading
+import time
+
 import markdown
+from markdown.blockprocessors import BlockProcessor
+from markdown.preprocessors import Preprocessor
+from markdown.treeprocessors import Treeprocessor
+from django.conf import settings
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
+from trix.trix_core import markdown_codehilite
+
+
+#: Bump this whenever the output of :func:`assignment_markdown` changes for the same input
+#: (new extensions, changed extension config, ...). Doing so invalidates all rendered
+#: markdown cached on :class:`trix.trix_core.models.Assignment`.
+ASSIGNMENT_MARKDOWN_VERSION = '1'
+
+logger = logging.getLogger(__name__)
 
-def assignment_markdown(inputmarkdown):
+
+# Holds one converter per thread. markdown.Markdown objects keep state while
+# converting, so they can not be shared between threads.
+_converters = threading.local()
+
+
+class MarkdownRenderTimeout(Exception):
     """
-    The Mardown parser used for assignment text and solutions.
+    Raised when rendering markdown takes longer than the time budget.
+    """
+
+
+class RenderDeadline(object):
+    """
+    The time budget for a single ``convert()`` call.
+
+    The markdown processors call :meth:`.check` between the steps of the
+    conversion, where stopping leaves no locks held and no shared state half
+    updated.
+    """
+    def __init__(self):
+        self.expires = None
+
+    def start(self, seconds):
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def stop(self):
+        self.expires = None
+
+    def check(self):
+        """
+        Raise :exc:`.MarkdownRenderTimeout` if the deadline has passed.
+        """
+        if self.expires is not None and time.monotonic() > self.expires:
+            raise MarkdownRenderTimeout()
+
+
+class DeadlinePreprocessor(Preprocessor):
+    def run(self, lines):
+        self.markdown.render_deadline.check()
+        return lines
+
+
+class DeadlineBlockProcessor(BlockProcessor):
+    """
+    Checks the deadline before each block is parsed. Never handles a block.
+    """
+    def test(self, parent, block):
+        self.parser.markdown.render_deadline.check()
+        return False
+
+    def run(self, parent, blocks):
+        pass
+
+
+class DeadlineTreeprocessor(Treeprocessor):
+    def run(self, root):
+        self.markdown.render_deadline.check()
+
+
+class RenderDeadlineExtension(markdown.Extension):
+    """
+    Adds a :class:`.RenderDeadline` to the converter as ``render_deadline``, and
+    checks it before preprocessing, before each block, and before and after
+    inline processing. :mod:`trix.trix_core.markdown_codehilite` also checks it
+    before highlighting each code block.
+    """
+    def extendMarkdown(self, md, md_globals):
+        md.render_deadline = RenderDeadline()
+        md.preprocessors.add('trix_deadline', DeadlinePreprocessor(md), '_begin')
+        md.parser.blockprocessors.add('trix_deadline', DeadlineBlockProcessor(md.parser), '_begin')
+        md.treeprocessors.add('trix_deadline_before_inline', DeadlineTreeprocessor(md), '<inline')
+        md.treeprocessors.add('trix_deadline_after_inline', DeadlineTreeprocessor(md), '>inline')
+        md.registerExtension(self)
+
+
+def make_assignment_markdown_converter():
+    """
+    Create a new ``markdown.Markdown`` object configured for the
+    assignment text and solution markdown dialect.
     """
-    md = markdown.Markdown(
+    return markdown.Markdown(
         output_format='html5',
         extensions=[
-            'markdown.extensions.codehilite',  # Syntax hilite code
-            'markdown.extensions.fenced_code',  # Support github style code blocks
+            # Syntax hilite code. Highlighted code blocks are cached, see markdown_codehilite
+            markdown_codehilite.CachedCodeHiliteExtension(),
+            # Support github style code blocks
+            markdown_codehilite.CachedFencedCodeExtension(),
             'markdown.extensions.nl2br',  # Support github style newline handling
             'markdown.extensions.sane_lists',  # Break into new ul/ol tag when the next line starts
                                                # with another class of list indicator
             'markdown.extensions.smart_strong',  # Do not let hello_world create an <em>,
             'markdown.extensions.def_list',  # Support definition lists
             'markdown.extensions.tables',  # Support tables
+            RenderDeadlineExtension(),  # Stop rendering after TRIX_MARKDOWN_TIMEOUT
         ])
-    return mark_safe(md.convert(inputmarkdown))
+
+
+def get_assignment_markdown_converter():
+    """
+    Get the assignment markdown converter for the current thread.
+
+    The converter is created on first use, and reused for every later call in
+    the same thread, so we only pay for loading the extensions once per thread.
+    Remember to ``reset()`` the converter after using it.
+    """
+    converter = getattr(_converters, 'assignment_markdown', None)
+    if converter is None:
+        converter = make_assignment_markdown_converter()
+        _converters.assignment_markdown = converter
+    return converter
+
+
+def _render_fallback(inputmarkdown):
+    return mark_safe('<pre class="trix-markdown-fallback">{}</pre>'.format(escape(inputmarkdown)))
+
+
+#: The result of :func:`render_assignment_markdown`. ``cacheable`` is ``False`` if
+#: rendering timed out, so ``html`` is a fallback that should not be stored.
+RenderedMarkdown = collections.namedtuple('RenderedMarkdown', ['html', 'cacheable'])
+
+
+def render_assignment_markdown(inputmarkdown, assignment_id=None):
+    """
+    Render markdown with the parser used for assignment text and solutions.
+
+    Rendering is limited by the ``TRIX_MARKDOWN_MAX_LENGTH`` (characters) and
+    ``TRIX_MARKDOWN_TIMEOUT`` (seconds) settings. If the input is longer, or
+    rendering takes more time, we log a warning and fall back to the input as
+    escaped plain text.
+
+    The length limit gives the same result every time, so that fallback can be
+    cached like any other output. A timeout may just be a slow moment on the
+    server, so the fallback after a timeout is marked as not cacheable.
+
+    Parameters:
+        inputmarkdown: The markdown to render.
+        assignment_id: The ID of the assignment we render markdown for. Only
+            used in log messages.
+
+    Returns:
+        A :obj:`.RenderedMarkdown`.
+    """
+    max_length = getattr(settings, 'TRIX_MARKDOWN_MAX_LENGTH', 100000)
+    if max_length and len(inputmarkdown) > max_length:
+        logger.warning(
+            'Markdown for assignment %s is %s characters, which is more than the '
+            'TRIX_MARKDOWN_MAX_LENGTH limit of %s. Showing it as plain text.',
+            assignment_id, len(inputmarkdown), max_length)
+        return RenderedMarkdown(_render_fallback(inputmarkdown), True)
+
+    timeout = getattr(settings, 'TRIX_MARKDOWN_TIMEOUT', 2)
+    md = get_assignment_markdown_converter()
+    md.render_deadline.start(timeout)
+    try:
+        return RenderedMarkdown(mark_safe(md.convert(inputmarkdown)), True)
+    except MarkdownRenderTimeout:
+        logger.warning(
+            'Rendering markdown for assignment %s took more than the TRIX_MARKDOWN_TIMEOUT '
+            'limit of %s seconds. Showing it as plain text.',
+            assignment_id, timeout)
+        return RenderedMarkdown(_render_fallback(inputmarkdown), False)
+    finally:
+        md.render_deadline.stop()
+        md.reset()
+
+
+def assignment_markdown(inputmarkdown, assignment_id=None):
+    """
+    The Mardown parser used for assignment text and solutions.
+
+    Same as :func:`.render_assignment_markdown`, but only returns the HTML.
+    """
+    return render_assignment_markdown(inputmarkdown, assignment_id=assignment_id).html
+
+
+def assignment_markdown_key(inputmarkdown):
+    """
+    Get a content hash identifying the output of :func:`assignment_markdown`
+    for ``inputmarkdown``.
+
+    The key changes whenever the input changes, or when
+    :obj:`ASSIGNMENT_MARKDOWN_VERSION` is bumped.
+    """
+    data = '{}:{}'.format(ASSIGNMENT_MARKDOWN_VERSION, inputmarkdown)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
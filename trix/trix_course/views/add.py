@@ -58,6 +58,8 @@ class UpdateCourseAdminView(base.TrixCourseBaseView):
             self._add_admins(request, course, request.POST.getlist('selected_students'))
         elif 'owner_list' in request.POST:
             self._add_owners(request, course, request.POST.getlist('selected_students'))
+        # The user may have changed their own roles
+        request.user.clear_course_roles_cache()
         return redirect(reverse('trix_add_admin', kwargs={'course_id': kwargs['course_id']}))
 
     def _add_admins(self, request, course, id_list):
@@ -41,5 +41,7 @@ class RemoveCourseAdminView(LoginRequiredMixin, DeleteView):
             course.admins.remove(admin_user)
             if admin_user in course.owner.all():
                 course.owner.remove(admin_user)
+        # The user may have removed their own roles
+        request.user.clear_course_roles_cache()
 
         return redirect('trix_course_admin', course_id=course_id)
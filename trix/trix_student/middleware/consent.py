@@ -1,9 +1,20 @@
 from django.shortcuts import redirect
 from django.conf import settings
+from django.contrib.auth import SESSION_KEY
 from django.core.exceptions import MiddlewareNotUsed
 
 
 class ConsentMiddleware:
+    """
+    Redirect authenticated users that have not consented to the consent form
+    before the view is run.
+
+    When a user has consented, their ID is stored in the session, so the user
+    is not loaded from the database just to check the consent on the following
+    requests.
+    """
+    #: Session key for the ID of the user that has consented.
+    CONSENTED_USER_ID_SESSION_KEY = 'trix_consented_user_id'
 
     def __init__(self, get_response):
         self.get_response = get_response
@@ -11,13 +22,24 @@ class ConsentMiddleware:
         if disable_consent:
             raise MiddlewareNotUsed
 
-    def __call__(self, request):
-        response = self.get_response(request)
+    def _has_consented(self, request):
+        session_user_id = request.session.get(SESSION_KEY)
+        if session_user_id is not None and \
+                request.session.get(self.CONSENTED_USER_ID_SESSION_KEY) == session_user_id:
+            return True
+        if not request.user.is_authenticated:
+            return True
+        if not request.user.has_consented:
+            return False
+        if session_user_id is not None:
+            request.session[self.CONSENTED_USER_ID_SESSION_KEY] = session_user_id
+        return True
 
+    def __call__(self, request):
         if 'consent' in request.path or 'logout' in request.path or 'delete' in request.path:
-            return response
+            return self.get_response(request)
 
-        if request.user.is_authenticated and not request.user.has_consented:
+        if not self._has_consented(request):
             return redirect('trix_consent_form')
 
-        return response
+        return self.get_response(request)
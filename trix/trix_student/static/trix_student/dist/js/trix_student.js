@@ -66,8 +66,33 @@
     }
   ]).controller('SolutionCtrl', [
     '$scope',
-    function($scope) {
-      return $scope.isVisible = false;
+    '$http',
+    '$sce',
+    function($scope,
+    $http,
+    $sce) {
+      $scope.isVisible = false;
+      $scope.loading = false;
+      // Set with ng-init when the solution should be loaded when it is expanded
+      $scope.solutionUrl = null;
+      $scope.solutionHtml = null;
+      $scope._loadSolution = function() {
+        $scope.loading = true;
+        return $http.get($scope.solutionUrl).then(function(response) {
+          $scope.loading = false;
+          return $scope.solutionHtml = $sce.trustAsHtml(response.data);
+        }).catch(function(response) {
+          $scope.loading = false;
+          return console.error('Failed to load solution:',
+    response.statusText);
+        });
+      };
+      return $scope.toggle = function() {
+        $scope.isVisible = !$scope.isVisible;
+        if ($scope.isVisible && $scope.solutionUrl && !$scope.solutionHtml && !$scope.loading) {
+          return $scope._loadSolution();
+        }
+      };
     }
   ]).controller('MenuCtrl', [
     '$scope',
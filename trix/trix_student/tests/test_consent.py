@@ -0,0 +1,72 @@
+import json
+
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from trix.project.develop.testhelpers.login import LoginTestCaseMixin
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import models
+from trix.trix_student.middleware.consent import ConsentMiddleware
+
+
+class TestConsentMiddleware(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(course_tag=course_tag, active_period=period_tag)
+        self.assignment = models.Assignment.objects.create(title='A1', text='Text')
+        self.assignment.tags.add(course_tag, period_tag)
+
+    def test_redirect_before_view(self):
+        user = create_user('user@example.com')
+        self.login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('trix_student_course', args=[self.course.id]))
+        self.assertRedirects(response, reverse('trix_consent_form'), fetch_redirect_response=False)
+        self.assertFalse([query for query in queries
+                          if 'trix_core_course' in query['sql'] or
+                          'trix_core_assignment' in query['sql']])
+
+    def test_redirect_does_not_run_post(self):
+        user = create_user('user@example.com')
+        response = self.post_as(
+            user, reverse('trix_student_howsolved', args=[self.assignment.id]),
+            content_type='application/json',
+            data=json.dumps({'howsolved': 'bymyself'}))
+        self.assertRedirects(response, reverse('trix_consent_form'), fetch_redirect_response=False)
+        self.assertFalse(models.HowSolved.objects.exists())
+
+    def test_consented(self):
+        user = create_user('user@example.com', consent_datetime=timezone.now())
+        response = self.get_as(user, reverse('trix_student_course', args=[self.course.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.session[ConsentMiddleware.CONSENTED_USER_ID_SESSION_KEY],
+                         str(user.id))
+
+    def test_anonymous(self):
+        response = self.client.get(reverse('trix_student_course', args=[self.course.id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_consent_form_not_redirected(self):
+        user = create_user('user@example.com')
+        response = self.get_as(user, reverse('trix_consent_form'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_consent_from_session(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        request.session[SESSION_KEY] = '1'
+        request.session[ConsentMiddleware.CONSENTED_USER_ID_SESSION_KEY] = '1'
+        request.user = SimpleLazyObject(lambda: self.fail('The user was loaded.'))
+        middleware = ConsentMiddleware(lambda request: HttpResponse('ok'))
+        with self.assertNumQueries(0):
+            response = middleware(request)
+        self.assertEqual(response.content, b'ok')
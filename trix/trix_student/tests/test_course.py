@@ -0,0 +1,415 @@
+import base64
+import json
+
+from urllib.parse import urlencode
+
+import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.login import LoginTestCaseMixin
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import models
+from trix.trix_core import tagindex
+from trix.trix_student.views.course import CourseDetailView
+
+
+class TestCourseDetailViewTags(TestCase):
+    def setUp(self):
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(
+            course_tag=course_tag, active_period=period_tag)
+        self.assignment1 = self._create_assignment('A1', course_tag, period_tag, 'oblig1')
+        self.assignment2 = self._create_assignment('A2', course_tag, period_tag, 'oblig1', 'hard')
+        self.assignment3 = self._create_assignment('A3', course_tag, period_tag, 'oblig2')
+        self.other_assignment = self._create_assignment('Other', 'other', period_tag, 'oblig1')
+
+    def _create_assignment(self, title, *tags):
+        assignment = models.Assignment.objects.create(title=title, text='Text')
+        for tag in tags:
+            if not isinstance(tag, models.Tag):
+                tag, created = models.Tag.objects.get_or_create(tag=tag)
+            assignment.tags.add(tag)
+        return assignment
+
+    def _get_assignments(self, tags):
+        response = self.client.get(reverse('trix_student_course', args=[self.course.id]),
+                                   {'tags': tags})
+        return [assignment.title for assignment in response.context['assignment_list']]
+
+    def test_include(self):
+        self.assertEqual(self._get_assignments('oblig1'), ['A1', 'A2'])
+
+    def test_include_many(self):
+        self.assertEqual(self._get_assignments('hard,oblig1'), ['A2'])
+
+    def test_include_and_exclude(self):
+        self.assertEqual(self._get_assignments('-hard,oblig1'), ['A1'])
+
+    def test_exclude_only(self):
+        self.assertEqual(self._get_assignments('-oblig1'), ['A3'])
+
+    def _get_filtered_ids(self, tags):
+        filtered_ids = []
+        original_bitmap_to_ids = tagindex.bitmap_to_ids
+
+        def bitmap_to_ids(bitmap):
+            filtered_ids.append(original_bitmap_to_ids(bitmap))
+            return filtered_ids[-1]
+
+        with mock.patch.object(tagindex, 'bitmap_to_ids', side_effect=bitmap_to_ids):
+            self._get_assignments(tags)
+        return filtered_ids
+
+    def test_include_ids_scoped_to_course(self):
+        self.assertEqual(self._get_filtered_ids('oblig1'),
+                         [[self.assignment1.id, self.assignment2.id]])
+
+    def test_exclude_ids_scoped_to_course(self):
+        self.assertEqual(self._get_filtered_ids('-oblig1'),
+                         [[self.assignment1.id, self.assignment2.id]])
+
+    def test_unknown_tag(self):
+        self.assertEqual(self._get_assignments('unknown'), [])
+
+    def _get_selectable_tags(self, tags=''):
+        response = self.client.get(reverse('trix_student_course', args=[self.course.id]),
+                                   {'tags': tags})
+        return response.context['selectable_tags']
+
+    def test_selectable_tags(self):
+        self.assertEqual(self._get_selectable_tags(),
+                         [('hard', 1), ('oblig1', 2), ('oblig2', 1)])
+
+    def test_selectable_tags_filtered(self):
+        self.assertEqual(self._get_selectable_tags('oblig1'), [('hard', 1)])
+
+    def test_selectable_tags_rendered_with_count(self):
+        response = self.client.get(reverse('trix_student_course', args=[self.course.id]))
+        self.assertContains(response, '<option value="oblig1">oblig1 (2)</option>', html=True)
+
+
+class TestCourseDetailViewFilteredQueryset(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        cache.clear()
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(
+            course_tag=course_tag, active_period=period_tag)
+        self.assignments = []
+        for index in range(25):
+            assignment = models.Assignment.objects.create(
+                title='A{:02}'.format(index), text='Text')
+            assignment.tags.add(course_tag, period_tag)
+            self.assignments.append(assignment)
+
+    def _get(self, **params):
+        return self.client.get(reverse('trix_student_course', args=[self.course.id]), params)
+
+    def _count_filter_queries(self, **params):
+        with mock.patch.object(CourseDetailView, 'get_filtered_queryset', autospec=True,
+                               side_effect=CourseDetailView.get_filtered_queryset) \
+                as get_filtered_queryset:
+            response = self._get(**params)
+        return response, get_filtered_queryset.call_count
+
+    def test_filtered_once(self):
+        response, call_count = self._count_filter_queries(page='2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(call_count, 1)
+
+    @override_settings(TRIX_STUDENT_CURSOR_PAGINATION=True)
+    def test_filtered_once_cursor_pagination(self):
+        self.assignments[0].tags.add(models.Tag.objects.create(tag='week1'))
+        with mock.patch.object(CourseDetailView, 'get_assignment_ids') as get_assignment_ids:
+            response, call_count = self._count_filter_queries(tags='spring20')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(call_count, 1)
+        self.assertFalse(get_assignment_ids.called)
+        self.assertEqual(len(response.context['assignment_list']), 20)
+        self.assertEqual(response.context['selectable_tags'], [('week1', 1)])
+
+    @override_settings(TRIX_STUDENT_CURSOR_PAGINATION=True)
+    def test_filtered_once_cursor_pagination_progressjson(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.login(student)
+        with mock.patch.object(CourseDetailView, 'get_assignment_ids') as get_assignment_ids:
+            response, call_count = self._count_filter_queries(progressjson='1', tags='spring20')
+        self.assertEqual(call_count, 1)
+        self.assertFalse(get_assignment_ids.called)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 25, 'num_solved': 1, 'percent': 4})
+
+    def test_filtered_once_progressjson(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.assignments[0].tags.add(models.Tag.objects.create(tag='week1'))
+        self.login(student)
+        response, call_count = self._count_filter_queries(progressjson='1', tags='week1')
+        self.assertEqual(call_count, 1)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 1, 'num_solved': 1, 'percent': 100})
+
+    def test_progressjson_unfiltered_uses_counter(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.login(student)
+        response, call_count = self._count_filter_queries(progressjson='1')
+        self.assertEqual(call_count, 0)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 25, 'num_solved': 1, 'percent': 4})
+        models.HowSolved.objects.set_howsolved(self.assignments[1], student, 'withhelp')
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get(progressjson='1')
+        self.assertFalse([query for query in queries
+                          if 'trix_core_howsolved' in query['sql']])
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 25, 'num_solved': 2, 'percent': 8})
+
+    def test_progressjson_unfiltered_only_counts_course_assignments(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        other_assignment = models.Assignment.objects.create(title='Other', text='Text')
+        models.HowSolved.objects.set_howsolved(other_assignment, student, 'bymyself')
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.assignments[1].tags.remove(self.course.active_period)
+        models.HowSolved.objects.set_howsolved(self.assignments[1], student, 'bymyself')
+        self.login(student)
+        response = self._get(progressjson='1')
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 24, 'num_solved': 1, 'percent': 4})
+
+    def test_progressjson_unfiltered_hidden_assignment(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.assignments[0].hidden = True
+        self.assignments[0].save()
+        self.login(student)
+        response, call_count = self._count_filter_queries(progressjson='1')
+        self.assertEqual(call_count, 1)
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 24, 'num_solved': 0, 'percent': 0})
+
+    @override_settings(TRIX_HOWSOLVED_MAP_CACHE_TIMEOUT=300)
+    def test_howsolved_cached(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        self.login(student)
+        self._get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get()
+        self.assertFalse([query for query in queries
+                          if 'trix_core_howsolved' in query['sql']])
+        self.assertEqual(response.context['assignmentlist_with_howsolved'][0],
+                         (self.assignments[0], 'bymyself'))
+
+    def test_howsolved_not_cached_scoped_to_page(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        models.HowSolved.objects.set_howsolved(self.assignments[0], student, 'bymyself')
+        models.HowSolved.objects.set_howsolved(self.assignments[-1], student, 'withhelp')
+        self.login(student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get()
+        howsolved_queries = [query['sql'] for query in queries
+                             if 'trix_core_howsolved' in query['sql']]
+        self.assertEqual(len(howsolved_queries), 1)
+        self.assertIn('"trix_core_howsolved"."assignment_id" IN', howsolved_queries[0])
+        self.assertEqual(response.context['assignmentlist_with_howsolved'][0],
+                         (self.assignments[0], 'bymyself'))
+
+    def test_course_admin_roles_queried_once(self):
+        admin = create_user('admin@example.com', consent_datetime=timezone.now())
+        self.course.admins.add(admin)
+        self.assignments[0].hidden = True
+        self.assignments[0].save()
+        self.login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get(progressjson='1')
+        self.assertEqual(len([query for query in queries
+                              if 'trix_core_course_admins' in query['sql']]), 1)
+        self.assertEqual(json.loads(response.content.decode())['num_total'], 25)
+        self.assertEqual(self._get().context['user_is_admin'], True)
+
+    def test_pages(self):
+        first_page = self._get().context['assignment_list']
+        second_page = self._get(page='2').context['assignment_list']
+        self.assertEqual([assignment.title for assignment in first_page],
+                         ['A{:02}'.format(index) for index in range(20)])
+        self.assertEqual([assignment.title for assignment in second_page],
+                         ['A20', 'A21', 'A22', 'A23', 'A24'])
+
+    def test_page_out_of_bounds(self):
+        response = self._get(page='3')
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(TRIX_STUDENT_CURSOR_PAGINATION=True)
+class TestCourseDetailViewCursorPagination(TestCase):
+    def setUp(self):
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(
+            course_tag=course_tag, active_period=period_tag)
+        for index in range(25):
+            # Two assignments with the same title to test ordering by ID
+            title = 'A{:02}'.format(index if index != 20 else 19)
+            assignment = models.Assignment.objects.create(title=title, text='Text')
+            assignment.tags.add(course_tag, period_tag)
+
+    def _get(self, **params):
+        return self.client.get(reverse('trix_student_course', args=[self.course.id]), params)
+
+    def _get_ids(self, response):
+        return [assignment.id for assignment in response.context['assignment_list']]
+
+    def _get_all_ids(self):
+        return list(models.Assignment.objects.order_by('title', 'id').values_list('id', flat=True))
+
+    def test_first_page(self):
+        response = self._get()
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertEqual(self._get_ids(response), self._get_all_ids()[:20])
+        self.assertFalse(response.context['page_obj'].has_previous())
+        self.assertTrue(response.context['page_obj'].has_next())
+
+    def test_after(self):
+        first_page = self._get().context['page_obj']
+        response = self._get(after=first_page.next_cursor)
+        self.assertEqual(self._get_ids(response), self._get_all_ids()[20:])
+        self.assertTrue(response.context['page_obj'].has_previous())
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_before(self):
+        first_page = self._get().context['page_obj']
+        second_page = self._get(after=first_page.next_cursor).context['page_obj']
+        response = self._get(before=second_page.previous_cursor)
+        self.assertEqual(self._get_ids(response), self._get_all_ids()[:20])
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self._get(after='invalid').status_code, 404)
+        self.assertEqual(self._get(after=encode_cursor_value(['A', 'B'])).status_code, 404)
+
+    def test_page_number(self):
+        response = self._get(page='2')
+        self.assertFalse(response.context['cursor_pagination'])
+        self.assertEqual(self._get_ids(response), self._get_all_ids()[20:])
+
+    def test_no_count_or_offset(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._get()
+        for query in queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_pager_links(self):
+        first_page = self._get().context['page_obj']
+        self.assertContains(self._get(), '?{}'.format(urlencode({'after': first_page.next_cursor})))
+
+
+def encode_cursor_value(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode('utf-8')).decode('ascii')
+
+
+class TestCourseDetailViewAnonymousCache(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        cache.clear()
+        self.course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        self.period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(
+            course_tag=self.course_tag, active_period=self.period_tag)
+        self.assignment = models.Assignment.objects.create(title='A1', text='Text')
+        self.assignment.tags.add(self.course_tag, self.period_tag)
+
+    def _get(self, **params):
+        return self.client.get(reverse('trix_student_course', args=[self.course.id]), params)
+
+    def test_cached(self):
+        response = self._get(tags='oblig1')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            cached_response = self._get(tags='oblig1')
+        self.assertEqual(cached_response.status_code, 200)
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_keyed_by_parameters(self):
+        self._get()
+        with CaptureQueriesContext(connection) as queries:
+            self._get(tags='oblig1')
+        self.assertTrue(queries)
+
+    def test_cursor_cached(self):
+        self._get(after=encode_cursor_value(['A0', 1]))
+        with self.assertNumQueries(0):
+            self._get(after=encode_cursor_value(['A0', 1]))
+        self._get(before=encode_cursor_value(['B0', 1]))
+        with self.assertNumQueries(0):
+            self._get(before=encode_cursor_value(['B0', 1]))
+
+    def test_empty_parameters_ignored_in_key(self):
+        self._get()
+        with self.assertNumQueries(0):
+            self._get(tags='', page='')
+
+    def test_unknown_parameters_not_cached(self):
+        self._get(other='1')
+        with CaptureQueriesContext(connection) as queries:
+            self._get(other='1')
+        self.assertTrue(queries)
+
+    def test_authenticated_not_cached(self):
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        self.login(student)
+        self._get()
+        with CaptureQueriesContext(connection) as queries:
+            self._get()
+        self.assertTrue(queries)
+
+    def test_invalidated_by_assignment_change(self):
+        self.assertContains(self._get(), 'A1')
+        self.assignment.title = 'Changed'
+        self.assignment.save()
+        self.assertContains(self._get(), 'Changed')
+
+    def test_invalidated_by_assignment_tags_change(self):
+        self._get()
+        self.assignment.tags.add(models.Tag.objects.create(tag='oblig1'))
+        self.assertContains(self._get(), 'oblig1')
+
+    def test_invalidated_by_new_assignment(self):
+        self._get()
+        assignment = models.Assignment.objects.create(title='New assignment', text='Text')
+        assignment.tags.add(self.course_tag, self.period_tag)
+        self.assertContains(self._get(), 'New assignment')
+
+    def test_invalidated_by_active_period_change(self):
+        self._get()
+        self.course.active_period = models.Tag.objects.create(tag='fall20', category='p')
+        self.course.save()
+        self.assertNotContains(self._get(), 'A1')
+
+    def test_other_course_not_invalidated(self):
+        other_course_tag = models.Tag.objects.create(tag='duck2000', category='c')
+        models.Course.objects.create(course_tag=other_course_tag)
+        self._get()
+        other_assignment = models.Assignment.objects.create(title='Other', text='Text')
+        other_assignment.tags.add(other_course_tag)
+        with self.assertNumQueries(0):
+            self._get()
+
+    def test_permalink_cached(self):
+        permalink = models.Permalink.objects.create(course=self.course, title='Permalink')
+        permalink.tags.add(self.course_tag)
+        url = reverse('trix_student_permalink', args=[permalink.id])
+        self.assertContains(self.client.get(url), 'A1')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.assignment.title = 'Changed'
+        self.assignment.save()
+        self.assertContains(self.client.get(url), 'Changed')
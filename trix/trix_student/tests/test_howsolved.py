@@ -1,10 +1,20 @@
 import json
+import os
+import shutil
+import tempfile
+from urllib.parse import urlencode
+
+import mock
+from django.db import connection
 from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from trix.project.develop.testhelpers.user import create_user
 from trix.project.develop.testhelpers.login import LoginTestCaseMixin
+from trix.trix_core import howsolvedspool
 from trix.trix_core import models
 
 
@@ -85,3 +95,166 @@ class TestHowSolved(TestCase, LoginTestCaseMixin):
         response = self.delete_as(
             self.testuser, self._geturl(100001))
         self.assertEqual(response.status_code, 404)
+
+    def _get_howsolved_queries(self, queries):
+        tables = ('"trix_core_howsolved"', '"trix_core_assignment"')
+        return [query['sql'] for query in queries
+                if any(table in query['sql'] for table in tables)]
+
+    def _post_howsolved(self, howsolved):
+        return self.post_as(
+            self.testuser, self._geturl(self.assignment.id),
+            content_type='application/json',
+            data=json.dumps({'howsolved': howsolved}))
+
+    def test_create_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_howsolved('bymyself')
+        self.assertEqual(response.status_code, 200)
+        # Lock the existing HowSolved object, and insert it without loading the assignment
+        self.assertEqual(len(self._get_howsolved_queries(queries)), 2)
+
+    def test_update_queries(self):
+        self._post_howsolved('withhelp')
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_howsolved('bymyself')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._get_howsolved_queries(queries)), 2)
+        self.assertEqual(models.HowSolved.objects.get().howsolved, 'bymyself')
+
+    def test_updates_daily_counts(self):
+        self._post_howsolved('bymyself')
+        self.assertEqual(
+            list(models.HowSolvedDailyCount.objects.values_list('howsolved', 'count')),
+            [('bymyself', 1)])
+
+
+class TestHowSolvedBatch(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        self.testuser = create_user('testuser@example.com', consent_datetime=timezone.now())
+        self.course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        self.period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.assignments = []
+        for index in range(3):
+            assignment = models.Assignment.objects.create(title='A{}'.format(index))
+            assignment.tags.add(self.course_tag, self.period_tag)
+            self.assignments.append(assignment)
+
+    def _post(self, data):
+        return self.post_as(
+            self.testuser, reverse('trix_student_howsolved_batch'),
+            content_type='application/json',
+            data=json.dumps(data))
+
+    def _get_howsolved(self):
+        return dict(models.HowSolved.objects
+                    .filter(user=self.testuser)
+                    .values_list('assignment_id', 'howsolved'))
+
+    def test_create_update_delete(self):
+        models.HowSolved.objects.set_howsolved(self.assignments[0], self.testuser, 'withhelp')
+        models.HowSolved.objects.set_howsolved(self.assignments[1], self.testuser, 'withhelp')
+        response = self._post({'changes': [
+            {'assignment_id': self.assignments[0].id, 'howsolved': None},
+            {'assignment_id': self.assignments[1].id, 'howsolved': 'bymyself'},
+            {'assignment_id': self.assignments[2].id, 'howsolved': 'bymyself'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'howsolved': {
+            str(self.assignments[0].id): None,
+            str(self.assignments[1].id): 'bymyself',
+            str(self.assignments[2].id): 'bymyself',
+        }})
+        self.assertEqual(self._get_howsolved(), {
+            self.assignments[1].id: 'bymyself',
+            self.assignments[2].id: 'bymyself',
+        })
+
+    def test_clear_not_solved(self):
+        response = self._post({'changes': [
+            {'assignment_id': self.assignments[0].id, 'howsolved': None}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_howsolved(), {})
+
+    def test_invalid_json(self):
+        response = self.post_as(self.testuser, reverse('trix_student_howsolved_batch'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_howsolved(self):
+        response = self._post({'changes': [
+            {'assignment_id': self.assignments[0].id, 'howsolved': 'invalid'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._get_howsolved(), {})
+
+    def test_too_many_changes(self):
+        response = self._post({'changes': [
+            {'assignment_id': index, 'howsolved': None} for index in range(101)]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_assignment_id(self):
+        response = self._post({'changes': [
+            {'assignment_id': self.assignments[0].id, 'howsolved': 'bymyself'},
+            {'assignment_id': 100001, 'howsolved': 'bymyself'}]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content)['assignment_ids'], [100001])
+        self.assertEqual(self._get_howsolved(), {})
+
+
+class TestHowSolvedWriteBehind(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        settings_override = override_settings(
+            TRIX_HOWSOLVED_WRITE_BEHIND=True,
+            TRIX_HOWSOLVED_SPOOL_PATH=os.path.join(self.tempdir, 'spool.sqlite3'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        flusher_patch = mock.patch.object(howsolvedspool, 'start_flusher')
+        flusher_patch.start()
+        self.addCleanup(flusher_patch.stop)
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.testuser = create_user('testuser@example.com', consent_datetime=timezone.now())
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(course_tag=course_tag, active_period=period_tag)
+        self.assignment1 = models.Assignment.objects.create(title='A1')
+        self.assignment1.tags.add(course_tag, period_tag)
+        self.assignment2 = models.Assignment.objects.create(title='A2')
+        self.assignment2.tags.add(course_tag, period_tag)
+
+    def _get_course(self, **params):
+        return self.get_as(self.testuser, '{}?{}'.format(
+            reverse('trix_student_course', args=[self.course.id]), urlencode(params)))
+
+    def test_post_is_spooled(self):
+        models.HowSolved.objects.set_howsolved(self.assignment2, self.testuser, 'withhelp')
+        response = self.post_as(
+            self.testuser, reverse('trix_student_howsolved', args=[self.assignment1.id]),
+            content_type='application/json',
+            data=json.dumps({'howsolved': 'bymyself'}))
+        self.assertEqual(json.loads(response.content), {'howsolved': 'bymyself'})
+        response = self.delete_as(
+            self.testuser, reverse('trix_student_howsolved', args=[self.assignment2.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(models.HowSolved.objects.values_list('assignment_id', 'howsolved')),
+                         [(self.assignment2.id, 'withhelp')])
+        self.assertEqual(howsolvedspool.get_pending(self.testuser.id),
+                         {self.assignment1.id: 'bymyself', self.assignment2.id: None})
+
+    def test_read_your_writes(self):
+        models.HowSolved.objects.set_howsolved(self.assignment2, self.testuser, 'withhelp')
+        howsolvedspool.add_changes(self.testuser.id, {self.assignment1.id: 'bymyself',
+                                                      self.assignment2.id: None})
+        response = self._get_course()
+        self.assertEqual([(assignment.id, howsolved) for assignment, howsolved
+                          in response.context['assignmentlist_with_howsolved']],
+                         [(self.assignment1.id, 'bymyself'), (self.assignment2.id, '')])
+        response = self._get_course(progressjson='1')
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 2, 'num_solved': 1, 'percent': 50})
+
+    def test_flushed(self):
+        howsolvedspool.add_changes(self.testuser.id, {self.assignment1.id: 'bymyself'})
+        howsolvedspool.flush()
+        response = self._get_course(progressjson='1')
+        self.assertEqual(json.loads(response.content.decode()),
+                         {'num_total': 2, 'num_solved': 1, 'percent': 50})
@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from trix.project.develop.testhelpers.login import LoginTestCaseMixin
+from trix.project.develop.testhelpers.user import create_user
+from trix.trix_core import models
+
+
+class TestSolutionView(TestCase, LoginTestCaseMixin):
+    def setUp(self):
+        self.course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        self.course = models.Course.objects.create(course_tag=self.course_tag)
+        self.assignment = models.Assignment.objects.create(
+            title='A1', text='Text', solution='# Solution')
+        self.assignment.tags.add(self.course_tag)
+
+    def _geturl(self, assignment_id):
+        return reverse('trix_student_solution', args=[assignment_id])
+
+    def test_get(self):
+        response = self.client.get(self._geturl(self.assignment.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), '<h1>Solution</h1>')
+
+    def test_get_invalid_assignment_id(self):
+        response = self.client.get(self._geturl(100001))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_no_solution(self):
+        assignment = models.Assignment.objects.create(title='A2', text='Text')
+        response = self.client.get(self._geturl(assignment.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_hidden_anonymous(self):
+        models.Assignment.objects.filter(id=self.assignment.id).update(hidden=True)
+        response = self.client.get(self._geturl(self.assignment.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_hidden_student(self):
+        models.Assignment.objects.filter(id=self.assignment.id).update(hidden=True)
+        student = create_user('student@example.com', consent_datetime=timezone.now())
+        response = self.get_as(student, self._geturl(self.assignment.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_hidden_course_admin(self):
+        models.Assignment.objects.filter(id=self.assignment.id).update(hidden=True)
+        admin = create_user('admin@example.com', consent_datetime=timezone.now())
+        self.course.admins.add(admin)
+        response = self.get_as(admin, self._geturl(self.assignment.id))
+        self.assertEqual(response.status_code, 200)
+
+
+class TestCourseDetailViewSolutions(TestCase):
+    def setUp(self):
+        course_tag = models.Tag.objects.create(tag='duck1000', category='c')
+        period_tag = models.Tag.objects.create(tag='spring20', category='p')
+        self.course = models.Course.objects.create(
+            course_tag=course_tag, active_period=period_tag)
+        self.assignment = models.Assignment.objects.create(
+            title='A1', text='Text', solution='The solution')
+        self.assignment.tags.add(course_tag, period_tag)
+
+    def _get(self):
+        return self.client.get(reverse('trix_student_course', args=[self.course.id]))
+
+    @override_settings(TRIX_STUDENT_LAZY_SOLUTIONS=True)
+    def test_lazy_solutions(self):
+        response = self._get()
+        self.assertNotContains(response, 'The solution')
+        self.assertContains(response, reverse('trix_student_solution', args=[self.assignment.id]))
+
+    @override_settings(TRIX_STUDENT_LAZY_SOLUTIONS=True)
+    def test_lazy_solutions_not_loaded(self):
+        models.Assignment.objects.create(title='A2', text='Text').tags.add(
+            self.course.course_tag, self.course.active_period)
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get()
+        assignment_queries = [query['sql'] for query in queries
+                              if 'FROM "trix_core_assignment"' in query['sql']]
+        self.assertTrue(assignment_queries)
+        for sql in assignment_queries:
+            # Only used to check if there is a solution, not selected
+            self.assertNotRegex(sql, r'"trix_core_assignment"\."solution(_html)?"(,| FROM)')
+        self.assertEqual(response.content.decode().count('trix-assignmentsolution"'), 1)
+
+    def test_eager_solutions_by_default(self):
+        response = self._get()
+        self.assertContains(response, 'The solution')
+        self.assertNotContains(
+            response, reverse('trix_student_solution', args=[self.assignment.id]))
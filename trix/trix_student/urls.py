@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import views as auth_views
 
 from trix.trix_student.views import dashboard, assignments, course, howsolved, \
-    permalink, users, consent, base
+    permalink, users, consent, base, solution
 
 
 urlpatterns = [
@@ -11,6 +11,12 @@ urlpatterns = [
     url('^assignment/howsolved/(?P<assignment_id>\d+)$',
         login_required(howsolved.HowsolvedView.as_view()),
         name='trix_student_howsolved'),
+    url('^assignment/howsolved/batch$',
+        login_required(howsolved.HowsolvedBatchView.as_view()),
+        name='trix_student_howsolved_batch'),
+    url('^assignment/solution/(?P<assignment_id>\d+)$',
+        solution.SolutionView.as_view(),
+        name='trix_student_solution'),
     url('^assignments/(?P<assignment_ids>[\d+&*]+)$',
         assignments.AssignmentListView.as_view(),
         name='trix_assignments_view'),
@@ -8,11 +8,18 @@ class TrixListViewBase(ListView):
     This forms the basis for all other list views and is used to apply sitewide (limited to user
     sites) context.
     '''
+    def get_pagination_object_list(self):
+        """
+        Get the object list used to check that the requested page is valid.
+        Defaults to :meth:`.get_queryset`.
+        """
+        return self.get_queryset()
+
     def get(self, request, **kwargs):
         # Fix out of bounds pagination
         page = request.GET.get('page')
         if page:
-            paginator = Paginator(self.get_queryset(), self.paginate_by)
+            paginator = Paginator(self.get_pagination_object_list(), self.paginate_by)
             try:
                 posts = paginator.page(page)
             except (PageNotAnInteger, EmptyPage):
@@ -1,54 +1,356 @@
+import base64
+import binascii
 import json
 from django import http
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 from urllib import parse
 
-from functools import reduce
+from trix.trix_core import cacheutils
+from trix.trix_core import howsolvedspool
 from trix.trix_core import models
+from trix.trix_core import tagindex
 from trix.trix_student.views import base
 
 
+def encode_cursor(assignment):
+    """
+    Encode the position of ``assignment`` in a list ordered by title and ID as a
+    string for the ``after`` and ``before`` querystring arguments.
+    """
+    value = json.dumps([assignment.title, assignment.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(value).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from :func:`.encode_cursor`.
+
+    Returns:
+        A ``(title, id)`` tuple.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    try:
+        title, assignment_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValueError('Invalid cursor: {!r}'.format(cursor))
+    if not isinstance(title, str) or not isinstance(assignment_id, int):
+        raise ValueError('Invalid cursor: {!r}'.format(cursor))
+    return title, assignment_id
+
+
+class CursorPage(object):
+    """
+    A page from cursor pagination. Used as ``page_obj`` when
+    :meth:`AssignmentListViewBase.get_cursor_pagination` is enabled.
+    """
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.object_list else ''
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.object_list else ''
+
+
 class AssignmentListViewBase(base.TrixListViewBase):
     paginate_by = 100
     context_object_name = 'assignment_list'
     already_selected_tags = []
 
+    #: The query parameters that can be used in requests from anonymous users
+    #: with a cached response. Requests with other parameters are not cached.
+    anonymous_cache_parameters = {'tags', 'page', 'after', 'before', 'progressjson'}
+
+    def get_anonymous_cache_key_parts(self):
+        """
+        Get the parts of the cache key for the response to anonymous users that
+        identify the page and the version of its content.
+
+        Returns:
+            A tuple, or ``None`` if the response should not be cached. Returns
+            ``None`` by default.
+        """
+        return None
+
+    def get_anonymous_cache_timeout(self):
+        """
+        Get the number of seconds responses to anonymous users are cached.
+
+        Defaults to the ``TRIX_ANONYMOUS_PAGE_CACHE_TIMEOUT`` setting, or 60 if the
+        setting is not defined.
+        """
+        return getattr(settings, 'TRIX_ANONYMOUS_PAGE_CACHE_TIMEOUT', 60)
+
+    def _get_anonymous_cache_key(self):
+        request = self.request
+        if request.method != 'GET' or request.user.is_authenticated:
+            return None
+        if not set(request.GET.keys()).issubset(self.anonymous_cache_parameters):
+            return None
+        key_parts = self.get_anonymous_cache_key_parts()
+        if key_parts is None:
+            return None
+        # Empty parameters, like ``?tags=`` from the tag form, give the same page
+        parameters = sorted((name, value) for name, value in request.GET.items() if value)
+        return cacheutils.make_key(
+            'anonymous-page', self.__class__.__name__, key_parts,
+            parameters, translation.get_language(),
+            request.session.get('wcag', False))
+
+    def dispatch(self, request, *args, **kwargs):
+        cache_key = self._get_anonymous_cache_key()
+        if cache_key is None:
+            return super(AssignmentListViewBase, self).dispatch(request, *args, **kwargs)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            content_type, content = cached
+            return http.HttpResponse(content, content_type=content_type)
+
+        response = super(AssignmentListViewBase, self).dispatch(request, *args, **kwargs)
+
+        def cache_response(response):
+            if response.status_code == 200:
+                cache.set(cache_key, (response['Content-Type'], response.content),
+                          self.get_anonymous_cache_timeout())
+
+        if getattr(response, 'is_rendered', True):
+            cache_response(response)
+        else:
+            response.add_post_render_callback(cache_response)
+        return response
+
     def get(self, request, **kwargs):
         self.selected_tags = self._get_selected_tags()
-        self.selectable_tags = self._get_selectable_tags()
-        self.non_removeable_tags = self.get_nonremoveable_tags()
         if self.request.GET.get('progressjson'):
             return self._progressjson()
-        else:
-            return super(AssignmentListViewBase, self).get(request, **kwargs)
+        self.selectable_tags = self._get_selectable_tags()
+        self.non_removeable_tags = self.get_nonremoveable_tags()
+        return super(AssignmentListViewBase, self).get(request, **kwargs)
 
-    def get_queryset(self):
+    def get_filtered_queryset(self):
+        """
+        Get the assignments matching the selected tags, ordered by title.
+
+        Use :meth:`.get_assignment_ids` or :meth:`.get_assignment_id_filter` instead
+        of this to avoid running the filter more than once per request.
+        """
         assignments = self.get_all_available_assignments()
         if self.selected_tags:
             exclude_list = [tag.lstrip('-') for tag in self.selected_tags if tag.startswith('-')]
             filter_list = [tag for tag in self.selected_tags if not tag.startswith('-')]
+            index = tagindex.get_index()
+            # Limit the IDs to the available assignments instead of all the
+            # assignments on the site with the selected tags
+            scope_tags = list(self.get_index_scope_tags())
             if filter_list:
-                # Get only assignments which match exactly the tags in the list
-                assignments = reduce(lambda qs, pk: qs.filter(tags__tag=pk),
-                                     filter_list, assignments)
-            if exclude_list:
+                # Get only assignments which match exactly the tags in the list,
+                # and does not have any of the excluded tags
+                assignments = assignments.filter(
+                    id__in=index.filter_ids(filter_list + scope_tags, exclude_list))
+            elif exclude_list:
                 # Exclude any assignment that has an excluded tag
-                assignments = assignments.exclude(tags__tag__in=exclude_list)
+                exclude_bitmap = index.get_any_of(exclude_list)
+                if scope_tags:
+                    exclude_bitmap &= index.get_all_of(scope_tags)
+                assignments = assignments.exclude(
+                    id__in=tagindex.bitmap_to_ids(exclude_bitmap))
         # Exclude hidden tasks from those that are not admin
         if not self._get_user_is_admin():
             assignments = assignments.exclude(hidden=True)
-        assignments = assignments.order_by('title')
+        assignments = assignments.order_by('title', 'id')
         return assignments
 
+    def get_index_scope_tags(self):
+        """
+        Get the tags that all the assignments from :meth:`.get_all_available_assignments`
+        have, typically the course and period tags.
+
+        The assignment IDs from the tag index are limited to the assignments with
+        these tags, so filtering on a tag used by many courses does not make a
+        filter with the IDs of all the assignments on the site that have the tag.
+        Returns an empty list by default, which does not limit the IDs.
+        """
+        return []
+
+    def get_assignment_ids(self):
+        """
+        Get the IDs of the assignments matching the selected tags, ordered by title.
+
+        The IDs are only queried once per request, and are used for pagination,
+        the selectable tags and the progress.
+        """
+        if not hasattr(self, '_assignment_ids'):
+            self._assignment_ids = list(self.get_filtered_queryset().values_list('id', flat=True))
+        return self._assignment_ids
+
+    def _get_filtered_queryset(self):
+        """
+        Get :meth:`.get_filtered_queryset`, only built once per request.
+        """
+        if not hasattr(self, '_filtered_queryset'):
+            self._filtered_queryset = self.get_filtered_queryset()
+        return self._filtered_queryset
+
+    def get_assignment_id_filter(self):
+        """
+        Get the assignments matching the selected tags as a value for ``id__in``
+        or ``assignment_id__in`` lookups.
+
+        With cursor pagination, this is a subquery, so the IDs of all the matching
+        assignments are never loaded. Otherwise, this is :meth:`.get_assignment_ids`,
+        which is needed for page number pagination anyway.
+        """
+        if self._use_cursor_pagination():
+            return self._get_filtered_queryset().order_by().values('id')
+        return self.get_assignment_ids()
+
+    def get_pagination_object_list(self):
+        return self.get_assignment_ids()
+
+    def _defer_solutions(self, assignments):
+        if self.get_lazy_solutions():
+            # The solutions are loaded on demand by SolutionView
+            assignments = assignments\
+                .defer('solution', 'solution_html')\
+                .annotate(solution_exists=Case(When(solution='', then=Value(False)),
+                                               default=Value(True),
+                                               output_field=BooleanField()))
+        return assignments
+
+    def get_queryset(self):
+        assignments = models.Assignment.objects.filter(id__in=self.get_assignment_id_filter())
+        assignments = self._defer_solutions(assignments)
+        assignments = assignments.order_by('title', 'id')
+        return assignments
+
+    def get_cursor_pagination(self):
+        """
+        If this returns ``True``, the assignments are paginated with the ``after`` and
+        ``before`` cursors instead of page numbers, unless the ``page`` querystring
+        argument is used. Cursor pagination fetches one page of assignments ordered
+        by title and ID without counting the assignments or skipping rows with OFFSET.
+
+        Defaults to the ``TRIX_STUDENT_CURSOR_PAGINATION`` setting, or ``False`` if the
+        setting is not defined.
+        """
+        return getattr(settings, 'TRIX_STUDENT_CURSOR_PAGINATION', False)
+
+    def _use_cursor_pagination(self):
+        return self.get_cursor_pagination() and not self.request.GET.get('page')
+
+    def paginate_by_cursor(self, page_size):
+        """
+        Get the page of assignments after the ``after`` cursor or before the ``before``
+        cursor in the querystring, or the first page if there is no cursor.
+
+        Returns:
+            A :class:`.CursorPage`.
+        """
+        assignments = self._defer_solutions(self._get_filtered_queryset())
+        try:
+            if self.request.GET.get('before'):
+                title, assignment_id = decode_cursor(self.request.GET['before'])
+                assignments = assignments\
+                    .filter(Q(title__lt=title) | Q(title=title, id__lt=assignment_id))\
+                    .order_by('-title', '-id')
+                object_list = list(assignments[:page_size + 1])
+                has_previous = len(object_list) > page_size
+                object_list = list(reversed(object_list[:page_size]))
+                return CursorPage(object_list, has_previous=has_previous, has_next=True)
+            if self.request.GET.get('after'):
+                title, assignment_id = decode_cursor(self.request.GET['after'])
+                assignments = assignments\
+                    .filter(Q(title__gt=title) | Q(title=title, id__gt=assignment_id))
+                has_previous = True
+            else:
+                has_previous = False
+        except ValueError:
+            raise http.Http404()
+        object_list = list(assignments[:page_size + 1])
+        return CursorPage(object_list[:page_size], has_previous=has_previous,
+                          has_next=len(object_list) > page_size)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate the assignment IDs, and only load the assignments on the current page.
+        """
+        if self._use_cursor_pagination():
+            page = self.paginate_by_cursor(page_size)
+            return None, page, page.object_list, page.has_other_pages()
+        paginator, page, assignment_ids, is_paginated = super(
+            AssignmentListViewBase, self).paginate_queryset(self.get_assignment_ids(), page_size)
+        assignments_by_id = queryset.in_bulk(assignment_ids)
+        page.object_list = [assignments_by_id[assignment_id]
+                            for assignment_id in assignment_ids
+                            if assignment_id in assignments_by_id]
+        return paginator, page, page.object_list, is_paginated
+
+    def get_lazy_solutions(self):
+        """
+        If this returns ``True``, the solutions are not included in the page, but loaded
+        from :class:`trix.trix_student.views.solution.SolutionView` when the user
+        expands them.
+
+        Defaults to the ``TRIX_STUDENT_LAZY_SOLUTIONS`` setting, or ``False`` if the
+        setting is not defined.
+        """
+        return getattr(settings, 'TRIX_STUDENT_LAZY_SOLUTIONS', False)
+
+    def get_unfiltered_progress(self):
+        """
+        Get the progress for the assignments when no tags are selected without
+        querying the HowSolved objects.
+
+        Returns:
+            A ``(num_solved, num_total)`` tuple, or ``None`` to count the HowSolved
+            objects for the assignments. Returns ``None`` by default.
+        """
+        return None
+
     def _get_progress(self):
         """
         Gets the progress a user has made. Hidden tasks are not counted unless user is an admin.
         """
-        assignments = self.get_queryset()
-        how_solved = models.HowSolved.objects.filter(assignment__in=assignments)\
-            .filter(user=self.request.user.id)
-        num_solved = how_solved.count()
-        num_total = assignments.count()
+        progress = None
+        if not self.selected_tags:
+            progress = self.get_unfiltered_progress()
+        if progress is None:
+            how_solved = models.HowSolved.objects\
+                .filter(assignment_id__in=self.get_assignment_id_filter())\
+                .filter(user=self.request.user.id)
+            if self._use_cursor_pagination():
+                num_total = self._get_filtered_queryset().count()
+            else:
+                num_total = len(self.get_assignment_ids())
+            progress = how_solved.count(), num_total
+        num_solved, num_total = progress
+        num_solved += self._get_pending_solved_count()
         if num_total == 0:
             percent = 0
         else:
@@ -59,6 +361,62 @@ class AssignmentListViewBase(base.TrixListViewBase):
             'percent': percent
         }
 
+    def _get_howsolved_map(self, assignment_ids):
+        """
+        Get how ``request.user`` solved the assignments with the given IDs.
+
+        Uses :meth:`trix.trix_core.models.HowSolvedManager.get_howsolved_map`, only
+        looked up once per request, when the map is cached. Otherwise, only the
+        HowSolved objects for the given assignments are queried, instead of all the
+        HowSolved objects for the user.
+
+        Returns:
+            A dict mapping the IDs of the solved assignments to ``howsolved`` values.
+        """
+        if not models.HowSolved.objects.get_howsolved_map_cache_timeout():
+            return dict(models.HowSolved.objects
+                        .filter(user=self.request.user, assignment_id__in=list(assignment_ids))
+                        .values_list('assignment_id', 'howsolved'))
+        if not hasattr(self, '_howsolved_map'):
+            self._howsolved_map = models.HowSolved.objects.get_howsolved_map(self.request.user)
+        return {assignment_id: self._howsolved_map[assignment_id]
+                for assignment_id in assignment_ids
+                if assignment_id in self._howsolved_map}
+
+    def _get_pending_howsolved(self):
+        """
+        Get the changes to how ``request.user`` solved assignments that are not yet
+        written to the database (see :mod:`trix.trix_core.howsolvedspool`).
+        """
+        if not howsolvedspool.is_enabled() or not self.request.user.is_authenticated:
+            return {}
+        if not hasattr(self, '_pending_howsolved'):
+            self._pending_howsolved = howsolvedspool.get_pending(self.request.user.id)
+        return self._pending_howsolved
+
+    def _get_pending_solved_count(self):
+        """
+        Get the change in the number of solved assignments matching the current filter
+        from the changes that are not yet written to the database.
+        """
+        pending = self._get_pending_howsolved()
+        if not pending:
+            return 0
+        if self._use_cursor_pagination():
+            assignment_ids = set(self._get_filtered_queryset()
+                                 .filter(id__in=list(pending.keys()))
+                                 .values_list('id', flat=True))
+        else:
+            assignment_ids = set(self.get_assignment_ids()).intersection(pending.keys())
+        solved_ids = set(self._get_howsolved_map(assignment_ids))
+        solved_count = 0
+        for assignment_id in assignment_ids:
+            if pending[assignment_id] is None and assignment_id in solved_ids:
+                solved_count -= 1
+            elif pending[assignment_id] is not None and assignment_id not in solved_ids:
+                solved_count += 1
+        return solved_count
+
     def _progressjson(self):
         return http.HttpResponse(
             json.dumps(self._get_progress()),
@@ -66,15 +424,26 @@ class AssignmentListViewBase(base.TrixListViewBase):
         )
 
     def _get_selectable_tags(self):
+        """
+        Get the tags on the assignments matching the current filter that are
+        not already selected.
+
+        Returns:
+            A list of ``(tag, assignment_count)`` tuples ordered by tag, where
+            ``assignment_count`` is the number of assignments matching the current
+            filter that has the tag.
+        """
         already_selected_tags = self.get_already_selected_tags() + self.selected_tags
 
-        tags = (models.Tag.objects
-                .filter(assignment__in=self.get_queryset())
-                .exclude(tag__in=already_selected_tags)
-                .order_by('tag')
-                .distinct()
-                .values_list('tag', flat=True))
-        return tags
+        AssignmentTag = models.Assignment.tags.through
+        tags = (AssignmentTag.objects
+                .filter(assignment_id__in=self.get_assignment_id_filter())
+                .exclude(tag__tag__in=already_selected_tags)
+                .values('tag__tag')
+                .annotate(assignment_count=Count('assignment_id'))
+                .order_by('tag__tag')
+                .values_list('tag__tag', 'assignment_count'))
+        return list(tags)
 
     def _get_selected_tags(self):
         tags_string = self.request.GET.get('tags', None)
@@ -97,11 +466,11 @@ class AssignmentListViewBase(base.TrixListViewBase):
         """
         howsolvedmap = {}  # Map of assignment ID to HowSolved.howsolved for request.user
         if self.request.user.is_authenticated and assignment_list:
-            howsolvedquery = (models.HowSolved.objects
-                              .filter(user=self.request.user, assignment__in=assignment_list))
-            howsolvedmap = dict(howsolvedquery.values_list('assignment_id', 'howsolved'))
+            howsolvedmap = self._get_howsolved_map(
+                [assignment.id for assignment in assignment_list])
+            howsolvedmap.update(self._get_pending_howsolved())
         return [
-            (assignment, howsolvedmap.get(assignment.id, ''))
+            (assignment, howsolvedmap.get(assignment.id) or '')
             for assignment in assignment_list]
 
     def get_context_data(self, **kwargs):
@@ -111,6 +480,8 @@ class AssignmentListViewBase(base.TrixListViewBase):
         context['selected_tags'] = self.selected_tags
         context['selectable_tags'] = self.selectable_tags
         context['user_is_admin'] = self._get_user_is_admin()
+        context['lazy_solutions'] = self.get_lazy_solutions()
+        context['cursor_pagination'] = self._use_cursor_pagination()
         context['urlencoded_success_url'] = parse.urlencode({
             'success_url': self.request.get_full_path()})
 
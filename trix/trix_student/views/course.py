@@ -1,6 +1,7 @@
 from django.shortcuts import get_object_or_404
 
 from trix.trix_core import models
+from trix.trix_core import tagindex
 from trix.trix_student.views.common import AssignmentListViewBase
 
 
@@ -13,12 +14,13 @@ class CourseDetailView(AssignmentListViewBase):
         self.course = get_object_or_404(models.Course, id=self.course_id)
         return super(CourseDetailView, self).get(request, **kwargs)
 
+    def get_anonymous_cache_key_parts(self):
+        course_id = int(self.kwargs['course_id'])
+        return course_id, models.Course.get_content_cache_version(course_id)
+
     def _get_user_is_admin(self):
         if self.request.user.is_authenticated:
-            if self.request.user.is_admin:
-                return True
-            else:
-                return self.course.admins.filter(id=self.request.user.id)
+            return self.request.user.is_course_admin(self.course)
         else:
             return False
 
@@ -27,6 +29,30 @@ class CourseDetailView(AssignmentListViewBase):
                 .filter_by_tag(self.course.course_tag)
                 .filter_by_tag(self.course.active_period))
 
+    def get_index_scope_tags(self):
+        return [tag.tag for tag in (self.course.course_tag, self.course.active_period)
+                if tag is not None]
+
+    def get_unfiltered_progress(self):
+        """
+        Get the progress from the :class:`trix.trix_core.models.CourseProgress` counter
+        for the user, and the number of assignments from the tag index.
+
+        Falls back to counting the HowSolved objects for students when the course has
+        hidden assignments, since the counter includes the hidden assignments.
+        """
+        if not self.request.user.is_authenticated or self.course.active_period is None:
+            return None
+        index = tagindex.get_index()
+        bitmap = index.get_all_of([self.course.course_tag.tag, self.course.active_period.tag])
+        if bitmap & index.hidden_bitmap and not self._get_user_is_admin():
+            return None
+        num_solved = models.CourseProgress.objects.get_num_solved(
+            user=self.request.user,
+            course_tag=self.course.course_tag,
+            period_tag=self.course.active_period)
+        return num_solved, tagindex.count_bitmap(bitmap)
+
     def get_already_selected_tags(self):
         already_selected_tags = [
             self.course.course_tag.tag,
@@ -1,9 +1,9 @@
 import json
 from django.views.generic import View
 from django import http
-from django.shortcuts import get_object_or_404
 from django import forms
 
+from trix.trix_core import howsolvedspool
 from trix.trix_core import models
 
 
@@ -28,13 +28,10 @@ class HowsolvedView(View):
     def _200_response(self, data):
         return http.HttpResponse(json.dumps(data), content_type='application/json')
 
-    def _get_assignment(self):
-        return get_object_or_404(models.Assignment, id=self.kwargs['assignment_id'])
-
-    def _get_howsolved(self, assignment_id):
-        return models.HowSolved.objects\
-            .filter(assignment_id=assignment_id, user=self.request.user)\
-            .get()
+    def _assignment_not_found_response(self):
+        return self._not_found_response({
+            'message': 'No assignment with this ID.'
+        })
 
     def post(self, request, **kwargs):
         try:
@@ -47,19 +44,20 @@ class HowsolvedView(View):
         form = HowSolvedForm(data)
         if form.is_valid():
             howsolved = form.cleaned_data['howsolved']
-            assignment = self._get_assignment()
-
+            assignment_id = int(self.kwargs['assignment_id'])
+            if howsolvedspool.is_enabled():
+                if not models.Assignment.objects.filter(id=assignment_id).exists():
+                    return self._assignment_not_found_response()
+                howsolvedspool.add_changes(request.user.id, {assignment_id: howsolved})
+                return self._200_response({'howsolved': howsolved})
+            # Also checks that the assignment exists, without a separate query
             try:
-                howsolvedobject = self._get_howsolved(assignment.id)
-            except models.HowSolved.DoesNotExist:
-                howsolvedobject = models.HowSolved.objects.create(
-                    howsolved=howsolved,
-                    assignment=assignment,
-                    user=request.user)
-            else:
-                howsolvedobject.howsolved = howsolved
-                howsolvedobject.save()
-
+                howsolvedobject = models.HowSolved.objects.set_howsolved(
+                    assignment=assignment_id,
+                    user=request.user,
+                    howsolved=howsolved)
+            except models.Assignment.DoesNotExist:
+                return self._assignment_not_found_response()
             return self._200_response({'howsolved': howsolvedobject.howsolved})
         else:
             return self._bad_request_response({
@@ -67,12 +65,97 @@ class HowsolvedView(View):
             })
 
     def delete(self, request, **kwargs):
+        if howsolvedspool.is_enabled():
+            # We do not know if there is anything to clear without querying the
+            # database, so clearing is always successful in write-behind mode
+            howsolvedspool.add_changes(request.user.id, {int(self.kwargs['assignment_id']): None})
+            return self._200_response({'success': True})
         try:
-            howsolved = self._get_howsolved(self.kwargs['assignment_id'])
+            models.HowSolved.objects.clear_howsolved(
+                assignment_id=int(self.kwargs['assignment_id']),
+                user=request.user)
         except models.HowSolved.DoesNotExist:
             return self._not_found_response({
                 'message': 'No HowSolved for this user and assignment.'
             })
         else:
-            howsolved.delete()
             return self._200_response({'success': True})
+
+
+class HowsolvedBatchView(HowsolvedView):
+    """
+    Change how the user solved several assignments in one request.
+
+    Expects a JSON object with a list of changes, like::
+
+        {"changes": [
+            {"assignment_id": 1, "howsolved": "bymyself"},
+            {"assignment_id": 2, "howsolved": null}
+        ]}
+
+    A ``null`` howsolved clears how the user solved the assignment. All the changes
+    are applied in one transaction, and the response maps the assignment IDs to
+    the new howsolved values.
+    """
+    http_method_names = ['post']
+
+    #: The max number of changes in one request.
+    max_changes = 100
+
+    def _get_changes(self, data):
+        """
+        Get a dict mapping assignment IDs to howsolved values from the request data.
+
+        Raises:
+            ValueError: If the data is not valid.
+        """
+        changes = data.get('changes') if isinstance(data, dict) else None
+        if not isinstance(changes, list):
+            raise ValueError('Expected a list of changes.')
+        if len(changes) > self.max_changes:
+            raise ValueError('At most {} changes are allowed.'.format(self.max_changes))
+        valid_howsolved = [choice for choice, label in models.HowSolved.HOWSOLVED_CHOICES]
+        changes_by_assignment_id = {}
+        for change in changes:
+            if not isinstance(change, dict):
+                raise ValueError('Each change must be an object.')
+            assignment_id = change.get('assignment_id')
+            howsolved = change.get('howsolved')
+            if not isinstance(assignment_id, int) or isinstance(assignment_id, bool):
+                raise ValueError('Invalid assignment_id: {!r}.'.format(assignment_id))
+            if howsolved is not None and howsolved not in valid_howsolved:
+                raise ValueError('Invalid howsolved: {!r}.'.format(howsolved))
+            changes_by_assignment_id[assignment_id] = howsolved
+        return changes_by_assignment_id
+
+    def post(self, request, **kwargs):
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return self._bad_request_response({
+                'error': 'Invalid JSON data.'
+            })
+        try:
+            changes = self._get_changes(data)
+        except ValueError as error:
+            return self._bad_request_response({
+                'error': str(error)
+            })
+
+        existing_ids = set(models.Assignment.objects
+                           .filter(id__in=list(changes.keys()))
+                           .values_list('id', flat=True))
+        missing_ids = sorted(set(changes.keys()) - existing_ids)
+        if missing_ids:
+            return self._not_found_response({
+                'message': 'No assignments with these IDs.',
+                'assignment_ids': missing_ids
+            })
+        if howsolvedspool.is_enabled():
+            howsolvedspool.add_changes(request.user.id, changes)
+        else:
+            models.HowSolved.objects.set_howsolved_many(user=request.user, changes=changes)
+        return self._200_response({
+            'howsolved': {str(assignment_id): howsolved
+                          for assignment_id, howsolved in changes.items()}
+        })
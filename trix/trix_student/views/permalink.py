@@ -14,12 +14,13 @@ class PermalinkView(AssignmentListViewBase):
         self.permalink = get_object_or_404(models.Permalink, id=self.permalink_id)
         return super(PermalinkView, self).get(request, **kwargs)
 
+    def get_anonymous_cache_key_parts(self):
+        return (int(self.kwargs['permalink_id']),
+                models.Course.get_permalink_content_cache_version())
+
     def _get_user_is_admin(self):
         if self.request.user.is_authenticated:
-            if self.request.user.is_admin:
-                return True
-            else:
-                return self.permalink.course.admins.filter(id=self.request.user.id)
+            return self.request.user.is_course_admin(self.permalink.course)
         else:
             return False
 
@@ -27,6 +28,9 @@ class PermalinkView(AssignmentListViewBase):
         return models.Assignment.objects\
             .filter_by_tags(self.permalink.tags.all())
 
+    def get_index_scope_tags(self):
+        return [tag.tag for tag in self.permalink.tags.all()]
+
     def get_already_selected_tags(self):
         already_selected_tags = []
         for tag in self.get_nonremoveable_tags():
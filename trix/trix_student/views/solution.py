@@ -0,0 +1,37 @@
+from django import http
+from django.shortcuts import get_object_or_404
+from django.views.generic import View
+
+from trix.trix_core import models
+
+
+class SolutionView(View):
+    """
+    Renders the solution for a single assignment as a HTML fragment.
+
+    Used to load solutions on demand when the student expands "See solution"
+    on the assignment list pages, instead of including all the solutions in the
+    page up front.
+    """
+    http_method_names = ['get']
+
+    def _get_user_can_view_hidden(self, assignment):
+        user = self.request.user
+        if not user.is_authenticated:
+            return False
+        if user.is_admin:
+            return True
+        admin_course_ids, owner_course_ids = user.get_course_roles()
+        if not admin_course_ids:
+            return False
+        return models.Course.objects\
+            .filter(id__in=admin_course_ids, course_tag__in=assignment.tags.all())\
+            .exists()
+
+    def get(self, request, **kwargs):
+        assignment = get_object_or_404(models.Assignment, id=kwargs['assignment_id'])
+        if not assignment.solution:
+            raise http.Http404()
+        if assignment.hidden and not self._get_user_can_view_hidden(assignment):
+            raise http.Http404()
+        return http.HttpResponse(assignment.get_solution_html(), content_type='text/html')
@@ -4,6 +4,7 @@ from django.utils.translation import ugettext_lazy as _
 from django.http import Http404
 from django.urls import reverse_lazy
 
+from trix.trix_core import howsolvedspool
 from trix.trix_core import models
 from trix.trix_student.views import base
 
@@ -42,3 +43,12 @@ class UserDeleteView(LoginRequiredMixin, DeleteView):
         if not user.id == self.request.user.id:
             raise Http404
         return user
+
+    def delete(self, request, *args, **kwargs):
+        # Delete the HowSolved objects through the manager to update the statistics
+        # before they are deleted by the cascade.
+        user = self.get_object()
+        if howsolvedspool.is_enabled():
+            howsolvedspool.discard_user(user.id)
+        models.HowSolved.objects.clear_all_for_user(user)
+        return super(UserDeleteView, self).delete(request, *args, **kwargs)